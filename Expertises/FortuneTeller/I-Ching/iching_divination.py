@@ -8,73 +8,930 @@
 import json
 import base64
 import hashlib
+import logging
+import marshal
+import mmap
+import os
+import struct
+import sys
+import threading
 import time
+from array import array
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Dict, Any, Optional
+from types import MappingProxyType
+from typing import Dict, Any, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+
+# コンパイル済みスナップショット（大卦データベース.json と同じ場所に .snapshot として置く）
+SNAPSHOT_MAGIC = b"ICHS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<4sHxxQQ16s32s")  # マジック / 版数 / ソースのサイズ・更新時刻ns / 処理系タグ / SHA-256
+
+# オフセット索引付きテキストストア（compile-store で大卦データベース.json と同じ場所に .store として作り、mmapで開く）
+# 形式（リトルエンディアン）：
+#     ヘッダ      : マジック(4) / 版数(u16) / 卦数(u16) / ソースのサイズ(u64)・更新時刻ns(u64) /
+#                   爻数(u32) / テキスト数(u32) / metadataのテキスト番号(u32) / 構造部のSHA-256(32)
+#     卦レコード  : 番号(u8) / 符号(u8) / 爻数(u8) / 予約(1) / 最初の爻レコード番号(u32) /
+#                   名前・読み・シンボル・卦辞のテキスト番号(u32×4)
+#     爻レコード  : 番号(u8) / 陰陽(u8、陽=1) / 予約(2) / 名前・爻辞のテキスト番号(u32×2)
+#     オフセット表: テキスト番号ごとの開始位置(u32)と末尾の終端位置（構造部はここまで）
+#     テキスト本体: UTF-8（同じ文字列は1つにまとめる）
+# 卦のバイナリと爻の陰陽の文字列は符号から復元できるため保存しない
+STORE_MAGIC = b"ICHT"
+STORE_VERSION = 1
+STORE_HEADER = struct.Struct("<4sHHQQIII32s")
+STORE_HEXAGRAM = struct.Struct("<BBBxIIIII")
+STORE_LINE = struct.Struct("<BBxxII")
+STORE_OFFSET = struct.Struct("<I")
+STORE_TEXT_SPAN = struct.Struct("<II")
+
+# テキストストアで解読済みのテキストを保持する件数
+TEXT_CACHE_SIZE = 256
+
+# 卦・爻の項目（大卦データベース.json と同じ並び）
+HEXAGRAM_KEYS = ('番号', '名前', '読み', 'バイナリ', 'シンボル', '卦辞', '爻')
+LINE_KEYS = ('番号', '名前', 'バイナリ', '陰陽', '爻辞')
+POLARITY_NAMES = ('陰', '陽')
+
+# 八卦の対応表（下の爻から並べた3桁の2進数 → 卦名・象意・性質）。占断のたびに作り直さないようモジュールで保持
+TRIGRAMS: Mapping[str, Mapping[str, str]] = MappingProxyType({
+    '111': MappingProxyType({'名前': '乾', '象意': '天', '性質': '剛健'}),
+    '110': MappingProxyType({'名前': '兌', '象意': '沢', '性質': '悦楽'}),
+    '101': MappingProxyType({'名前': '離', '象意': '火', '性質': '明智'}),
+    '100': MappingProxyType({'名前': '震', '象意': '雷', '性質': '震動'}),
+    '011': MappingProxyType({'名前': '巽', '象意': '風', '性質': '柔順'}),
+    '010': MappingProxyType({'名前': '坎', '象意': '水', '性質': '険難'}),
+    '001': MappingProxyType({'名前': '艮', '象意': '山', '性質': '静止'}),
+    '000': MappingProxyType({'名前': '坤', '象意': '地', '性質': '柔順'}),
+})
+
+# 卦の整数符号：第n爻（下から数える）の陰陽を第(n-1)ビットに置いた6ビット値（陽=1、陰=0）
+# バイナリ文字列は下の爻から並ぶため、符号はバイナリ文字列を逆順に読んだ2進数になる。
+# 下卦は符号の下位3ビット、上卦は上位3ビット（八卦の3ビット符号も同じ並び）
+HEXAGRAM_COUNT = 64
+LINE_COUNT = 6
+
+# 八卦の3ビット符号 → 八卦の情報（坤0・震1・坎2・兌3・艮4・離5・巽6・乾7）
+TRIGRAM_TABLE: Tuple[Mapping[str, str], ...] = tuple(TRIGRAMS[format(code, '03b')[::-1]] for code in range(8))
+
+# 占的と状況整理を結合する書式（状況が個別性を生む）
+QUESTION_FORMAT = "{}\n===状況整理===\n{}"
+
+# 状況整理をファイルから少しずつ読む際の1回の読み込み量
+STREAM_CHUNK_SIZE = 1 << 16
+
+
+def question_digest(divination_question: str, context: str) -> bytes:
+    """占的と状況整理のSHA256ダイジェスト（卦番号の算出と占断記録の索引に使う）
+
+    Args:
+        divination_question: 占的
+        context: 状況整理
+
+    Returns:
+        BASE64に変換した「占的 + 状況整理」のSHA256ダイジェスト（32バイト）
+    """
+    # 占的と状況整理を結合（状況が個別性を生む） → UTF-8エンコード → BASE64 → SHA256
+    encoded = base64.b64encode(QUESTION_FORMAT.format(divination_question, context).encode('utf-8'))
+    return hashlib.sha256(encoded).digest()
+
+
+def hexagram_number_from_digest(digest: bytes) -> int:
+    """SHA256ダイジェスト（32バイト）から卦番号（1-64）を求める
+
+    天（先頭64ビット）・地（中間128ビット）・人（末尾64ビット）のXORを64で割った余りは
+    各区間の下位6ビットだけで決まるため、各区間の末尾バイト（7・23・31番目）だけを使う。
+
+    Args:
+        digest: hashlib.sha256(...).digest() の値
+
+    Returns:
+        卦番号（1-64）
+    """
+    return ((digest[7] ^ digest[23] ^ digest[31]) & 63) + 1
+
+
+class HexagramHasher:
+    """占的と状況整理を少しずつ受け取って卦番号を求める（hashlib と同じ update 方式）
+
+    状況整理全体を1つの文字列・BASE64・ハッシュ入力として同時に持たずに済むよう、
+    UTF-8のバイト列を3バイト単位でBASE64に変換しながらSHA256へ流し込む。
+    BASE64は3バイトごとに独立して4文字になるため、区切り方によらず
+    全体を一度に変換した場合と同じバイト列がハッシュされ、卦番号も同じになる。
+
+    使用例：
+        hasher = HexagramHasher("占的")
+        for chunk in 状況整理の断片:
+            hasher.update(chunk)
+        number = hasher.hexagram_number()
+    """
+
+    __slots__ = ("_sha", "_pending")
+
+    def __init__(self, divination_question: str):
+        """
+        Args:
+            divination_question: 占的（この後に状況整理の見出しを付けてから状況整理を受け取る）
+        """
+        self._sha = hashlib.sha256()
+        self._pending = b""  # 3バイトに満たずBASE64へ変換していない残り
+        self.update(QUESTION_FORMAT.format(divination_question, ""))
+
+    def update(self, chunk: Union[str, bytes, bytearray, memoryview]) -> None:
+        """状況整理の続きを追加
+
+        Args:
+            chunk: 文字列、またはUTF-8のバイト列（バイト列は文字の途中で区切られていてもよい）
+        """
+        data = memoryview(chunk.encode("utf-8") if isinstance(chunk, str) else chunk).cast("B")
+
+        # 前回の残りを3バイトにしてから変換
+        if self._pending:
+            take = 3 - len(self._pending)
+            self._pending += bytes(data[:take])
+            data = data[take:]
+            if len(self._pending) < 3:
+                return
+            self._sha.update(base64.b64encode(self._pending))
+            self._pending = b""
+
+        # 3の倍数の長さまでを変換し、端数は次回へ持ち越す
+        aligned = len(data) - len(data) % 3
+        if aligned:
+            self._sha.update(base64.b64encode(data[:aligned]))
+        self._pending = bytes(data[aligned:])
+
+    def digest(self) -> bytes:
+        """ここまでの入力のSHA256ダイジェスト（残りにBASE64のパディングを付けて確定。続けてupdateできる）"""
+        sha = self._sha.copy()
+        if self._pending:
+            sha.update(base64.b64encode(self._pending))
+        return sha.digest()
+
+    def hexagram_number(self) -> int:
+        """ここまでの入力から卦番号（1-64）を求める"""
+        return hexagram_number_from_digest(self.digest())
+
+
+def iter_context_chunks(context: Any, chunk_size: int = STREAM_CHUNK_SIZE) -> Iterator[Union[str, bytes]]:
+    """状況整理を断片の並びとして取り出す
+
+    Args:
+        context: 文字列・バイト列、read() を持つファイルオブジェクト（テキスト・バイナリどちらも可）、
+                 または文字列・バイト列の断片の反復可能オブジェクト
+        chunk_size: ファイルから1回に読む量
+
+    Yields:
+        文字列またはUTF-8のバイト列の断片
+    """
+    if isinstance(context, (str, bytes, bytearray, memoryview)):
+        yield context
+    elif hasattr(context, "read"):
+        while True:
+            chunk = context.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+    else:
+        yield from context
+
+
+def line_number_from_timestamp(timestamp: float) -> int:
+    """Unixタイムスタンプから爻番号（1-6）を求める（ミリ秒単位でmod6、+1で1-6）"""
+    return int(timestamp * 1000) % 6 + 1
+
+
+def binary_to_code(binary: str) -> int:
+    """バイナリ文字列（下の爻から並ぶ6桁または3桁）を整数符号に変換（例："100010" → 17）"""
+    return int(binary[::-1], 2)
+
+
+def code_to_binary(code: int, width: int = LINE_COUNT) -> str:
+    """整数符号をバイナリ文字列（下の爻から並ぶ）に変換（例：17 → "100010"）"""
+    return format(code, '0{}b'.format(width))[::-1]
+
+
+def upper_trigram_code(code: int) -> int:
+    """卦の符号から上卦（第4-6爻）の3ビット符号を取得"""
+    return code >> 3
+
+
+def lower_trigram_code(code: int) -> int:
+    """卦の符号から下卦（第1-3爻）の3ビット符号を取得"""
+    return code & 7
+
+
+def line_polarity(code: int, line_number: int) -> int:
+    """卦の符号から第n爻の陰陽を取得（陽=1、陰=0）"""
+    return (code >> (line_number - 1)) & 1
+
+
+# ===== 変卦（之卦・綜卦・互卦・錯卦）のビット演算 =====
+
+def changed_code(code: int, line_number: int) -> int:
+    """之卦：変爻（第n爻）の陰陽を反転（第(n-1)ビットとのXOR）"""
+    return code ^ (1 << (line_number - 1))
+
+
+def reversed_code(code: int) -> int:
+    """綜卦：卦を上下反転（6ビットの並びを逆順にする。第1爻 ⇔ 第6爻）"""
+    result = 0
+    for _ in range(LINE_COUNT):
+        result = (result << 1) | (code & 1)
+        code >>= 1
+    return result
+
+
+def nuclear_code(code: int) -> int:
+    """互卦：第2-4爻を下卦、第3-5爻を上卦とする"""
+    return (((code >> 2) & 7) << 3) | ((code >> 1) & 7)
+
+
+def inverted_code(code: int) -> int:
+    """錯卦：全爻の陰陽を反転（全ビットとのXOR）"""
+    return code ^ (HEXAGRAM_COUNT - 1)
+
+
+# 符号 → 変卦の符号の遷移表（之卦は 符号*6 + (爻番号-1) で引く64×6表）
+CHANGED_CODES = array('B', (changed_code(code, line) for code in range(HEXAGRAM_COUNT)
+                            for line in range(1, LINE_COUNT + 1)))
+REVERSED_CODES = array('B', map(reversed_code, range(HEXAGRAM_COUNT)))
+NUCLEAR_CODES = array('B', map(nuclear_code, range(HEXAGRAM_COUNT)))
+INVERTED_CODES = array('B', map(inverted_code, range(HEXAGRAM_COUNT)))
+
+# 変卦の種別と象意（変卦仕様_append.md）
+DERIVED_HEXAGRAM_MEANINGS: Mapping[str, str] = MappingProxyType({
+    '之卦': '中期的未来・能動的実現・次の展開',
+    '綜卦': '客観的視点・第三者的観察・現実認識',
+    '互卦': '内在的本質・中心構造・根本理想',
+    '錯卦': '逆転的視点・裏側観察・悲観的警告',
+})
+
+
+def default_database_path() -> Path:
+    """同梱の大卦データベースのパス"""
+    return Path(__file__).parent / "大卦データベース.json"
+
+
+def _interpreter_tag() -> bytes:
+    """marshal形式の互換性を判定する処理系タグ（例：b"cpython-311"）"""
+    return sys.implementation.cache_tag.encode("ascii")[:16].ljust(16, b"\0")
+
+
+def compile_snapshot(database_path: Optional[str] = None, output_path: Optional[str] = None) -> Path:
+    """大卦データベースをバージョン・チェックサム付きのバイナリスナップショットに変換
+
+    ヘッダにはソースJSONのサイズと更新時刻を記録し、読み込み時に一致しなければ
+    スナップショットは無視されてJSONから読み込まれる。
+
+    Args:
+        database_path: 大卦データベースのパス（省略時は同梱のJSON）
+        output_path: 出力先（省略時はデータベースと同じ場所の .snapshot）
+
+    Returns:
+        出力したスナップショットのパス
+    """
+    database_path = Path(database_path) if database_path is not None else default_database_path()
+    output_path = Path(output_path) if output_path is not None else database_path.with_suffix(".snapshot")
+
+    with open(database_path, 'r', encoding='utf-8') as f:
+        body = marshal.dumps(json.load(f))
+    stat = database_path.stat()
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, stat.st_size, stat.st_mtime_ns,
+                                  _interpreter_tag(), hashlib.sha256(body).digest())
+
+    # 書き込み途中のファイルを読まれないよう一時ファイルから置き換える
+    temp_path = output_path.with_name(output_path.name + f".{os.getpid()}.tmp")
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        f.write(body)
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+def read_snapshot(database_path: Path, snapshot_path: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+    """スナップショットを検証して読み込む
+
+    ファイルが無い・版数や処理系が異なる・チェックサム不一致・ソースJSONが
+    更新されている場合はNoneを返す。
+
+    Args:
+        database_path: ソースの大卦データベースのパス
+        snapshot_path: スナップショットのパス（省略時はデータベースと同じ場所の .snapshot）
+
+    Returns:
+        データベースの内容、または None
+    """
+    snapshot_path = snapshot_path or database_path.with_suffix(".snapshot")
+    try:
+        with open(snapshot_path, 'rb') as f:
+            data = f.read()
+        stat = database_path.stat()
+    except OSError:
+        return None
+    if len(data) < SNAPSHOT_HEADER.size:
+        return None
+
+    magic, version, size, mtime_ns, tag, checksum = SNAPSHOT_HEADER.unpack_from(data, 0)
+    body = memoryview(data)[SNAPSHOT_HEADER.size:]
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or tag != _interpreter_tag():
+        return None
+    if (size, mtime_ns) != (stat.st_size, stat.st_mtime_ns) or hashlib.sha256(body).digest() != checksum:
+        return None
+    try:
+        return marshal.loads(body)
+    except (EOFError, ValueError, TypeError):
+        return None
+
+
+def compile_text_store(database_path: Optional[str] = None, output_path: Optional[str] = None) -> Path:
+    """大卦データベースをmmapで開けるテキストストアに変換
+
+    卦と爻の構造は固定長レコードに、卦辞・爻辞などのテキストはオフセット表付きの
+    UTF-8本体に分けて書き出す。ヘッダにはソースJSONのサイズと更新時刻を記録し、
+    一致しないストアは使わない（再度このコマンドで作り直す）。
+
+    Args:
+        database_path: 大卦データベースのパス（省略時は同梱のJSON）
+        output_path: 出力先（省略時はデータベースと同じ場所の .store）
+
+    Returns:
+        出力したテキストストアのパス
+
+    Raises:
+        ValueError: ストアに収録できない項目を持つ卦・爻がある場合
+    """
+    database_path = Path(database_path) if database_path is not None else default_database_path()
+    output_path = Path(output_path) if output_path is not None else database_path.with_suffix(".store")
+
+    # 読み込み中にソースが更新された場合は古い時刻が残り、次回に作り直される
+    stat = database_path.stat()
+    with open(database_path, 'r', encoding='utf-8') as f:
+        database = json.load(f)
+
+    text_ids: Dict[str, int] = {}
+    offsets = bytearray()
+    texts = bytearray()
+
+    def text_id(text: str) -> int:
+        """テキストを本体に追加してテキスト番号を返す（同じ文字列は同じ番号）"""
+        number = text_ids.get(text)
+        if number is None:
+            number = text_ids[text] = len(text_ids)
+            offsets.extend(STORE_OFFSET.pack(len(texts)))
+            texts.extend(text.encode('utf-8'))
+        return number
+
+    metadata_id = text_id(json.dumps(database.get('metadata', {}), ensure_ascii=False))
+    hexagram_records = bytearray()
+    line_records = bytearray()
+    line_count = 0
+    for hexagram in database['hexagrams']:
+        if set(hexagram) != set(HEXAGRAM_KEYS):
+            raise ValueError(f"テキストストアに収録できない卦の項目があります: {hexagram.get('番号')}")
+        lines = hexagram['爻']
+        hexagram_records += STORE_HEXAGRAM.pack(
+            hexagram['番号'], binary_to_code(hexagram['バイナリ']), len(lines), line_count,
+            text_id(hexagram['名前']), text_id(hexagram['読み']), text_id(hexagram['シンボル']),
+            text_id(hexagram['卦辞']))
+        for line in lines:
+            if set(line) != set(LINE_KEYS) or line['陰陽'] != POLARITY_NAMES[line['バイナリ']]:
+                raise ValueError(f"テキストストアに収録できない爻の項目があります: "
+                                 f"{hexagram['番号']}-{line.get('番号')}")
+            line_records += STORE_LINE.pack(line['番号'], line['バイナリ'], text_id(line['名前']),
+                                            text_id(line['爻辞']))
+        line_count += len(lines)
+    offsets.extend(STORE_OFFSET.pack(len(texts)))
+
+    structure = hexagram_records + line_records + offsets
+    header = STORE_HEADER.pack(STORE_MAGIC, STORE_VERSION, len(database['hexagrams']), stat.st_size,
+                               stat.st_mtime_ns, line_count, len(text_ids), metadata_id,
+                               hashlib.sha256(structure).digest())
+
+    # 書き込み途中のファイルを読まれないよう一時ファイルから置き換える
+    temp_path = output_path.with_name(output_path.name + f".{os.getpid()}.tmp")
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        f.write(structure)
+        f.write(texts)
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+class StoredLine(Mapping):
+    """テキストストア上の1爻（名前・爻辞は参照時に解読する読み取り専用の辞書）"""
+
+    __slots__ = ("_store", "_record")
+
+    def __init__(self, store: "HexagramTextStore", record: Tuple[int, int, int, int]):
+        self._store = store
+        self._record = record  # (番号, 陰陽, 名前のテキスト番号, 爻辞のテキスト番号)
+
+    def __getitem__(self, key: str) -> Any:
+        number, polarity, name_id, text_id = self._record
+        if key == '番号':
+            return number
+        if key == '名前':
+            return self._store.text(name_id)
+        if key == 'バイナリ':
+            return polarity
+        if key == '陰陽':
+            return POLARITY_NAMES[polarity]
+        if key == '爻辞':
+            return self._store.text(text_id)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(LINE_KEYS)
+
+    def __len__(self) -> int:
+        return len(LINE_KEYS)
+
+    def __repr__(self) -> str:
+        return f"StoredLine({dict(self)!r})"
+
+
+class StoredHexagram(Mapping):
+    """テキストストア上の1卦（卦辞などは参照時に解読する読み取り専用の辞書）
+
+    '爻' は初回参照時に爻レコードを読んで StoredLine のタプルにする。
+    """
+
+    __slots__ = ("_store", "_record", "_lines")
+
+    # 項目 → 卦レコード中のテキスト番号の位置
+    _TEXT_FIELDS = {'名前': 4, '読み': 5, 'シンボル': 6, '卦辞': 7}
+
+    def __init__(self, store: "HexagramTextStore", record: Tuple[int, ...]):
+        self._store = store
+        self._record = record  # (番号, 符号, 爻数, 最初の爻レコード番号, 名前・読み・シンボル・卦辞のテキスト番号)
+        self._lines = None
+
+    def __getitem__(self, key: str) -> Any:
+        field = self._TEXT_FIELDS.get(key)
+        if field is not None:
+            return self._store.text(self._record[field])
+        if key == '番号':
+            return self._record[0]
+        if key == 'バイナリ':
+            return code_to_binary(self._record[1])
+        if key == '爻':
+            if self._lines is None:
+                _, _, line_count, first_line = self._record[:4]
+                self._lines = tuple(StoredLine(self._store, self._store.line_record(first_line + offset))
+                                    for offset in range(line_count))
+            return self._lines
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(HEXAGRAM_KEYS)
+
+    def __len__(self) -> int:
+        return len(HEXAGRAM_KEYS)
+
+    def __repr__(self) -> str:
+        return f"StoredHexagram({self._record[0]})"
+
+
+class HexagramTextStore(Mapping):
+    """mmapで開く大卦データベースのテキストストア（compile_text_store で作成）
+
+    初期化時に読むのはヘッダと卦レコードだけで、爻レコードとテキストは参照されたときに
+    mmapから読む。解読したテキストは直近 text_cache_size 件だけ保持する。
+    テキストの量が増えても起動時間とプロセスごとの常駐メモリは増えず、
+    ファイルの中身は同じマシン上のワーカー間でページキャッシュとして共有される。
+
+    'metadata' と 'hexagrams' を持つ読み取り専用の辞書として、
+    JSONから読み込んだデータベースと同じように扱える。
+    """
+
+    def __init__(self, path: Path, text_cache_size: int = TEXT_CACHE_SIZE):
+        """
+        Args:
+            path: テキストストアのパス
+            text_cache_size: 解読済みテキストを保持する件数
+
+        Raises:
+            OSError: ファイルを開けない場合
+            ValueError: 形式・版数が異なる、または構造部が壊れている場合
+        """
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._read_header()
+        except (ValueError, struct.error):
+            self._buffer.close()
+            raise ValueError(f"{self.path} は対応していないテキストストアです。")
+        self.text = lru_cache(maxsize=text_cache_size)(self._decode_text)
+        self._metadata = None
+
+    def _read_header(self) -> None:
+        """ヘッダと構造部を検証して卦レコードを読み込む"""
+        buffer = self._buffer
+        (magic, version, hexagram_count, size, mtime_ns, line_count, text_count, self._metadata_id,
+         checksum) = STORE_HEADER.unpack_from(buffer, 0)
+        if magic != STORE_MAGIC or version != STORE_VERSION:
+            raise ValueError(magic)
+        self.source_stamp = (size, mtime_ns)
+
+        self._lines_offset = STORE_HEADER.size + hexagram_count * STORE_HEXAGRAM.size
+        self._offsets_offset = self._lines_offset + line_count * STORE_LINE.size
+        self._texts_offset = self._offsets_offset + (text_count + 1) * STORE_OFFSET.size
+        self._line_count = line_count
+        self._text_count = text_count
+        if hashlib.sha256(buffer[STORE_HEADER.size:self._texts_offset]).digest() != checksum:
+            raise ValueError(checksum)
+        text_end, = STORE_OFFSET.unpack_from(buffer, self._texts_offset - STORE_OFFSET.size)
+        if self._texts_offset + text_end != len(buffer):
+            raise ValueError(text_end)
+
+        records = buffer[STORE_HEADER.size:self._lines_offset]
+        self.hexagrams = tuple(StoredHexagram(self, record) for record in STORE_HEXAGRAM.iter_unpack(records))
+
+    def _decode_text(self, text_id: int) -> str:
+        """テキスト番号の文字列をmmapから解読"""
+        if not 0 <= text_id < self._text_count:
+            raise IndexError(text_id)
+        start, end = STORE_TEXT_SPAN.unpack_from(self._buffer, self._offsets_offset + text_id * STORE_OFFSET.size)
+        return self._buffer[self._texts_offset + start:self._texts_offset + end].decode('utf-8')
+
+    def line_record(self, index: int) -> Tuple[int, int, int, int]:
+        """爻レコード（番号, 陰陽, 名前のテキスト番号, 爻辞のテキスト番号）を取得"""
+        if not 0 <= index < self._line_count:
+            raise IndexError(index)
+        return STORE_LINE.unpack_from(self._buffer, self._lines_offset + index * STORE_LINE.size)
+
+    @property
+    def metadata(self) -> Mapping[str, Any]:
+        """データベースのメタデータ（初回参照時に解読）"""
+        if self._metadata is None:
+            self._metadata = freeze(json.loads(self.text(self._metadata_id)))
+        return self._metadata
+
+    def __getitem__(self, key: str) -> Any:
+        if key == 'metadata':
+            return self.metadata
+        if key == 'hexagrams':
+            return self.hexagrams
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(('metadata', 'hexagrams'))
+
+    def __len__(self) -> int:
+        return 2
+
+    def close(self) -> None:
+        """mmapを閉じる（以後のテキスト参照はできない）"""
+        self.text.cache_clear()
+        self._buffer.close()
+
+
+def open_text_store(database_path: Path, store_path: Optional[Path] = None,
+                    build: bool = False) -> Optional[HexagramTextStore]:
+    """ソースJSONと一致するテキストストアを開く
+
+    ストアが無い・壊れている・ソースJSONが更新されている場合はNoneを返す
+    （呼び出し側はスナップショットまたはJSONから読み込む）。ストアは compile-store で作る。
+
+    Args:
+        database_path: ソースの大卦データベースのパス
+        store_path: テキストストアのパス（省略時はデータベースと同じ場所の .store）
+        build: Trueの場合は使えないストアをその場で作り直す（書き込めない場合はNone）
+
+    Returns:
+        テキストストア、または None
+    """
+    database_path = Path(database_path)
+    store_path = store_path or database_path.with_suffix(".store")
+    try:
+        stamp = _database_stamp(database_path)
+        store = HexagramTextStore(store_path)
+    except (OSError, ValueError):
+        store = None
+    if store is not None:
+        if store.source_stamp == stamp:
+            return store
+        store.close()
+    if not build:
+        return None
+    try:
+        compile_text_store(database_path, store_path)
+        return HexagramTextStore(store_path)
+    except (OSError, ValueError):
+        return None
+
+
+def load_database(database_path: Path, use_snapshot: bool = True, use_store: bool = True) -> Mapping[str, Any]:
+    """大卦データベースを読み込む（テキストストア、新しいスナップショットの順に優先）
+
+    Args:
+        database_path: 大卦データベースのパス
+        use_snapshot: Falseの場合はスナップショットを使わない
+        use_store: Falseの場合はテキストストアを使わない（use_snapshotと合わせて常にJSONから読み込む）
+
+    Returns:
+        データベースの内容（テキストストアの場合は読み取り専用）
+    """
+    database_path = Path(database_path)
+    if use_store:
+        store = open_text_store(database_path)
+        if store is not None:
+            return store
+    if use_snapshot:
+        database = read_snapshot(database_path)
+        if database is not None:
+            return database
+    with open(database_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def freeze(value):
+    """データベースを読み取り専用に変換（dict → MappingProxyType、list → tuple）"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def _database_stamp(database_path: Path) -> Tuple[int, int]:
+    """データベースの (サイズ, 更新時刻ns)（更新の検知に使用）"""
+    stat = os.stat(database_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+# プロセス全体で共有するデータベースの登録簿（(パス, スナップショット使用, ストア使用) → (更新検知用の値, 内容)）
+# モジュール変数のため、fork したワーカープロセスにはコピーオンライトで引き継がれる
+_shared_databases: Dict[Tuple[str, bool, bool], Tuple[Tuple[int, int], Mapping[str, Any]]] = {}
+_shared_databases_lock = threading.Lock()
+
+
+def get_shared_database(database_path: Optional[str] = None, use_snapshot: bool = True,
+                        use_store: bool = True) -> Mapping[str, Any]:
+    """パスごとに共有される読み取り専用の大卦データベースを取得
+
+    登録済みの内容があり、データベースのサイズ・更新時刻が変わっていなければそれを返す。
+    変わっていれば読み込み直して差し替える（ホットリロード）。スレッドセーフ。
+
+    Args:
+        database_path: 大卦データベースのパス（省略時は同梱のデータベース）
+        use_snapshot: Falseの場合はスナップショットを使わない
+        use_store: Falseの場合はテキストストアを使わない
+
+    Returns:
+        データベースの内容（読み取り専用）
+    """
+    database_path = Path(database_path) if database_path is not None else default_database_path()
+    key = (str(database_path.resolve()), use_snapshot, use_store)
+    stamp = _database_stamp(database_path)
+
+    entry = _shared_databases.get(key)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+    with _shared_databases_lock:
+        entry = _shared_databases.get(key)
+        if entry is None or entry[0] != stamp:
+            entry = (stamp, freeze(load_database(database_path, use_snapshot, use_store)))
+            _shared_databases[key] = entry
+        return entry[1]
+
+
+def invalidate_shared_database(database_path: Optional[str] = None) -> None:
+    """共有データベースを破棄（次回の取得時に読み込み直す）
+
+    Args:
+        database_path: 破棄するデータベースのパス（省略時はすべて破棄）
+    """
+    with _shared_databases_lock:
+        if database_path is None:
+            _shared_databases.clear()
+            return
+        resolved = str(Path(database_path).resolve())
+        for key in [key for key in _shared_databases if key[0] == resolved]:
+            del _shared_databases[key]
+
+
+class HexagramIndex:
+    """大卦データベースの整数符号索引
+
+    卦番号 ⇔ 6ビット符号の対応を64要素の配列で持ち、
+    バイナリ・上卦下卦・爻の陰陽による検索と、変卦（之卦・綜卦・互卦・錯卦）の
+    卦番号 → 卦番号の遷移を配列の参照1回で行う。
+    """
+
+    __slots__ = ("codes", "numbers", "changed_numbers", "reversed_numbers", "nuclear_numbers", "inverted_numbers")
+
+    def __init__(self, hexagrams):
+        """
+        Args:
+            hexagrams: 大卦データベースの 'hexagrams'（番号順の64卦）
+
+        Raises:
+            ValueError: 64卦が揃っていない、またはバイナリが重複している場合
+        """
+        if len(hexagrams) != HEXAGRAM_COUNT:
+            raise ValueError(f"卦の数が{HEXAGRAM_COUNT}ではありません: {len(hexagrams)}")
+
+        # 卦番号-1 → 符号、符号 → 卦番号（0は未登録）
+        self.codes = array('B', [0] * HEXAGRAM_COUNT)
+        self.numbers = array('B', [0] * HEXAGRAM_COUNT)
+        for index, hexagram in enumerate(hexagrams):
+            code = binary_to_code(hexagram['バイナリ'])
+            if self.numbers[code]:
+                raise ValueError(f"バイナリが重複しています: {hexagram['バイナリ']}")
+            self.codes[index] = code
+            self.numbers[code] = index + 1
+
+        # 変卦の遷移表を卦番号どうしの表に変換（添字は卦番号-1、之卦は (卦番号-1)*6 + (爻番号-1)）
+        numbers = self.numbers
+        self.changed_numbers = array('B', (numbers[CHANGED_CODES[code * LINE_COUNT + line]]
+                                           for code in self.codes for line in range(LINE_COUNT)))
+        self.reversed_numbers = array('B', (numbers[REVERSED_CODES[code]] for code in self.codes))
+        self.nuclear_numbers = array('B', (numbers[NUCLEAR_CODES[code]] for code in self.codes))
+        self.inverted_numbers = array('B', (numbers[INVERTED_CODES[code]] for code in self.codes))
+
+    def code(self, hexagram_number: int) -> int:
+        """卦番号（1-64）から6ビット符号を取得"""
+        return self.codes[hexagram_number - 1]
+
+    def number(self, code: int) -> int:
+        """6ビット符号から卦番号（1-64）を取得"""
+        return self.numbers[code]
+
+    def number_by_binary(self, binary: str) -> int:
+        """バイナリ文字列（下の爻から並ぶ6桁）から卦番号を取得"""
+        return self.numbers[binary_to_code(binary)]
+
+    def number_by_trigrams(self, upper: int, lower: int) -> int:
+        """上卦・下卦の3ビット符号から卦番号を取得"""
+        return self.numbers[(upper << 3) | lower]
+
+    def upper_trigram(self, hexagram_number: int) -> int:
+        """卦番号から上卦の3ビット符号を取得"""
+        return self.codes[hexagram_number - 1] >> 3
+
+    def lower_trigram(self, hexagram_number: int) -> int:
+        """卦番号から下卦の3ビット符号を取得"""
+        return self.codes[hexagram_number - 1] & 7
+
+    def line_polarity(self, hexagram_number: int, line_number: int) -> int:
+        """卦番号と爻番号（1-6）から爻の陰陽を取得（陽=1、陰=0）"""
+        return (self.codes[hexagram_number - 1] >> (line_number - 1)) & 1
+
+    def changed(self, hexagram_number: int, line_number: int) -> int:
+        """之卦の卦番号（第n爻が変じた卦）"""
+        return self.changed_numbers[(hexagram_number - 1) * LINE_COUNT + line_number - 1]
+
+    def reversed(self, hexagram_number: int) -> int:
+        """綜卦の卦番号（上下反転した卦）"""
+        return self.reversed_numbers[hexagram_number - 1]
+
+    def nuclear(self, hexagram_number: int) -> int:
+        """互卦の卦番号（第2-4爻・第3-5爻から成る卦）"""
+        return self.nuclear_numbers[hexagram_number - 1]
+
+    def inverted(self, hexagram_number: int) -> int:
+        """錯卦の卦番号（全爻の陰陽が反転した卦）"""
+        return self.inverted_numbers[hexagram_number - 1]
+
+    def derived(self, hexagram_number: int, line_number: int) -> Tuple[int, int, int, int]:
+        """(之卦, 綜卦, 互卦, 錯卦) の卦番号"""
+        index = hexagram_number - 1
+        return (self.changed_numbers[index * LINE_COUNT + line_number - 1], self.reversed_numbers[index],
+                self.nuclear_numbers[index], self.inverted_numbers[index])
 
 
 class IChingDivination:
     """周易占断クラス"""
 
-    def __init__(self, database_path: Optional[str] = None):
+    def __init__(self, database_path: Optional[str] = None, use_snapshot: bool = True, shared: bool = True,
+                 metrics: Optional[Any] = None, quiet: bool = False, logger: Optional[logging.Logger] = None,
+                 use_store: bool = True, journal: Optional[Any] = None):
         """
         初期化
 
         Args:
             database_path: 大卦データベースのパス
+            use_snapshot: コンパイル済みスナップショット（大卦データベース.snapshot）が
+                          新しければ使用する。Falseの場合は常にJSONから読み込む
+            shared: Trueの場合はプロセス内で共有される読み取り専用のデータベースを使う。
+                    Falseの場合はこのインスタンス専用に読み込む
+            metrics: 計測シンク（increment / observe を持つオブジェクト。fortune_metrics 参照）
+                     Noneの場合は計測しない
+            quiet: Trueの場合は占断時の口上（至誠通天・至誠無息）を画面に出力しない
+            logger: 口上の出力先ロガー（指定した場合は画面ではなくINFOレベルでロガーへ出力）
+            use_store: mmapで開くテキストストア（大卦データベース.store）があれば使い、卦辞・爻辞を
+                       参照時に解読する。ストアが無いか古ければスナップショットまたはJSONから読み込む
+                       （ストアは compile-store で作る。初期化でファイルを書き込むことはない）
+            journal: 占断記録（record を持つオブジェクト。iching_journal.DivinationJournal 参照）
+                     指定した場合は divine の結果を記録する
         """
         if database_path is None:
             # デフォルトパス
-            current_dir = Path(__file__).parent
-            database_path = current_dir / "大卦データベース.json"
+            database_path = default_database_path()
+
+        self._database_path = Path(database_path)
+        self._use_snapshot = use_snapshot
+        self._use_store = use_store
+        self._shared = shared
+        self.metrics = metrics
+        self.journal = journal
+        self.quiet = quiet
+        self.logger = logger
+        self._attach_database()
 
-        with open(database_path, 'r', encoding='utf-8') as f:
-            self.database = json.load(f)
+    def _attach_database(self) -> None:
+        """データベースを読み込んでこのインスタンスに結び付ける"""
+        self._database_stamp = _database_stamp(self._database_path)
+        if self._shared:
+            self.database = get_shared_database(self._database_path, self._use_snapshot, self._use_store)
+        else:
+            self.database = load_database(self._database_path, self._use_snapshot, self._use_store)
 
         self.hexagrams = self.database['hexagrams']
+        self.index = HexagramIndex(self.hexagrams)
 
-    def get_hexagram_number(self, divination_question: str, context: str) -> int:
+    def reload_database(self) -> bool:
+        """データベースが更新されていれば読み込み直す
+
+        Returns:
+            読み込み直した場合はTrue
         """
-        占的文字列と状況整理から卦番号（1-64）を決定
-        天地人の三才思想に基づき、ハッシュを3分割してXOR演算
+        if _database_stamp(self._database_path) == self._database_stamp:
+            return False
+        self._attach_database()
+        return True
+
+    def _announce(self, message: str) -> None:
+        """占断の口上を出力（ロガーがあればロガーへ、quietなら何もしない）"""
+        if self.logger is not None:
+            self.logger.info(message.strip())
+        elif not self.quiet:
+            print(message)
+
+    def get_question_digest(self, divination_question: str, context: str) -> bytes:
+        """
+        占的文字列と状況整理のSHA256ダイジェストを求める（卦番号の元になる値）
 
         Args:
             divination_question: 占的（明確化された問い）
             context: 状況整理文書（背景情報）※必須
 
         Returns:
-            卦番号（1-64）
+            SHA256ダイジェスト（32バイト）
         """
         # 至誠通天 - 誠の心が天に通じる
-        print("至誠通天 - 誠の心をもって問いを天に届けます")
+        self._announce("至誠通天 - 誠の心をもって問いを天に届けます")
 
-        # 占的と状況整理を結合（状況が個別性を生む）
-        complete_question = f"{divination_question}\n===状況整理===\n{context}"
+        # 占的と状況整理を結合し、UTF-8 → BASE64 → SHA256（安定した分散を得るため）
+        return question_digest(divination_question, context)
 
-        # UTF-8エンコード → BASE64
-        encoded = base64.b64encode(complete_question.encode('utf-8'))
+    def get_hexagram_number(self, divination_question: str, context: str) -> int:
+        """
+        占的文字列と状況整理から卦番号（1-64）を決定
+        天地人の三才思想に基づき、ハッシュを3分割してXOR演算
 
-        # SHA256でハッシュ化（安定した分散を得るため）
-        hash_value = hashlib.sha256(encoded).hexdigest()
+        Args:
+            divination_question: 占的（明確化された問い）
+            context: 状況整理文書（背景情報）※必須
 
-        # 天地人の三才に分割（SHA256は64文字）
-        # 天：最初の16文字（64ビット - 上界の意志）
-        天 = int(hash_value[:16], 16)
+        Returns:
+            卦番号（1-64）
+        """
+        digest = self.get_question_digest(divination_question, context)
 
-        # 地：中間の32文字（128ビット - 天と人を支える基盤）
-        地 = int(hash_value[16:48], 16)
+        # 天地人の三才に分割してXOR演算で統合（天地人の調和）し、64卦へ変換
+        # 天：先頭64ビット（上界の意志）、地：中間128ビット（天と人を支える基盤）、人：末尾64ビット（人間の問い）
+        return hexagram_number_from_digest(digest)
 
-        # 人：最後の16文字（64ビット - 人間の問い）
-        人 = int(hash_value[48:64], 16)
+    def get_hexagram_number_streaming(self, divination_question: str, context: Any,
+                                      chunk_size: int = STREAM_CHUNK_SIZE) -> int:
+        """
+        数MBの文字起こしなど大きな状況整理から、一定のメモリで卦番号（1-64）を決定
 
-        # 三才をXOR演算で統合（天地人の調和）
-        三才統合 = 天 ^ 地 ^ 人
+        get_hexagram_number と同じ卦番号になる（状況整理を結合した文字列・BASE64・
+        ハッシュ入力の全体を作らず、断片ごとにBASE64へ変換してSHA256へ流し込む）。
 
-        # 64卦への変換
-        number = 三才統合 % 64 + 1
+        Args:
+            divination_question: 占的（明確化された問い）
+            context: 状況整理。文字列・バイト列（UTF-8）、ファイルオブジェクト、
+                     または文字列・バイト列の断片の反復可能オブジェクト
+            chunk_size: ファイルから1回に読む量
 
-        return number
+        Returns:
+            卦番号（1-64）
+        """
+        # 至誠通天 - 誠の心が天に通じる
+        self._announce("至誠通天 - 誠の心をもって問いを天に届けます")
+
+        hasher = HexagramHasher(divination_question)
+        for chunk in iter_context_chunks(context, chunk_size):
+            hasher.update(chunk)
+        return hasher.hexagram_number()
 
     def get_line_number(self, timestamp: Optional[float] = None) -> int:
         """
@@ -89,15 +946,10 @@ class IChingDivination:
         if timestamp is None:
             timestamp = time.time()
 
-        # ミリ秒単位に変換
-        timestamp_ms = int(timestamp * 1000)
-
-        # mod6で0-5、+1で1-6に変換
-        line_number = timestamp_ms % 6 + 1
-
-        return line_number
+        # ミリ秒単位に変換し、mod6で0-5、+1で1-6に変換
+        return line_number_from_timestamp(timestamp)
 
-    def get_hexagram_data(self, hexagram_number: int) -> Dict[str, Any]:
+    def get_hexagram_data(self, hexagram_number: int) -> Mapping[str, Any]:
         """
         卦番号から卦データを取得
 
@@ -105,13 +957,13 @@ class IChingDivination:
             hexagram_number: 卦番号（1-64）
 
         Returns:
-            卦データ
+            卦データ（共有データベースの場合は読み取り専用）
         """
         # 番号は1始まり、配列は0始まり
         hexagram = self.hexagrams[hexagram_number - 1]
         return hexagram
 
-    def get_line_data(self, hexagram_number: int, line_number: int) -> Dict[str, Any]:
+    def get_line_data(self, hexagram_number: int, line_number: int) -> Mapping[str, Any]:
         """
         卦番号と爻番号から爻データを取得
 
@@ -120,14 +972,89 @@ class IChingDivination:
             line_number: 爻番号（1-6）
 
         Returns:
-            爻データ
+            爻データ（共有データベースの場合は読み取り専用）
         """
         hexagram = self.get_hexagram_data(hexagram_number)
         # 爻番号も1始まり、配列は0始まり
         line = hexagram['爻'][line_number - 1]
         return line
 
-    def divine(self, divination_question: str, context: str, timestamp: Optional[float] = None) -> Dict[str, Any]:
+    def describe_hexagram(self, hexagram_number: int) -> Dict[str, Any]:
+        """
+        卦番号から占断結果の '得卦' と同じ形の辞書を作成
+
+        Args:
+            hexagram_number: 卦番号（1-64）
+
+        Returns:
+            {'番号', '名前', '読み', 'シンボル', 'バイナリ', '卦辞', '上卦', '下卦'} の辞書
+        """
+        hexagram_data = self.get_hexagram_data(hexagram_number)
+
+        # 八卦の分析（整数符号の上位3ビットが上卦＝第4-6爻、下位3ビットが下卦＝第1-3爻）
+        code = self.index.code(hexagram_number)
+
+        return {
+            '番号': hexagram_number,
+            '名前': hexagram_data['名前'],
+            '読み': hexagram_data['読み'],
+            'シンボル': hexagram_data['シンボル'],
+            'バイナリ': hexagram_data['バイナリ'],
+            '卦辞': hexagram_data['卦辞'],
+            # 八卦の対応表（結果は呼び出し側で変更できるよう複製して返す）
+            '上卦': dict(TRIGRAM_TABLE[code >> 3]),
+            '下卦': dict(TRIGRAM_TABLE[code & 7])
+        }
+
+    def get_derived_hexagrams(self, hexagram_number: int, line_number: int) -> Dict[str, Dict[str, Any]]:
+        """
+        本卦と変爻から変卦（之卦・綜卦・互卦・錯卦）を求める
+
+        遷移表を引くだけなので、変卦4つの算出は卦番号の参照4回で済む。
+
+        Args:
+            hexagram_number: 本卦の卦番号（1-64）
+            line_number: 変爻の番号（1-6、下から数える）
+
+        Returns:
+            {'之卦': {...}, '綜卦': {...}, '互卦': {...}, '錯卦': {...}}
+            各値は describe_hexagram の辞書に '象意'（変卦としての意味）を加えたもの
+        """
+        derived = {}
+        for kind, number in zip(DERIVED_HEXAGRAM_MEANINGS, self.index.derived(hexagram_number, line_number)):
+            description = self.describe_hexagram(number)
+            description['象意'] = DERIVED_HEXAGRAM_MEANINGS[kind]
+            derived[kind] = description
+        return derived
+
+    def find_hexagram_by_binary(self, binary: str) -> Optional[Mapping[str, Any]]:
+        """
+        バイナリ文字列から卦データを取得（変卦の計算結果から卦を引く場合など）
+
+        Args:
+            binary: 下の爻から並べた6桁の2進数文字列（例："100010" → 水雷屯）
+
+        Returns:
+            卦データ（該当がなければNone）
+        """
+        if len(binary) != LINE_COUNT or binary.strip('01'):
+            return None
+        return self.hexagrams[self.index.number_by_binary(binary) - 1]
+
+    def get_trigram_data(self, trigram_code: int) -> Mapping[str, str]:
+        """
+        八卦の3ビット符号から八卦の情報を取得
+
+        Args:
+            trigram_code: 0-7（下の爻が第0ビット。例：1 → 震）
+
+        Returns:
+            {'名前': str, '象意': str, '性質': str}（読み取り専用）
+        """
+        return TRIGRAM_TABLE[trigram_code]
+
+    def divine(self, divination_question: str, context: str, timestamp: Optional[float] = None,
+               derived: bool = False) -> Dict[str, Any]:
         """
         占断を実行
 
@@ -135,6 +1062,7 @@ class IChingDivination:
             divination_question: 占的（明確化された問い）
             context: 状況整理文書（背景情報）※必須
             timestamp: Unixタイムスタンプ（省略時は現在時刻）
+            derived: Trueの場合は得爻を変爻とする変卦（之卦・綜卦・互卦・錯卦）も返す
 
         Returns:
             占断結果の辞書。以下の構造を持つ：
@@ -160,44 +1088,43 @@ class IChingDivination:
                     '名前': str,  # 例：'六五'
                     '陰陽': str,  # '陰' または '陽'
                     '爻辞': str   # 原文の爻辞
+                },
+                '変卦': {  # derived=Trueの場合のみ
+                    '之卦': dict,  # '得卦' と同じ項目に '象意' を加えたもの
+                    '綜卦': dict,
+                    '互卦': dict,
+                    '錯卦': dict
                 }
             }
         """
         # 至誠無息 - 誠の心は休むことなく続く
-        print("\n至誠無息 - 誠実な問いには誠実な答えが返ります\n")
+        self._announce("\n至誠無息 - 誠実な問いには誠実な答えが返ります\n")
+
+        # 計測（シンクがなければ時刻も取らない）
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.increment("iching_divine_calls_total")
+            started = time.perf_counter()
 
         # 占機（時刻）の記録
         if timestamp is None:
             timestamp = time.time()
         divination_time = datetime.fromtimestamp(timestamp)
 
-        # 卦番号と爻番号の算出
-        hexagram_number = self.get_hexagram_number(divination_question, context)
+        # 卦番号と爻番号の算出（ダイジェストは占断記録の索引にも使う）
+        digest = self.get_question_digest(divination_question, context)
+        hexagram_number = hexagram_number_from_digest(digest)
+        if metrics is not None:
+            hashed = time.perf_counter()
+            metrics.observe("iching_divine_stage_seconds", hashed - started, stage="hash")
         line_number = self.get_line_number(timestamp)
 
-        # データ取得
-        hexagram_data = self.get_hexagram_data(hexagram_number)
+        # データ取得（卦・八卦・爻）
+        hexagram_result = self.describe_hexagram(hexagram_number)
         line_data = self.get_line_data(hexagram_number, line_number)
-
-        # 八卦の分析（バイナリ表現から上卦・下卦を導出）
-        binary = hexagram_data['バイナリ']
-        upper_trigram = binary[:3]  # 上卦（上位3ビット）
-        lower_trigram = binary[3:]  # 下卦（下位3ビット）
-
-        # 八卦の対応表
-        trigrams = {
-            '111': {'名前': '乾', '象意': '天', '性質': '剛健'},
-            '110': {'名前': '兌', '象意': '沢', '性質': '悦楽'},
-            '101': {'名前': '離', '象意': '火', '性質': '明智'},
-            '100': {'名前': '震', '象意': '雷', '性質': '震動'},
-            '011': {'名前': '巽', '象意': '風', '性質': '柔順'},
-            '010': {'名前': '坎', '象意': '水', '性質': '険難'},
-            '001': {'名前': '艮', '象意': '山', '性質': '静止'},
-            '000': {'名前': '坤', '象意': '地', '性質': '柔順'}
-        }
-
-        upper_trigram_data = trigrams.get(upper_trigram, {})
-        lower_trigram_data = trigrams.get(lower_trigram, {})
+        if metrics is not None:
+            looked_up = time.perf_counter()
+            metrics.observe("iching_divine_stage_seconds", looked_up - hashed, stage="lookup")
 
         # 結果を構造化
         result = {
@@ -207,16 +1134,7 @@ class IChingDivination:
             },
             '占的': divination_question,
             '状況整理': context,
-            '得卦': {
-                '番号': hexagram_number,
-                '名前': hexagram_data['名前'],
-                '読み': hexagram_data['読み'],
-                'シンボル': hexagram_data['シンボル'],
-                'バイナリ': hexagram_data['バイナリ'],
-                '卦辞': hexagram_data['卦辞'],
-                '上卦': upper_trigram_data,
-                '下卦': lower_trigram_data
-            },
+            '得卦': hexagram_result,
             '得爻': {
                 '番号': line_number,
                 '名前': line_data['名前'],
@@ -225,6 +1143,77 @@ class IChingDivination:
             }
         }
 
+        # 変卦（得爻を変爻とする）
+        if derived:
+            result['変卦'] = self.get_derived_hexagrams(hexagram_number, line_number)
+
+        # 占断記録（キューに積むだけで、書き込みは記録側のスレッドがまとめて行う）
+        if self.journal is not None:
+            self.journal.record(digest, timestamp, hexagram_number, line_number, divination_question, context)
+
+        if metrics is not None:
+            finished = time.perf_counter()
+            metrics.observe("iching_divine_stage_seconds", finished - looked_up, stage="format")
+            metrics.observe("iching_divine_stage_seconds", finished - started, stage="total")
+
+        return result
+
+    def divine_many(self, items: Iterable[Tuple[str, str, Optional[float]]], derived: bool = False) -> Dict[str, array]:
+        """複数の占断をまとめて行うバッチ版divine（画面出力・日時整形・辞書の組み立てなし）
+
+        卦番号と爻番号だけを求めてコンパクトな配列で返す。卦辞・爻辞などは
+        get_hexagram_data / get_line_data で番号から引く（共有データベースなので複製されない）。
+        各項目の結果は divine(占的, 状況整理, タイムスタンプ) の '得卦'・'得爻' の番号と一致する。
+
+        Args:
+            items: (占的, 状況整理, タイムスタンプ) の並び
+                   タイムスタンプがNoneの項目はその時点の現在時刻を使う
+            derived: Trueの場合は変卦（之卦・綜卦・互卦・錯卦）の卦番号の列も返す
+
+        Returns:
+            {
+                '卦番号': array('B'),  # 1-64
+                '爻番号': array('B'),  # 1-6
+                '之卦': array('B'), '綜卦': array('B'), '互卦': array('B'), '錯卦': array('B')  # derived=Trueの場合のみ
+            }
+        """
+        metrics = self.metrics
+        if metrics is not None:
+            started = time.perf_counter()
+
+        # 属性参照をループの外へ出す
+        sha256 = hashlib.sha256
+        b64encode = base64.b64encode
+        question_format = QUESTION_FORMAT.format
+        now = time.time
+        hexagram_numbers = array('B')
+        line_numbers = array('B')
+        add_hexagram = hexagram_numbers.append
+        add_line = line_numbers.append
+
+        for divination_question, context, timestamp in items:
+            digest = sha256(b64encode(question_format(divination_question, context).encode('utf-8'))).digest()
+            add_hexagram(((digest[7] ^ digest[23] ^ digest[31]) & 63) + 1)
+            if timestamp is None:
+                timestamp = now()
+            add_line(int(timestamp * 1000) % 6 + 1)
+
+        result = {'卦番号': hexagram_numbers, '爻番号': line_numbers}
+
+        # 変卦は遷移表から列ごとにまとめて引く
+        if derived:
+            index = self.index
+            changed = index.changed_numbers
+            result['之卦'] = array('B', (changed[(number - 1) * LINE_COUNT + line - 1]
+                                        for number, line in zip(hexagram_numbers, line_numbers)))
+            for kind, table in (('綜卦', index.reversed_numbers), ('互卦', index.nuclear_numbers),
+                                ('錯卦', index.inverted_numbers)):
+                result[kind] = array('B', (table[number - 1] for number in hexagram_numbers))
+
+        if metrics is not None:
+            metrics.increment("iching_divine_batch_items_total", len(hexagram_numbers))
+            metrics.observe("iching_divine_stage_seconds", time.perf_counter() - started, stage="batch")
+
         return result
 
     def format_result(self, result: Dict[str, Any]) -> str:
@@ -262,13 +1251,54 @@ class IChingDivination:
         得爻 = result['得爻']
         lines.append(f"【得爻】第{得爻['番号']}爻 - {得爻['名前']}（{得爻['陰陽']}）")
         lines.append(f"爻辞：{得爻['爻辞']}")
+
+        if '変卦' in result:
+            lines.append("")
+            lines.append("【変卦】")
+            for kind, 変卦 in result['変卦'].items():
+                lines.append(f"{kind}：{変卦['番号']}. {変卦['名前']}（{変卦['読み']}）- {変卦['象意']}")
         lines.append("=" * 60)
 
         return "\n".join(lines)
 
 
+def run_command(argv: List[str]) -> int:
+    """サブコマンドを実行
+
+    Args:
+        argv: コマンドライン引数（サブコマンド以降）
+
+    Returns:
+        終了コード
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="iching_divination.py", description="周易占断ツール")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    snapshot_parser = subparsers.add_parser("compile-snapshot", help="大卦データベースをスナップショットにコンパイル")
+    snapshot_parser.add_argument("--database", help="大卦データベースのパス（省略時は同梱のJSON）")
+    snapshot_parser.add_argument("--output", help="出力先（省略時はデータベースと同じ場所の .snapshot）")
+
+    store_parser = subparsers.add_parser("compile-store", help="大卦データベースをmmap用のテキストストアに変換")
+    store_parser.add_argument("--database", help="大卦データベースのパス（省略時は同梱のJSON）")
+    store_parser.add_argument("--output", help="出力先（省略時はデータベースと同じ場所の .store）")
+
+    args = parser.parse_args(argv)
+    if args.command == "compile-snapshot":
+        output_path = compile_snapshot(args.database, args.output)
+        print(f"スナップショットを作成しました：{output_path}")
+    elif args.command == "compile-store":
+        output_path = compile_text_store(args.database, args.output)
+        print(f"テキストストアを作成しました：{output_path}")
+    return 0
+
+
 def main():
-    """直接実行時の警告とガイダンス"""
+    """直接実行時の警告とガイダンス（サブコマンド指定時はそのコマンドを実行）"""
+    if len(sys.argv) > 1:
+        return run_command(sys.argv[1:])
+
     print("=" * 80)
     print("WARNING: Direct Execution Mode / 警告：直接実行モード")
     print("=" * 80)
@@ -312,4 +1342,4 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,693 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+周易占断記録 - Divination Journal
+
+IChingDivination.divine の結果（占機・得卦・得爻・占的・状況整理）を追記専用の
+セグメントファイルに記録し、占的と状況整理のSHA256ダイジェスト
+（get_hexagram_number が卦を求めるのと同じ値）で過去の占断を引けるようにする。
+
+    journal = DivinationJournal("占断記録")
+    divination = IChingDivination(journal=journal)
+    divination.divine(占的, 状況整理)
+    journal.lookup(占的, 状況整理)          # 同じ問いの過去の占断（新しい順）
+    journal.scan(start, end)                # 期間内の占断（占機の順）
+    journal.compact(before=..., keep_latest=...)
+
+書き込みはグループコミット方式：record() はキューに積むだけで、記録用のスレッドが
+commit_interval ごと（または commit_batch 件たまるごと）にまとめて書き込む。
+同じ占的・状況整理の本文は最初の1回だけ保存し、以降の記録はダイジェストで参照する（重複排除）。
+1つの記録ディレクトリに書き込むのは1プロセスだけとする。
+
+セグメントファイル journal-NNNNNN.seg（リトルエンディアン）：
+    ヘッダ    : マジック(4) / 版数(u16) / 予約(2) / セグメント番号(u32)
+    レコード  : 本文長(u32) / CRC32(u32) / 占機(f64) / 卦番号(u8) / 爻番号(u8) / フラグ(u8) / 予約(1) /
+                ダイジェスト(32) / 本文（フラグに本文ありの場合：占的のバイト数(u32) + 占的 + 状況整理）
+索引ファイル journal-NNNNNN.idx（セグメントと同じ大きさの時だけ使い、違えばセグメントを読み直す）：
+    ヘッダ    : マジック(4) / 版数(u16) / 予約(2) / 記録数(u32) / セグメントの大きさ(u64) /
+                最古・最新の占機(f64×2) / 本体のCRC32(u32)
+    本体      : 索引キー(u64) / 占機(f64) / 卦番号(u8) / 爻番号(u8) / フラグ(u8) / レコード位置(u32) の列
+索引キーはダイジェストの先頭8バイト。本文を読む際はレコードのダイジェスト全体と照合する。
+"""
+
+import argparse
+import atexit
+import os
+import struct
+import sys
+import threading
+import zlib
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+from iching_divination import question_digest
+
+
+SEGMENT_MAGIC = b"ICHJ"
+SEGMENT_VERSION = 1
+SEGMENT_HEADER = struct.Struct("<4sHxxI")
+RECORD_PREFIX = struct.Struct("<II")  # 本文長 / CRC32（以降のレコード全体）
+RECORD_BODY = struct.Struct("<dBBBx32s")  # 占機 / 卦番号 / 爻番号 / フラグ / ダイジェスト
+TEXT_HEADER = struct.Struct("<I")  # 占的のバイト数
+FLAG_TEXT = 0x01  # 本文（占的・状況整理）を持つレコード
+
+INDEX_MAGIC = b"ICJX"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<4sHxxIQddI")
+
+# 索引の列（型コード）。セグメントの索引ファイルもこの順に並べる
+INDEX_COLUMNS = (("keys", 'Q'), ("timestamps", 'd'), ("hexagrams", 'B'), ("lines", 'B'), ("flags", 'B'),
+                 ("offsets", 'I'))
+
+SEGMENT_SIZE = 4 << 20  # この大きさを超えたら次のセグメントへ
+COMMIT_INTERVAL = 0.005  # グループコミットの待ち時間（秒）
+COMMIT_BATCH = 256  # この件数たまったら待たずに書き込む
+
+# 圧縮中の目印（旧セグメント番号と新セグメント番号を記録。起動時に残っていれば圧縮を完了させる）
+COMPACTION_MARKER = "COMPACTING"
+
+
+def segment_key(digest: bytes) -> int:
+    """ダイジェストから索引キー（先頭8バイトの整数）を取得"""
+    return int.from_bytes(digest[:8], 'little')
+
+
+def encode_record(digest: bytes, timestamp: float, hexagram_number: int, line_number: int,
+                  text: Optional[Tuple[str, str]] = None) -> bytes:
+    """1件分のレコードを作成
+
+    Args:
+        digest: 占的と状況整理のSHA256ダイジェスト
+        timestamp: 占機（Unixタイムスタンプ）
+        hexagram_number: 卦番号（1-64）
+        line_number: 爻番号（1-6）
+        text: (占的, 状況整理)。Noneの場合は本文を持たない（同じダイジェストの記録が既にある）
+
+    Returns:
+        レコードのバイト列
+    """
+    if text is None:
+        payload = b""
+        flags = 0
+    else:
+        question = text[0].encode('utf-8')
+        payload = TEXT_HEADER.pack(len(question)) + question + text[1].encode('utf-8')
+        flags = FLAG_TEXT
+    body = RECORD_BODY.pack(timestamp, hexagram_number, line_number, flags, digest) + payload
+    return RECORD_PREFIX.pack(len(payload), zlib.crc32(body)) + body
+
+
+def decode_text(payload: bytes) -> Tuple[str, str]:
+    """レコードの本文を (占的, 状況整理) に戻す"""
+    question_length, = TEXT_HEADER.unpack_from(payload, 0)
+    start = TEXT_HEADER.size
+    return (payload[start:start + question_length].decode('utf-8'),
+            payload[start + question_length:].decode('utf-8'))
+
+
+def scan_segment(data: bytes) -> Tuple[Dict[str, array], int]:
+    """セグメントの内容からレコードの索引列を作る
+
+    途中で切れたレコードやCRCが一致しないレコード以降は読まない
+    （書き込み中に停止した場合の末尾の破損）。
+
+    Args:
+        data: セグメントファイルの内容
+
+    Returns:
+        (索引列, 正しく読めた末尾の位置)
+    """
+    columns = {name: array(typecode) for name, typecode in INDEX_COLUMNS}
+    offset = SEGMENT_HEADER.size
+    end = len(data)
+    prefix_size = RECORD_PREFIX.size
+    body_size = RECORD_BODY.size
+    while offset + prefix_size + body_size <= end:
+        payload_length, checksum = RECORD_PREFIX.unpack_from(data, offset)
+        record_end = offset + prefix_size + body_size + payload_length
+        if record_end > end or zlib.crc32(data[offset + prefix_size:record_end]) != checksum:
+            break
+        timestamp, hexagram_number, line_number, flags, digest = RECORD_BODY.unpack_from(data, offset + prefix_size)
+        columns["keys"].append(segment_key(digest))
+        columns["timestamps"].append(timestamp)
+        columns["hexagrams"].append(hexagram_number)
+        columns["lines"].append(line_number)
+        columns["flags"].append(flags)
+        columns["offsets"].append(offset)
+        offset = record_end
+    return columns, offset
+
+
+@dataclass
+class JournalEntry:
+    """記録された占断1件"""
+    timestamp: float
+    hexagram_number: int
+    line_number: int
+    question: str
+    context: str
+    digest: bytes
+
+    @property
+    def datetime(self) -> datetime:
+        """占機の日時"""
+        return datetime.fromtimestamp(self.timestamp)
+
+
+@dataclass
+class CompactionStats:
+    """圧縮の結果"""
+    records_before: int = 0
+    records_after: int = 0
+    segments_before: int = 0
+    segments_after: int = 0
+    bytes_before: int = 0
+    bytes_after: int = 0
+
+
+class DivinationJournal:
+    """追記専用の占断記録（セグメントファイル + ダイジェスト索引）
+
+    索引は記録ごとの列（索引キー・占機・卦番号・爻番号・フラグ・セグメント・位置）を
+    配列で持ち、同じ索引キーの記録は「前の記録番号」の列でつないで新しい順にたどる。
+    IChingDivination(journal=...) の record() 呼び出しはキューに積むだけで、
+    ロックもファイル操作も行わない。
+    """
+
+    def __init__(self, directory: str, segment_size: int = SEGMENT_SIZE, commit_interval: float = COMMIT_INTERVAL,
+                 commit_batch: int = COMMIT_BATCH, durable: bool = False):
+        """
+        Args:
+            directory: 記録ディレクトリ（無ければ作成）
+            segment_size: セグメントを切り替える大きさ（バイト）
+            commit_interval: グループコミットの待ち時間（秒）
+            commit_batch: この件数たまったら待たずに書き込む
+            durable: Trueの場合は書き込みのたびに fsync する（電源断でも失われない）
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.segment_size = segment_size
+        self.commit_interval = commit_interval
+        self.commit_batch = commit_batch
+        self.durable = durable
+
+        self._lock = threading.RLock()  # 索引・ファイルの保護（record() は取らない）
+        self._queue: deque = deque()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._closed = False
+        self._active: Optional[BinaryIO] = None
+        self._readers: Dict[int, BinaryIO] = {}
+        self._load()
+
+        self._writer = threading.Thread(target=self._run_writer, name="divination-journal", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    # ===== 索引 =====
+
+    def _segment_path(self, number: int, suffix: str = ".seg") -> Path:
+        return self.directory / f"journal-{number:06d}{suffix}"
+
+    def _segment_numbers(self) -> List[int]:
+        """ディレクトリ内のセグメント番号（昇順）"""
+        return sorted(int(path.stem.split("-")[1]) for path in self.directory.glob("journal-*.seg"))
+
+    def _reset_index(self) -> None:
+        for name, typecode in INDEX_COLUMNS:
+            setattr(self, "_" + name, array(typecode))
+        self._segments = array('I')  # 記録番号 → セグメント番号
+        self._previous = array('l')  # 記録番号 → 同じ索引キーの1つ前の記録番号（無ければ-1）
+        self._latest: Dict[int, int] = {}  # 索引キー → 最新の記録番号
+        self._text_holders: Dict[int, int] = {}  # 索引キー → 本文を持つ記録番号
+        self._spans: Dict[int, List] = {}  # セグメント番号 → [最初の記録番号, 末尾の記録番号+1, 最古の占機, 最新の占機]
+
+    def _add_rows(self, number: int, columns: Dict[str, array]) -> None:
+        """1セグメント分の索引列を追加"""
+        first = len(self._keys)
+        for name, _ in INDEX_COLUMNS:
+            getattr(self, "_" + name).extend(columns[name])
+        count = len(columns["keys"])
+        self._segments.extend(array('I', [number]) * count)
+
+        latest = self._latest
+        text_holders = self._text_holders
+        previous = self._previous
+        for record_number, key, flags in zip(range(first, first + count), columns["keys"], columns["flags"]):
+            previous.append(latest.get(key, -1))
+            latest[key] = record_number
+            if flags & FLAG_TEXT and key not in text_holders:
+                text_holders[key] = record_number
+
+        span = self._spans.setdefault(number, [first, first, float("inf"), float("-inf")])
+        span[1] = first + count
+        if count:
+            span[2] = min(span[2], min(columns["timestamps"]))
+            span[3] = max(span[3], max(columns["timestamps"]))
+
+    def _read_segment_index(self, number: int) -> Optional[Dict[str, array]]:
+        """セグメントの索引ファイルを読む（無い・壊れている・セグメントと大きさが違う場合はNone）"""
+        try:
+            data = self._segment_path(number, ".idx").read_bytes()
+            segment_bytes = self._segment_path(number).stat().st_size
+        except OSError:
+            return None
+        if len(data) < INDEX_HEADER.size:
+            return None
+        magic, version, count, size, _, _, checksum = INDEX_HEADER.unpack_from(data, 0)
+        body = data[INDEX_HEADER.size:]
+        if magic != INDEX_MAGIC or version != INDEX_VERSION or size != segment_bytes or zlib.crc32(body) != checksum:
+            return None
+
+        columns = {}
+        offset = 0
+        for name, typecode in INDEX_COLUMNS:
+            column = array(typecode)
+            length = count * column.itemsize
+            column.frombytes(body[offset:offset + length])
+            columns[name] = column
+            offset += length
+        return columns if offset == len(body) else None
+
+    def _write_segment_index(self, number: int) -> None:
+        """セグメントの索引ファイルを書く（次回の起動時にセグメントを読み直さずに済む）"""
+        first, end, oldest, newest = self._spans.get(number, [0, 0, 0.0, 0.0])
+        body = b"".join(getattr(self, "_" + name)[first:end].tobytes() for name, _ in INDEX_COLUMNS)
+        header = INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, end - first, self._segment_path(number).stat().st_size,
+                                   oldest if end > first else 0.0, newest if end > first else 0.0, zlib.crc32(body))
+        path = self._segment_path(number, ".idx")
+        temp_path = path.with_name(path.name + ".tmp")
+        with open(temp_path, 'wb') as f:
+            f.write(header)
+            f.write(body)
+        os.replace(temp_path, path)
+
+    def _load(self) -> None:
+        """記録ディレクトリから索引を作り、書き込み先のセグメントを開く"""
+        self._recover_compaction()
+        self._reset_index()
+        numbers = self._segment_numbers()
+        for number in numbers:
+            columns = self._read_segment_index(number)
+            if columns is None:
+                path = self._segment_path(number)
+                data = path.read_bytes()
+                columns, valid_end = scan_segment(data)
+                if valid_end < len(data) and number == numbers[-1]:
+                    # 書き込み途中で止まった末尾を切り詰める
+                    with open(path, 'r+b') as f:
+                        f.truncate(valid_end)
+                self._add_rows(number, columns)
+                if number != numbers[-1]:
+                    self._write_segment_index(number)
+            else:
+                self._add_rows(number, columns)
+
+        if numbers and self._segment_path(numbers[-1]).stat().st_size < self.segment_size:
+            self._open_active(numbers[-1])
+        else:
+            self._open_active(numbers[-1] + 1 if numbers else 1)
+
+    def _open_active(self, number: int) -> None:
+        """書き込み先のセグメントを開く（新しいセグメントにはヘッダを書く）"""
+        path = self._segment_path(number)
+        self._active = open(path, 'ab')
+        self._active_number = number
+        self._active_size = self._active.tell()
+        if self._active_size < SEGMENT_HEADER.size:
+            self._active.truncate(0)
+            self._active.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, number))
+            self._active.flush()
+            self._active_size = SEGMENT_HEADER.size
+        self._spans.setdefault(number, [len(self._keys), len(self._keys), float("inf"), float("-inf")])
+
+    def _roll(self) -> None:
+        """書き込み先のセグメントを閉じて索引ファイルを書き、次のセグメントへ切り替える"""
+        self._active.close()
+        self._write_segment_index(self._active_number)
+        self._open_active(self._active_number + 1)
+
+    # ===== 書き込み（グループコミット） =====
+
+    def record(self, digest: bytes, timestamp: float, hexagram_number: int, line_number: int,
+               divination_question: str, context: str) -> None:
+        """占断を記録する（キューに積むだけで、書き込みは記録用のスレッドが行う）
+
+        Args:
+            digest: 占的と状況整理のSHA256ダイジェスト（IChingDivination.get_question_digest の値）
+            timestamp: 占機（Unixタイムスタンプ）
+            hexagram_number: 卦番号（1-64）
+            line_number: 爻番号（1-6）
+            divination_question: 占的
+            context: 状況整理
+        """
+        if self._closed:
+            raise ValueError("占断記録は閉じられています")
+        self._queue.append((digest, timestamp, hexagram_number, line_number, divination_question, context))
+        # 記録用のスレッドが起きていなければ起こす（キューの長さで判断すると、複数のスレッドが同時に積んだ時に
+        # 誰も起こさないことがある。積んでから確かめるので、起こさなかった記録も clear() 後の書き込みで拾われる）
+        if not self._wake.is_set():
+            self._wake.set()
+
+    def _run_writer(self) -> None:
+        """記録用のスレッド：起こされたら commit_interval だけ待ってからまとめて書き込む"""
+        while not self._stop.is_set():
+            self._wake.wait()
+            if len(self._queue) < self.commit_batch:
+                self._stop.wait(self.commit_interval)
+            self._wake.clear()
+            self._commit()
+
+    def _commit(self) -> None:
+        """キューの記録をまとめて書き込み、索引に反映する"""
+        with self._lock:
+            items = []
+            queue = self._queue
+            while True:
+                try:
+                    items.append(queue.popleft())
+                except IndexError:
+                    break
+            if not items or self._active is None:
+                return
+            if self._active_size >= self.segment_size:
+                self._roll()
+
+            # 同じ問いの本文は最初の1回だけ保存する（このまとめ書きの中での重複も含む）
+            chunks = []
+            columns = {name: array(typecode) for name, typecode in INDEX_COLUMNS}
+            stored = set()
+            offset = self._active_size
+            for digest, timestamp, hexagram_number, line_number, question, context in items:
+                key = segment_key(digest)
+                has_text = key not in self._text_holders and key not in stored
+                if has_text:
+                    stored.add(key)
+                record = encode_record(digest, timestamp, hexagram_number, line_number,
+                                       (question, context) if has_text else None)
+                columns["keys"].append(key)
+                columns["timestamps"].append(timestamp)
+                columns["hexagrams"].append(hexagram_number)
+                columns["lines"].append(line_number)
+                columns["flags"].append(FLAG_TEXT if has_text else 0)
+                columns["offsets"].append(offset)
+                chunks.append(record)
+                offset += len(record)
+
+            self._active.write(b"".join(chunks))
+            self._active.flush()
+            if self.durable:
+                os.fsync(self._active.fileno())
+            self._active_size = offset
+            self._add_rows(self._active_number, columns)
+
+    def flush(self) -> None:
+        """キューに残っている記録をすぐに書き込む"""
+        self._commit()
+
+    def close(self) -> None:
+        """残りの記録を書き込んで閉じる（書き込み先のセグメントの索引ファイルも書く）"""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self._wake.set()
+        self._writer.join()
+        with self._lock:
+            self._commit()
+            if self._active is not None:
+                self._active.close()
+                self._write_segment_index(self._active_number)
+                self._active = None
+            for reader in self._readers.values():
+                reader.close()
+            self._readers.clear()
+        atexit.unregister(self.close)
+
+    def __enter__(self) -> "DivinationJournal":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        self.flush()
+        return len(self._keys)
+
+    # ===== 読み出し =====
+
+    def _read_record(self, record_number: int) -> Tuple[bytes, bytes]:
+        """記録番号のレコードから (ダイジェスト, 本文) を読む"""
+        number = self._segments[record_number]
+        reader = self._readers.get(number)
+        if reader is None:
+            reader = self._readers[number] = open(self._segment_path(number), 'rb')
+        reader.seek(self._offsets[record_number])
+        payload_length, checksum = RECORD_PREFIX.unpack(reader.read(RECORD_PREFIX.size))
+        body = reader.read(RECORD_BODY.size + payload_length)
+        if zlib.crc32(body) != checksum:
+            raise ValueError(f"占断記録が壊れています: {self._segment_path(number)} @ {self._offsets[record_number]}")
+        return RECORD_BODY.unpack_from(body, 0)[4], body[RECORD_BODY.size:]
+
+    def _text(self, key: int) -> Tuple[bytes, str, str]:
+        """索引キーの (ダイジェスト, 占的, 状況整理)"""
+        digest, payload = self._read_record(self._text_holders[key])
+        return (digest,) + decode_text(payload)
+
+    def _entries(self, record_numbers: List[int]) -> List[JournalEntry]:
+        """記録番号の並びを JournalEntry の並びにする（本文は索引キーごとに1回だけ読む）"""
+        texts: Dict[int, Tuple[bytes, str, str]] = {}
+        entries = []
+        for record_number in record_numbers:
+            key = self._keys[record_number]
+            text = texts.get(key)
+            if text is None:
+                text = texts[key] = self._text(key)
+            digest, question, context = text
+            entries.append(JournalEntry(self._timestamps[record_number], self._hexagrams[record_number],
+                                        self._lines[record_number], question, context, digest))
+        return entries
+
+    def lookup_digest(self, digest: bytes, limit: Optional[int] = None) -> List[JournalEntry]:
+        """ダイジェストが同じ過去の占断を新しい順に取得
+
+        Args:
+            digest: 占的と状況整理のSHA256ダイジェスト
+            limit: 最大件数（Noneの場合はすべて）
+
+        Returns:
+            記録された占断（記録の新しい順）
+        """
+        self.flush()
+        with self._lock:
+            key = segment_key(digest)
+            record_number = self._latest.get(key, -1)
+            if record_number < 0 or self._text(key)[0] != digest:
+                return []
+            record_numbers = []
+            while record_number >= 0 and (limit is None or len(record_numbers) < limit):
+                record_numbers.append(record_number)
+                record_number = self._previous[record_number]
+            return self._entries(record_numbers)
+
+    def lookup(self, divination_question: str, context: str, limit: Optional[int] = None) -> List[JournalEntry]:
+        """同じ占的・状況整理の過去の占断を新しい順に取得
+
+        Args:
+            divination_question: 占的
+            context: 状況整理
+            limit: 最大件数（Noneの場合はすべて）
+
+        Returns:
+            記録された占断（記録の新しい順）
+        """
+        return self.lookup_digest(question_digest(divination_question, context), limit)
+
+    def scan(self, start: Optional[float] = None, end: Optional[float] = None) -> List[JournalEntry]:
+        """占機が期間内の占断を占機の順に取得
+
+        セグメントごとの最古・最新の占機で、期間に重ならないセグメントは読まない。
+
+        Args:
+            start: 期間の始め（Unixタイムスタンプ、この値を含む。Noneの場合は制限なし）
+            end: 期間の終わり（Unixタイムスタンプ、この値を含まない。Noneの場合は制限なし）
+
+        Returns:
+            記録された占断（占機の古い順）
+        """
+        self.flush()
+        low = float("-inf") if start is None else start
+        high = float("inf") if end is None else end
+        with self._lock:
+            timestamps = self._timestamps
+            record_numbers = []
+            for first, last, oldest, newest in self._spans.values():
+                if first == last or newest < low or oldest >= high:
+                    continue
+                record_numbers.extend(record_number for record_number in range(first, last)
+                                      if low <= timestamps[record_number] < high)
+            record_numbers.sort(key=timestamps.__getitem__)
+            return self._entries(record_numbers)
+
+    # ===== 圧縮 =====
+
+    def compact(self, before: Optional[float] = None, keep_latest: Optional[int] = None) -> CompactionStats:
+        """古い記録を除いてセグメントを詰め直す
+
+        残す記録を新しい番号のセグメントに書き出してから古いセグメントを削除する。
+        途中で停止しても、次回の起動時に目印のファイルから圧縮を完了させるか取り消す。
+
+        Args:
+            before: この占機より前の記録を除く（Noneの場合は期間で除かない）
+            keep_latest: 同じ問いの記録を新しい方からこの件数だけ残す（Noneの場合は件数で除かない）
+
+        Returns:
+            圧縮の結果
+        """
+        with self._lock:
+            self._commit()
+            old_numbers = self._segment_numbers()
+            stats = CompactionStats(records_before=len(self._keys), segments_before=len(old_numbers),
+                                    bytes_before=sum(self._segment_path(number).stat().st_size
+                                                     for number in old_numbers))
+
+            # 残す記録を選ぶ（新しい記録から数えて keep_latest 件まで）
+            keep = bytearray(len(self._keys))
+            for key, record_number in self._latest.items():
+                kept = 0
+                while record_number >= 0 and (keep_latest is None or kept < keep_latest):
+                    if before is None or self._timestamps[record_number] >= before:
+                        keep[record_number] = 1
+                        kept += 1
+                    record_number = self._previous[record_number]
+
+            # 新しいセグメントへ書き出す（本文は残る記録のうち最初のものに付け直す）
+            self._active.close()
+            self._active = None
+            next_number = old_numbers[-1] + 1 if old_numbers else 1
+            new_numbers = []
+            output = None
+            size = 0
+            texts: Dict[int, Tuple[bytes, str, str]] = {}
+            for record_number in range(len(self._keys)):
+                if not keep[record_number]:
+                    continue
+                if output is None or size >= self.segment_size:
+                    if output is not None:
+                        output.close()
+                    new_numbers.append(next_number + len(new_numbers))
+                    output = open(self._segment_path(new_numbers[-1], ".seg.tmp"), 'wb')
+                    output.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, new_numbers[-1]))
+                    size = SEGMENT_HEADER.size
+                key = self._keys[record_number]
+                text = texts.get(key)
+                if text is None:
+                    text = texts[key] = self._text(key)
+                    payload = text[1:]
+                else:
+                    payload = None
+                record = encode_record(text[0], self._timestamps[record_number], self._hexagrams[record_number],
+                                       self._lines[record_number], payload)
+                output.write(record)
+                size += len(record)
+            if output is not None:
+                output.close()
+            for number in new_numbers:
+                with open(self._segment_path(number, ".seg.tmp"), 'rb') as f:
+                    os.fsync(f.fileno())
+
+            # 目印を書いてから入れ替える（ここ以降に停止した場合は起動時に完了させる）
+            for reader in self._readers.values():
+                reader.close()
+            self._readers.clear()
+            marker = self.directory / COMPACTION_MARKER
+            with open(marker, 'w', encoding='utf-8') as f:
+                f.write(" ".join(map(str, old_numbers)) + "\n" + " ".join(map(str, new_numbers)) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self._recover_compaction()
+
+            self._load()
+            for number in new_numbers[:-1]:
+                self._write_segment_index(number)
+            stats.records_after = len(self._keys)
+            stats.segments_after = len(self._segment_numbers())
+            stats.bytes_after = sum(self._segment_path(number).stat().st_size for number in self._segment_numbers())
+            return stats
+
+    def _recover_compaction(self) -> None:
+        """圧縮の目印が残っていれば入れ替えを完了させ、目印より前の一時ファイルは削除する"""
+        marker = self.directory / COMPACTION_MARKER
+        if marker.exists():
+            lines = marker.read_text(encoding='utf-8').splitlines()
+            old_numbers = [int(value) for value in lines[0].split()] if lines else []
+            new_numbers = [int(value) for value in lines[1].split()] if len(lines) > 1 else []
+            for number in new_numbers:
+                temp_path = self._segment_path(number, ".seg.tmp")
+                if temp_path.exists():
+                    os.replace(temp_path, self._segment_path(number))
+            for number in old_numbers:
+                for suffix in (".seg", ".idx"):
+                    try:
+                        self._segment_path(number, suffix).unlink()
+                    except FileNotFoundError:
+                        pass
+            marker.unlink()
+        for temp_path in self.directory.glob("journal-*.tmp"):
+            temp_path.unlink()
+
+
+def main() -> int:
+    """占断記録の参照（lookup / scan / compact / stats）"""
+    parser = argparse.ArgumentParser(description="周易占断記録の参照")
+    parser.add_argument("directory", help="記録ディレクトリ")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    lookup_parser = subparsers.add_parser("lookup", help="同じ占的・状況整理の過去の占断")
+    lookup_parser.add_argument("question", help="占的")
+    lookup_parser.add_argument("context", help="状況整理")
+    lookup_parser.add_argument("-n", "--limit", type=int, help="最大件数")
+
+    scan_parser = subparsers.add_parser("scan", help="期間内の占断")
+    scan_parser.add_argument("--since", help="期間の始め（YYYY-MM-DD または YYYY-MM-DDTHH:MM:SS）")
+    scan_parser.add_argument("--until", help="期間の終わり（この日時を含まない）")
+
+    compact_parser = subparsers.add_parser("compact", help="古い記録を除いて詰め直す")
+    compact_parser.add_argument("--before", help="この日時より前の記録を除く")
+    compact_parser.add_argument("--keep-latest", type=int, help="同じ問いの記録を新しい方からこの件数だけ残す")
+
+    subparsers.add_parser("stats", help="記録の件数とセグメント")
+
+    args = parser.parse_args()
+
+    def parse_time(value: Optional[str]) -> Optional[float]:
+        return datetime.fromisoformat(value).timestamp() if value else None
+
+    with DivinationJournal(args.directory) as journal:
+        if args.command == "lookup":
+            entries = journal.lookup(args.question, args.context, args.limit)
+        elif args.command == "scan":
+            entries = journal.scan(parse_time(args.since), parse_time(args.until))
+        elif args.command == "compact":
+            stats = journal.compact(parse_time(args.before), args.keep_latest)
+            print(f"記録 {stats.records_before} → {stats.records_after}件・"
+                  f"セグメント {stats.segments_before} → {stats.segments_after}・"
+                  f"{stats.bytes_before:,} → {stats.bytes_after:,}バイト")
+            return 0
+        else:
+            print(f"記録 {len(journal)}件・問い {len(journal._latest)}件・セグメント {len(journal._segment_numbers())}")
+            return 0
+
+        for entry in entries:
+            print(f"{entry.datetime:%Y-%m-%d %H:%M:%S}  {entry.hexagram_number:2d}卦 第{entry.line_number}爻  "
+                  f"{entry.question}")
+        print(f"{len(entries)}件")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+卦爻の一様性監査（モンテカルロ）
+
+三才のXOR統合による卦番号（get_hexagram_number）と、タイムスタンプのmod6による
+爻番号（get_line_number）が、64卦×6爻 = 384通りに偏りなく出るかを確かめる。
+
+固定シードで合成した (占的, 状況整理, タイムスタンプ) を大量に作り、
+シャードに分けてプロセスプールで並列に divine_many へ通し、
+卦と爻の組をC実装のカウンタ（zip と Counter）で一括集計する。
+集計から次を報告する。
+
+- 64卦×6爻の同時分布、卦（64通り）、爻（6通り）それぞれのカイ二乗値・自由度・p値
+- セルごとの標準化残差（(観測-期待)/√期待）が大きいものの一覧
+- 抜き取った入力について divine_many と get_hexagram_number / get_line_number の一致
+
+いずれかのp値が有意水準を下回るか、残差が補正後の棄却限界を超えるか、
+抜き取り検査で不一致があれば終了コード1を返すため、
+ハッシュの手順を変更した際の定期検査として使える。シャードの乱数はシャード番号から
+決まるため、ワーカー数を変えても同じ件数なら結果は同じになる。
+
+使用例：
+    python iching_uniformity_audit.py --samples 2000000
+    python iching_uniformity_audit.py --samples 500000 --json audit.json
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from iching_divination import HEXAGRAM_COUNT, LINE_COUNT, IChingDivination
+
+
+CELL_COUNT = HEXAGRAM_COUNT * LINE_COUNT   # 384通り
+DEFAULT_SAMPLES = 1_000_000
+DEFAULT_SHARD_SIZE = 100_000
+DEFAULT_ALPHA = 0.001
+DEFAULT_VERIFY_SAMPLES = 2000
+TIMESTAMP_BASE = 1_600_000_000.0           # 合成タイムスタンプの始点（2020年9月）
+TIMESTAMP_SPAN = 400_000_000.0             # 合成タイムスタンプの幅（約12.7年）
+
+# 合成する状況整理の文面（シャードごとの乱数で組み合わせて個別性を出す）
+CONTEXT_FRAGMENTS = (
+    "転職を検討している", "新規事業の立ち上げ", "家族との関係", "健康上の不安",
+    "取引先との交渉", "引っ越しの時期", "資格試験の準備", "チームの人間関係",
+    "投資の判断", "結婚の時期", "研究テーマの選定", "店舗の移転",
+)
+
+
+# ===== 合成データ =====
+
+def shard_random(seed: int, shard_index: int) -> random.Random:
+    """シャード番号から決まる乱数生成器（ワーカー数によらず同じ入力を作る）"""
+    return random.Random(seed * 1_000_003 + shard_index)
+
+
+def generate_items(seed: int, shard_index: int, count: int) -> List[Tuple[str, str, float]]:
+    """シャード1つ分の合成入力（占的, 状況整理, タイムスタンプ）を作成"""
+    rng = shard_random(seed, shard_index)
+    getrandbits = rng.getrandbits
+    fragments = CONTEXT_FRAGMENTS
+    fragment_count = len(fragments)
+    span = TIMESTAMP_SPAN
+    base = TIMESTAMP_BASE
+    uniform = rng.random
+    return [
+        (
+            f"占的{shard_index}-{i}-{getrandbits(32):08x}",
+            f"{fragments[getrandbits(16) % fragment_count]}。{getrandbits(64):016x}",
+            base + uniform() * span,
+        )
+        for i in range(count)
+    ]
+
+
+# ===== 集計（ワーカーで実行） =====
+
+_worker_divination: Optional[IChingDivination] = None
+
+
+def _divination() -> IChingDivination:
+    """ワーカーごとに1つの易占エンジン（口上は出さない）"""
+    global _worker_divination
+    if _worker_divination is None:
+        _worker_divination = IChingDivination(quiet=True)
+    return _worker_divination
+
+
+def tally_cells(hexagram_numbers: Sequence[int], line_numbers: Sequence[int]) -> List[int]:
+    """卦×爻の384セルの出現数を数える
+
+    zip と Counter はどちらもC実装のため、(卦, 爻) の組の生成と計数は
+    1件ごとにPythonのバイトコードを実行せずに一括で行われる。
+
+    Returns:
+        添字 (卦-1)*6 + (爻-1) の出現数のリスト
+    """
+    counts = [0] * CELL_COUNT
+    for (hexagram, line), count in Counter(zip(hexagram_numbers, line_numbers)).items():
+        counts[(hexagram - 1) * LINE_COUNT + line - 1] = count
+    return counts
+
+
+def audit_shard(seed: int, shard_index: int, count: int) -> List[int]:
+    """シャード1つを合成・占断・集計して384セルの出現数を返す"""
+    items = generate_items(seed, shard_index, count)
+    columns = _divination().divine_many(items)
+    return tally_cells(columns['卦番号'], columns['爻番号'])
+
+
+def verify_sample(seed: int, count: int) -> int:
+    """抜き取った入力で divine_many と1件ずつの算出が一致するか確認し、不一致件数を返す"""
+    divination = _divination()
+    items = generate_items(seed, -1, count)
+    columns = divination.divine_many(items)
+    mismatches = 0
+    for (question, context, timestamp), hexagram, line in zip(items, columns['卦番号'], columns['爻番号']):
+        if (divination.get_hexagram_number(question, context) != hexagram
+                or divination.get_line_number(timestamp) != line):
+            mismatches += 1
+    return mismatches
+
+
+# ===== 統計 =====
+
+def regularized_gamma_q(a: float, x: float) -> float:
+    """正則化上側不完全ガンマ関数 Q(a, x)（級数展開と連分数展開）"""
+    if x <= 0:
+        return 1.0
+    log_prefix = -x + a * math.log(x) - math.lgamma(a)
+    if x < a + 1:
+        # P(a, x) の級数展開
+        term = total = 1.0 / a
+        n = a
+        for _ in range(10000):
+            n += 1
+            term *= x / n
+            total += term
+            if abs(term) < abs(total) * 1e-15:
+                break
+        return max(0.0, 1.0 - total * math.exp(log_prefix))
+    # Q(a, x) の連分数展開（修正Lentz法）
+    tiny = 1e-300
+    b = x + 1 - a
+    c = 1 / tiny
+    d = 1 / b
+    h = d
+    for i in range(1, 10000):
+        an = -i * (i - a)
+        b += 2
+        d = an * d + b
+        if abs(d) < tiny:
+            d = tiny
+        c = b + an / c
+        if abs(c) < tiny:
+            c = tiny
+        d = 1 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1) < 1e-15:
+            break
+    return math.exp(log_prefix) * h
+
+
+def chi_square_p_value(statistic: float, degrees_of_freedom: int) -> float:
+    """カイ二乗分布の上側確率"""
+    return regularized_gamma_q(degrees_of_freedom / 2, statistic / 2)
+
+
+@dataclass
+class ChiSquareResult:
+    """一様分布に対するカイ二乗検定の結果"""
+    statistic: float
+    degrees_of_freedom: int
+    p_value: float
+
+
+def chi_square_uniform(counts: Sequence[int]) -> ChiSquareResult:
+    """出現数が一様分布に従うかのカイ二乗検定"""
+    total = sum(counts)
+    expected = total / len(counts)
+    statistic = sum((observed - expected) ** 2 for observed in counts) / expected if expected else 0.0
+    degrees_of_freedom = len(counts) - 1
+    return ChiSquareResult(statistic, degrees_of_freedom, chi_square_p_value(statistic, degrees_of_freedom))
+
+
+@dataclass
+class CellDeviation:
+    """セル1つの偏り"""
+    hexagram: int          # 卦番号（1-64）
+    line: int              # 爻番号（1-6）
+    observed: int
+    expected: float
+    residual: float        # 標準化残差 (観測-期待)/√期待
+
+
+@dataclass
+class AuditReport:
+    """一様性監査の結果"""
+    samples: int
+    seed: int
+    workers: int
+    seconds: float
+    joint: ChiSquareResult
+    hexagram: ChiSquareResult
+    line: ChiSquareResult
+    max_abs_residual: float
+    residual_threshold: float   # ボンフェローニ補正した両側の棄却限界（|残差|がこれを超えたら偏り）
+    worst_cells: List[CellDeviation] = field(default_factory=list)
+    verify_samples: int = 0
+    verify_mismatches: int = 0
+    alpha: float = DEFAULT_ALPHA
+
+    @property
+    def samples_per_second(self) -> float:
+        return self.samples / self.seconds if self.seconds else 0.0
+
+    @property
+    def passed(self) -> bool:
+        """全ての検定で有意な偏りがなく、抜き取り検査も一致したか"""
+        return (min(self.joint.p_value, self.hexagram.p_value, self.line.p_value) >= self.alpha
+                and self.max_abs_residual <= self.residual_threshold
+                and self.verify_mismatches == 0)
+
+    def to_dict(self) -> Dict:
+        """JSONに保存できる辞書に変換"""
+        result = asdict(self)
+        result["samples_per_second"] = self.samples_per_second
+        result["passed"] = self.passed
+        return result
+
+
+def normal_upper_quantile(p: float) -> float:
+    """標準正規分布の上側p点（二分法で erfc を逆算）"""
+    low, high = 0.0, 40.0
+    for _ in range(200):
+        middle = (low + high) / 2
+        if 0.5 * math.erfc(middle / math.sqrt(2)) > p:
+            low = middle
+        else:
+            high = middle
+    return (low + high) / 2
+
+
+def build_report(counts: Sequence[int], seed: int, workers: int, seconds: float, alpha: float,
+                 worst: int = 10) -> AuditReport:
+    """384セルの出現数から監査結果を作成"""
+    total = sum(counts)
+    expected = total / CELL_COUNT
+    hexagram_counts = [sum(counts[h * LINE_COUNT:(h + 1) * LINE_COUNT]) for h in range(HEXAGRAM_COUNT)]
+    line_counts = [sum(counts[l::LINE_COUNT]) for l in range(LINE_COUNT)]
+
+    deviations = [
+        CellDeviation(cell // LINE_COUNT + 1, cell % LINE_COUNT + 1, observed, expected,
+                      (observed - expected) / math.sqrt(expected) if expected else 0.0)
+        for cell, observed in enumerate(counts)
+    ]
+    deviations.sort(key=lambda deviation: -abs(deviation.residual))
+
+    return AuditReport(
+        samples=total,
+        seed=seed,
+        workers=workers,
+        seconds=seconds,
+        joint=chi_square_uniform(counts),
+        hexagram=chi_square_uniform(hexagram_counts),
+        line=chi_square_uniform(line_counts),
+        max_abs_residual=abs(deviations[0].residual) if deviations else 0.0,
+        residual_threshold=normal_upper_quantile(alpha / (2 * CELL_COUNT)),
+        worst_cells=deviations[:worst],
+        alpha=alpha,
+    )
+
+
+# ===== 実行 =====
+
+def default_workers() -> int:
+    """このプロセスが使えるCPU数（ワーカー数の既定値）"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+def run_audit(samples: int = DEFAULT_SAMPLES, seed: int = 0, workers: Optional[int] = None,
+              shard_size: int = DEFAULT_SHARD_SIZE, alpha: float = DEFAULT_ALPHA,
+              verify_samples: int = DEFAULT_VERIFY_SAMPLES) -> AuditReport:
+    """一様性監査を実行
+
+    Args:
+        samples: 合成する入力の件数
+        seed: 乱数シード
+        workers: ワーカープロセス数（Noneの場合はCPU数、1の場合はこのプロセスで実行）
+        shard_size: 1シャードの件数
+        alpha: 有意水準
+        verify_samples: divine_many と1件ずつの算出を突き合わせる件数
+
+    Returns:
+        監査結果
+
+    Raises:
+        ValueError: 件数・1シャードの件数が1未満の場合（0件では検定できず、空の集計が合格に見えてしまう）
+    """
+    if samples < 1:
+        raise ValueError(f"件数（samples）は1以上にしてください：{samples}")
+    if shard_size < 1:
+        raise ValueError(f"1シャードの件数（shard_size）は1以上にしてください：{shard_size}")
+    workers = workers or default_workers()
+    shards = [(seed, index, min(shard_size, samples - start))
+              for index, start in enumerate(range(0, samples, shard_size))]
+
+    started = time.perf_counter()
+    counts = [0] * CELL_COUNT
+    if workers == 1:
+        partials = (audit_shard(*shard) for shard in shards)
+        for partial in partials:
+            counts = [a + b for a, b in zip(counts, partial)]
+        mismatches = verify_sample(seed, verify_samples) if verify_samples else 0
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            verification = pool.submit(verify_sample, seed, verify_samples) if verify_samples else None
+            for partial in pool.map(audit_shard, *zip(*shards)):
+                counts = [a + b for a, b in zip(counts, partial)]
+            mismatches = verification.result() if verification else 0
+    seconds = time.perf_counter() - started
+
+    report = build_report(counts, seed, workers, seconds, alpha)
+    report.verify_samples = verify_samples
+    report.verify_mismatches = mismatches
+    return report
+
+
+def format_report(report: AuditReport) -> str:
+    """監査結果を読みやすい形式に整形"""
+    divination = _divination()
+    lines = [
+        "=" * 60,
+        "卦爻の一様性監査",
+        "=" * 60,
+        f"件数：{report.samples:,}（シード {report.seed}、ワーカー {report.workers}）",
+        f"所要時間：{report.seconds:.2f}秒（{report.samples_per_second:,.0f}件/秒）",
+        f"有意水準：{report.alpha}",
+        "",
+    ]
+    for label, result in (("卦×爻（384通り）", report.joint), ("卦（64通り）", report.hexagram),
+                          ("爻（6通り）", report.line)):
+        verdict = "偏りなし" if result.p_value >= report.alpha else "偏りあり"
+        lines.append(f"{label}：χ²={result.statistic:.1f}（自由度{result.degrees_of_freedom}）"
+                     f" p={result.p_value:.4f} → {verdict}")
+    lines.append("")
+    lines.append(f"標準化残差の最大：{report.max_abs_residual:.2f}"
+                 f"（棄却限界 {report.residual_threshold:.2f}、ボンフェローニ補正）")
+    for deviation in report.worst_cells:
+        name = divination.get_hexagram_data(deviation.hexagram)['名前']
+        lines.append(f"  {deviation.hexagram:2d}.{name} 第{deviation.line}爻："
+                     f"観測 {deviation.observed:,} / 期待 {deviation.expected:,.1f}（残差 {deviation.residual:+.2f}）")
+    if report.verify_samples:
+        lines.append("")
+        lines.append(f"抜き取り検査：{report.verify_samples:,}件中 不一致 {report.verify_mismatches}件")
+    lines.append("")
+    lines.append("判定：" + ("合格" if report.passed else "不合格"))
+    lines.append("=" * 60)
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """コマンドラインから監査を実行（不合格なら終了コード1）"""
+    parser = argparse.ArgumentParser(description="卦爻（64卦×6爻）の一様性をモンテカルロで監査する")
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLES, help=f"合成する件数（既定: {DEFAULT_SAMPLES:,}）")
+    parser.add_argument("--seed", type=int, default=0, help="乱数シード（既定: 0）")
+    parser.add_argument("--workers", type=int, default=None, help="ワーカー数（既定: CPU数）")
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE,
+                        help=f"1シャードの件数（既定: {DEFAULT_SHARD_SIZE:,}）")
+    parser.add_argument("--alpha", type=float, default=DEFAULT_ALPHA, help=f"有意水準（既定: {DEFAULT_ALPHA}）")
+    parser.add_argument("--verify-samples", type=int, default=DEFAULT_VERIFY_SAMPLES,
+                        help=f"1件ずつの算出と突き合わせる件数（既定: {DEFAULT_VERIFY_SAMPLES}）")
+    parser.add_argument("--json", dest="json_path", help="結果をJSONで保存するパス")
+    args = parser.parse_args(argv)
+    if args.samples < 1:
+        parser.error("--samples は1以上にしてください")
+    if args.shard_size < 1:
+        parser.error("--shard-size は1以上にしてください")
+
+    report = run_audit(args.samples, args.seed, args.workers, args.shard_size, args.alpha, args.verify_samples)
+    print(format_report(report))
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report.to_dict(), f, ensure_ascii=False, indent=2)
+    return 0 if report.passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
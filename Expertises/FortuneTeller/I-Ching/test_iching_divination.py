@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+周易占断エンジン（iching_divination）のテスト
+
+整数符号から引く上卦・下卦が、大卦データベースのバイナリ（第1爻から第6爻の順）と
+一致すること（上下が入れ替わっていないこと）と、変卦（之卦・綜卦・互卦・錯卦）の遷移表が
+変卦仕様_append.md のバイナリ文字列の算出方法と一致することを確かめる。
+
+    python -m unittest discover -s Expertises/FortuneTeller/I-Ching -p "test_*.py"
+"""
+
+import json
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from iching_divination import TRIGRAM_TABLE, TRIGRAMS, IChingDivination  # noqa: E402
+
+
+DATABASE_PATH = Path(__file__).resolve().parent / "大卦データベース.json"
+
+
+# 変卦仕様_append.md の算出方法（バイナリ文字列のまま計算する。遷移表の検算用）
+
+def calculate_zhigua(original_binary: str, line_number: int) -> str:
+    """之卦：変爻の陰陽を反転"""
+    binary_list = list(original_binary)
+    index = line_number - 1
+    binary_list[index] = '0' if binary_list[index] == '1' else '1'
+    return ''.join(binary_list)
+
+
+def calculate_zonggua(original_binary: str) -> str:
+    """綜卦：上下反転"""
+    return original_binary[::-1]
+
+
+def calculate_hugua(original_binary: str) -> str:
+    """互卦：第2-4爻を下卦、第3-5爻を上卦"""
+    return original_binary[1:4] + original_binary[2:5]
+
+
+def calculate_cuogua(original_binary: str) -> str:
+    """錯卦：全爻の陰陽を反転"""
+    return ''.join(['0' if bit == '1' else '1' for bit in original_binary])
+
+
+def load_hexagrams():
+    """大卦データベース（JSON）の64卦を番号順に読み込む（エンジンの索引を介さない）"""
+    with open(DATABASE_PATH, "r", encoding="utf-8") as f:
+        return json.load(f)["hexagrams"]
+
+
+class TrigramOrientationTest(unittest.TestCase):
+    """上卦・下卦の向き"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.divination = IChingDivination(quiet=True)
+        cls.hexagrams = load_hexagrams()
+
+    def test_known_hexagram(self):
+        # 3.水雷屯：上卦が坎（水）、下卦が震（雷）
+        description = self.divination.describe_hexagram(3)
+        self.assertEqual(description["名前"], "水雷屯")
+        self.assertEqual((description["上卦"]["名前"], description["下卦"]["名前"]), ("坎", "震"))
+        self.assertEqual((description["上卦"]["象意"], description["下卦"]["象意"]), ("水", "雷"))
+
+        # 27.山雷頤：上卦が艮（山）、下卦が震（雷）
+        description = self.divination.describe_hexagram(27)
+        self.assertEqual((description["上卦"]["名前"], description["下卦"]["名前"]), ("艮", "震"))
+
+    def test_trigrams_match_database_binary(self):
+        # バイナリは下の爻から並ぶので、先頭3桁が下卦、末尾3桁が上卦
+        self.assertEqual(len(self.hexagrams), 64)
+        for hexagram in self.hexagrams:
+            number, binary = hexagram["番号"], hexagram["バイナリ"]
+            code = self.divination.index.code(number)
+            with self.subTest(number=number, name=hexagram["名前"]):
+                self.assertEqual(TRIGRAM_TABLE[code >> 3], TRIGRAMS[binary[3:]])
+                self.assertEqual(TRIGRAM_TABLE[code & 7], TRIGRAMS[binary[:3]])
+
+                description = self.divination.describe_hexagram(number)
+                self.assertEqual(description["上卦"], dict(TRIGRAMS[binary[3:]]))
+                self.assertEqual(description["下卦"], dict(TRIGRAMS[binary[:3]]))
+                # 卦名は上卦の象意、下卦の象意の順（八純卦は「八卦名 為 象意」）
+                upper, lower = TRIGRAMS[binary[3:]], TRIGRAMS[binary[:3]]
+                if upper is lower:
+                    self.assertEqual(hexagram["名前"], upper["名前"] + "為" + upper["象意"])
+                else:
+                    self.assertTrue(hexagram["名前"].startswith(upper["象意"] + lower["象意"]))
+
+
+
+class DerivedHexagramTest(unittest.TestCase):
+    """変卦の遷移表"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.divination = IChingDivination(quiet=True)
+        cls.hexagrams = load_hexagrams()
+        # バイナリ → 卦番号（データベースから直接引く）
+        cls.number_by_binary = {hexagram["バイナリ"]: hexagram["番号"] for hexagram in cls.hexagrams}
+
+    def derived_names(self, hexagram_number: int, line_number: int):
+        derived = self.divination.get_derived_hexagrams(hexagram_number, line_number)
+        return {kind: (description["番号"], description["名前"]) for kind, description in derived.items()}
+
+    def test_specification_example(self):
+        # 変卦仕様_append.md の実装例：27.山雷頤（"100001"）の第3爻
+        self.assertEqual(self.derived_names(27, 3), {
+            "之卦": (22, "山火賁"),
+            "綜卦": (27, "山雷頤"),
+            "互卦": (2, "坤為地"),
+            "錯卦": (28, "沢風大過"),
+        })
+        self.assertEqual(calculate_zhigua("100001", 3), "101001")
+        self.assertEqual(self.number_by_binary["101001"], 22)
+
+    def test_specification_applications(self):
+        # 変卦仕様_append.md の易断への応用の例
+        names = {hexagram["名前"]: hexagram["番号"] for hexagram in self.hexagrams}
+        index = self.divination.index
+        self.assertEqual(index.changed(names["乾為天"], 5), names["火天大有"])
+        self.assertEqual(index.reversed(names["沢水困"]), names["水風井"])
+        self.assertEqual(index.nuclear(names["地沢臨"]), names["地雷復"])
+        self.assertEqual(index.inverted(names["水火既済"]), names["火水未済"])
+
+    def test_tables_match_string_algorithms(self):
+        index = self.divination.index
+        for hexagram in self.hexagrams:
+            number, binary = hexagram["番号"], hexagram["バイナリ"]
+            with self.subTest(number=number, name=hexagram["名前"]):
+                for line_number in range(1, 7):
+                    expected = self.number_by_binary[calculate_zhigua(binary, line_number)]
+                    self.assertEqual(index.changed(number, line_number), expected, f"第{line_number}爻")
+                self.assertEqual(index.reversed(number), self.number_by_binary[calculate_zonggua(binary)])
+                self.assertEqual(index.nuclear(number), self.number_by_binary[calculate_hugua(binary)])
+                self.assertEqual(index.inverted(number), self.number_by_binary[calculate_cuogua(binary)])
+
+    def test_divine_many_derived_columns(self):
+        items = [(f"占的{i}", f"状況{i}", 1700000000.0 + i * 0.001) for i in range(60)]
+        columns = self.divination.divine_many(items, derived=True)
+        for hexagram_number, line_number, *derived in zip(columns["卦番号"], columns["爻番号"], columns["之卦"],
+                                                         columns["綜卦"], columns["互卦"], columns["錯卦"]):
+            binary = self.hexagrams[hexagram_number - 1]["バイナリ"]
+            self.assertEqual(derived, [self.number_by_binary[calculate_zhigua(binary, line_number)],
+                                       self.number_by_binary[calculate_zonggua(binary)],
+                                       self.number_by_binary[calculate_hugua(binary)],
+                                       self.number_by_binary[calculate_cuogua(binary)]])
+
+
+if __name__ == "__main__":
+    unittest.main()
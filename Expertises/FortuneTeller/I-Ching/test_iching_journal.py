@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+周易占断記録（iching_journal）のテスト
+
+書き込み途中・圧縮途中で停止した場合の復旧と、索引ファイルの再利用の条件を確かめる。
+
+    python -m unittest discover -s Expertises/FortuneTeller/I-Ching -p "test_*.py"
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import iching_journal  # noqa: E402
+from iching_divination import question_digest  # noqa: E402
+from iching_journal import COMPACTION_MARKER, DivinationJournal, encode_record  # noqa: E402
+
+
+BASE_TIME = 1700000000.0
+
+
+def fill(journal: DivinationJournal, count: int, questions: int = 5) -> None:
+    """占断を count 件記録（問いは questions 通り、占機は1秒ずつ進める。10件ごとに書き込む）"""
+    for i in range(count):
+        question, context = "転職の成否", f"状況{i % questions}"
+        journal.record(question_digest(question, context), BASE_TIME + i, i % 64 + 1, i % 6 + 1, question, context)
+        if i % 10 == 9:
+            journal.flush()
+    journal.flush()
+
+
+def abandon(journal: DivinationJournal) -> None:
+    """プロセスが停止した状態を再現（後始末をせずに記録用のスレッドだけ止める）"""
+    journal._closed = True
+    journal._stop.set()
+    journal._wake.set()
+    journal._writer.join()
+    if journal._active is not None:
+        journal._active.close()
+    for reader in journal._readers.values():
+        reader.close()
+
+
+class DivinationJournalRecoveryTest(unittest.TestCase):
+    """停止・破損からの復旧"""
+
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)  # 記録を閉じた後に削除する（後始末は登録の逆順）
+        self.directory = Path(temp.name)
+
+    def open(self, **kwargs) -> DivinationJournal:
+        journal = DivinationJournal(str(self.directory), commit_interval=0.001, **kwargs)
+        self.addCleanup(journal.close)
+        return journal
+
+    def segment_files(self, suffix: str = ".seg"):
+        return sorted(path.name for path in self.directory.glob(f"journal-*{suffix}"))
+
+    def test_torn_tail_is_truncated(self):
+        journal = self.open()
+        fill(journal, 20)
+        abandon(journal)
+
+        # 最後のレコードを書きかけで止まった状態にする
+        path = self.directory / "journal-000001.seg"
+        valid_size = path.stat().st_size
+        partial = encode_record(question_digest("途中", "途中"), BASE_TIME, 1, 1, ("途中", "途中"))
+        with open(path, "ab") as f:
+            f.write(partial[:len(partial) // 2])
+
+        journal = self.open()
+        self.assertEqual(len(journal), 20)
+        self.assertEqual(path.stat().st_size, valid_size)
+
+        # 切り詰めた位置から書き足せる
+        fill(journal, 3)
+        journal.close()
+        journal = self.open()
+        self.assertEqual(len(journal), 23)
+        self.assertEqual(len(journal.lookup("転職の成否", "状況0")), 5)
+
+    def test_compaction_marker_is_replayed(self):
+        journal = self.open(segment_size=2048)
+        fill(journal, 100)
+        journal.close()
+        old_segments = self.segment_files()
+        self.assertGreater(len(old_segments), 1)
+
+        # 目印を書いた直後（入れ替えの前）に停止させる
+        recover = DivinationJournal._recover_compaction
+
+        def crash_on_marker(journal_self):
+            if (journal_self.directory / COMPACTION_MARKER).exists():
+                raise KeyboardInterrupt
+            recover(journal_self)
+
+        journal = self.open(segment_size=2048)
+        with mock.patch.object(DivinationJournal, "_recover_compaction", crash_on_marker):
+            with self.assertRaises(KeyboardInterrupt):
+                journal.compact(keep_latest=2)
+        abandon(journal)
+        self.assertTrue((self.directory / COMPACTION_MARKER).exists())
+        self.assertTrue(self.segment_files(".seg.tmp"))
+
+        # 起動時に入れ替えを完了させる
+        journal = self.open(segment_size=2048)
+        self.assertFalse((self.directory / COMPACTION_MARKER).exists())
+        self.assertEqual(self.segment_files(".seg.tmp"), [])
+        self.assertTrue(set(old_segments).isdisjoint(self.segment_files()))
+        self.assertEqual(len(journal), 10)
+        entries = journal.lookup("転職の成否", "状況3")
+        self.assertEqual([entry.timestamp for entry in entries], [BASE_TIME + 98, BASE_TIME + 93])
+
+    def test_leftover_temp_segments_are_removed(self):
+        journal = self.open()
+        fill(journal, 10)
+        journal.close()
+
+        # 目印を書く前に停止した圧縮の書き出し（古いセグメントを残して破棄する）
+        (self.directory / "journal-000002.seg.tmp").write_bytes(b"half written")
+        (self.directory / "journal-000001.idx.tmp").write_bytes(b"half written")
+
+        journal = self.open()
+        self.assertEqual(len(journal), 10)
+        self.assertEqual(self.segment_files(".tmp"), [])
+        self.assertEqual(self.segment_files(), ["journal-000001.seg"])
+
+    def test_index_is_reused_only_when_size_matches(self):
+        journal = self.open()
+        fill(journal, 10)
+        journal.close()
+        self.assertEqual(self.segment_files(".idx"), ["journal-000001.idx"])
+
+        # 大きさが一致する索引ファイルはそのまま使う（セグメントを読み直さない）
+        with mock.patch.object(iching_journal, "scan_segment", wraps=iching_journal.scan_segment) as scan:
+            journal = self.open()
+            self.assertEqual(len(journal), 10)
+        scan.assert_not_called()
+        journal.close()
+
+        # 索引ファイルを書く前に追記されたセグメントは読み直す
+        with open(self.directory / "journal-000001.seg", "ab") as f:
+            f.write(encode_record(question_digest("追記", "追記"), BASE_TIME + 50, 2, 3, ("追記", "追記")))
+        with mock.patch.object(iching_journal, "scan_segment", wraps=iching_journal.scan_segment) as scan:
+            journal = self.open()
+            self.assertEqual(len(journal), 11)
+        scan.assert_called_once()
+        self.assertEqual(journal.lookup("追記", "追記")[0].hexagram_number, 2)
+
+    def test_compact_before_and_keep_latest(self):
+        journal = self.open(segment_size=2048)
+        fill(journal, 100)
+
+        stats = journal.compact(before=BASE_TIME + 50)
+        self.assertEqual((stats.records_before, stats.records_after), (100, 50))
+        self.assertEqual(min(entry.timestamp for entry in journal.scan()), BASE_TIME + 50)
+
+        stats = journal.compact(keep_latest=3)
+        self.assertEqual((stats.records_before, stats.records_after), (50, 15))
+        entries = journal.lookup("転職の成否", "状況1")
+        self.assertEqual([entry.timestamp for entry in entries], [BASE_TIME + 96, BASE_TIME + 91, BASE_TIME + 86])
+        # 本文を持っていた古い記録を除いても本文は引ける
+        self.assertEqual((entries[-1].question, entries[-1].context), ("転職の成否", "状況1"))
+
+        # 両方の条件を同時に指定（期間内の記録から新しい方に数える）
+        stats = journal.compact(before=BASE_TIME + 95, keep_latest=1)
+        self.assertEqual(stats.records_after, 5)
+        self.assertEqual(sorted(entry.timestamp for entry in journal.scan()),
+                         [BASE_TIME + value for value in range(95, 100)])
+
+        journal.close()
+        journal = self.open(segment_size=2048)
+        self.assertEqual(len(journal), 5)
+        self.assertEqual(os.listdir(self.directory).count(COMPACTION_MARKER), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,23 @@
+import hashlib
 import json
-import unicodedata
+import marshal
+import os
+import struct
+import sys
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from heapq import heappush, heappushpop
+from itertools import chain
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Tuple
+from operator import add, attrgetter
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 from pathlib import Path
 
+from kanji_stroke_dictionary import FORM_AS_WRITTEN, StrokeDictionary, get_default_stroke_dictionary, split_name_characters
+
 """
 七格剖象法による姓名判定システム
 
@@ -13,6 +27,605 @@ from pathlib import Path
 JSONデータと結合して鑑定結果を生成します。
 """
 
+# 系数（0-9）を添字とする十干・五行の対応表
+TEN_STEMS = ("癸", "甲", "乙", "丙", "丁", "戊", "己", "庚", "辛", "壬")
+FIVE_ELEMENTS = ("水", "木", "木", "火", "火", "土", "土", "金", "金", "水")
+ELEMENT_NAMES = ("木", "火", "土", "金", "水")  # 五行の番号順（相生の順）
+
+# 七格・星導分布・人材4類型の並び順（各データクラスのフィールド順と一致）
+FRAME_NAMES = ("天格", "地格", "人格", "総格", "外格", "雲格", "底格")
+STAR_NAMES = ("太陽", "月", "木星", "天王星", "水星", "金星", "海王星", "土星", "火星", "冥王星")
+PERSONNEL_TYPE_NAMES = ("軍人度", "天才度", "秀才度", "凡人度")
+
+# 天体と人材タイプの対応表
+PERSONNEL_TYPE_BY_STAR = {
+    "火星": "軍人度",      # 闘争
+    "冥王星": "軍人度",    # 終末
+    "天王星": "天才度",    # 変化
+    "海王星": "天才度",    # 信念
+    "太陽": "秀才度",      # 創造
+    "木星": "秀才度",      # 発展
+    "水星": "秀才度",      # 調和
+    "月": "凡人度",        # 静寂
+    "金星": "凡人度",      # 豊饒
+    "土星": "凡人度"       # 忍耐
+}
+
+# 星導番号（STAR_NAMESの添字）→ 人材タイプ番号（PERSONNEL_TYPE_NAMESの添字）
+PERSONNEL_INDEX_BY_STAR_ID = tuple(PERSONNEL_TYPE_NAMES.index(PERSONNEL_TYPE_BY_STAR[star]) for star in STAR_NAMES)
+
+# 人格と総格は人材4類型で2倍カウント
+DOUBLE_WEIGHT_FRAMES = ("人格", "総格")
+FRAME_WEIGHTS = tuple(2 if name in DOUBLE_WEIGHT_FRAMES else 1 for name in FRAME_NAMES)
+
+# 星導分布・人材4類型のビット詰めカウンタの1区画の幅
+# （1名あたり星導は最大14、人材4類型は最大18のため桁あふれしない）
+STAR_COUNT_BITS = 4
+PERSONNEL_COUNT_BITS = 8
+
+# 陰陽配列の評価・接合部の評価（番号はこのタプルの添字）
+YIN_YANG_CLASS_NAMES = ("良好配列◎", "標準配列○", "要注意配列▲")
+YIN_YANG_GOOD, YIN_YANG_STANDARD, YIN_YANG_CAUTION = range(3)
+JUNCTION_CLASS_NAMES = ("良好", "要注意")
+YANG_MARK = "○"   # 奇数画
+YIN_MARK = "●"    # 偶数画
+
+# 陰陽配列の判定表を事前計算する最大文字数（これより長い姓名は都度判定する）
+YIN_YANG_TABLE_LENGTH = 10
+
+# 循環を畳み込んだ参照配列の大きさ（これ以上の値は都度循環計算する）
+SPIRIT_LOOKUP_SIZE = 512
+
+# 判定結果キャッシュの既定の最大件数（画数の組ごとに1件）
+DEFAULT_CACHE_SIZE = 4096
+
+# 命名候補の総合点（NamingScore）の既定の配点
+DEFAULT_FORTUNE_POINTS = {"◎大吉数": 3, "○吉数": 2, "△半吉数": 1, "▲注意数": -1, "×凶数": -2}
+DEFAULT_YIN_YANG_POINTS = {"良好配列◎": 2, "標準配列○": 0, "要注意配列▲": -2}
+DEFAULT_JUNCTION_POINTS = {"良好": 1, "要注意": -1}
+
+
+def fold_spirit_number(number: int) -> int:
+    """格の数値を数霊番号（1-91）に畳み込む
+
+    1-91はそのまま、それ以外は90で循環させる（92→2、0→90）
+
+    Args:
+        number: 格の数値
+
+    Returns:
+        数霊番号（1-91）
+    """
+    if 1 <= number <= 91:
+        return number
+    return ((number - 1) % 90) + 1
+
+
+@dataclass(frozen=True)
+class SpiritProfile:
+    """数霊1つ分の派生情報（系数・秘数・星導・十干・五行）をまとめた不変レコード"""
+    spirit: Optional[Dict] = None        # 数霊表の元レコード
+    system_number: Optional[int] = None  # 系数（一の位）
+    secret_number: Optional[int] = None  # 秘数（数字根）
+    system_star: Optional[str] = None    # 系数の星導（象意付き）
+    secret_star: Optional[str] = None    # 秘数の星導（象意付き）
+    system_star_name: Optional[str] = None  # 系数の星導名のみ
+    secret_star_name: Optional[str] = None  # 秘数の星導名のみ
+    fortune: Optional[str] = None        # 吉凶
+    meaning: Optional[str] = None        # 象意
+    ten_stems: Optional[str] = None      # 十干
+    five_elements: Optional[str] = None  # 五行
+    system_star_id: int = -1             # 系数の星導番号（STAR_NAMESの添字、無ければ-1）
+    secret_star_id: int = -1             # 秘数の星導番号（STAR_NAMESの添字、無ければ-1）
+    element_id: int = -1                 # 五行番号（ELEMENT_NAMESの添字、無ければ-1）
+    star_bits: int = 0                   # 星導分布への寄与（STAR_COUNT_BITS幅のビット詰め）
+    personnel_bits: int = 0              # 人材4類型への寄与（PERSONNEL_COUNT_BITS幅のビット詰め）
+
+
+class SpiritLookup:
+    """数霊表・数理星導一覧から構築する不変の参照テーブル
+
+    読み込み時に一度だけ、数霊番号と数字（0-9）を添字とする密な配列を構築する。
+    格の数値からSpiritProfileへの変換は循環を畳み込んだ配列の添字アクセスのみで済む。
+    """
+
+    __slots__ = ("_spirits", "_stars", "_star_names", "_profiles")
+
+    def __init__(self, spirit_table: List[Dict], star_guide: List[Dict]):
+        """
+        Args:
+            spirit_table: ここのそ数霊表.json の内容
+            star_guide: 数理星導一覧.json の内容
+        """
+        # 数字（0-9）→ 星導（象意付き）と星導名
+        stars = [None] * 10
+        star_names = [None] * 10
+        for star_info in star_guide:
+            digit = star_info["数霊"]
+            if 0 <= digit <= 9 and stars[digit] is None:
+                stars[digit] = f"{star_info['星導']}({star_info['象徴']})"
+                star_names[digit] = star_info["星導"]
+        self._stars = tuple(stars)
+        self._star_names = tuple(star_names)
+
+        # 数霊番号（1-91）→ 数霊表レコード（添字0は未使用）
+        spirits = [None] * 92
+        for spirit in spirit_table:
+            number = spirit["数霊"]
+            if 1 <= number <= 91 and spirits[number] is None:
+                spirits[number] = spirit
+        self._spirits = tuple(spirits)
+
+        # 数霊番号 → SpiritProfile を一度だけ作成し、循環込みの値で引けるよう展開
+        by_spirit = [self._build_profile(spirit) for spirit in spirits]
+        self._profiles = tuple(by_spirit[fold_spirit_number(value)] for value in range(SPIRIT_LOOKUP_SIZE))
+
+    def _build_profile(self, spirit: Optional[Dict]) -> SpiritProfile:
+        """数霊表レコード1件からSpiritProfileを作成"""
+        if spirit is None:
+            return SpiritProfile()
+
+        system_number = spirit["系数"]
+        secret_number = spirit["秘数"]
+
+        # 系数から十干と五行を決定
+        ten_stems = None
+        five_elements = None
+        if system_number is not None:
+            known = 0 <= system_number <= 9
+            ten_stems = TEN_STEMS[system_number] if known else "不明"
+            five_elements = FIVE_ELEMENTS[system_number] if known else "不明"
+
+        # 系数・秘数の星導を星導番号と、星導分布・人材4類型のビット詰めカウンタに変換
+        star_ids = []
+        star_bits = 0
+        personnel_bits = 0
+        for digit in (system_number, secret_number):
+            star_name = self._star_names[digit % 10] if digit is not None else None
+            star_id = STAR_NAMES.index(star_name) if star_name in STAR_NAMES else -1
+            star_ids.append(star_id)
+            if star_id >= 0:
+                star_bits += 1 << (STAR_COUNT_BITS * star_id)
+                personnel_bits += 1 << (PERSONNEL_COUNT_BITS * PERSONNEL_INDEX_BY_STAR_ID[star_id])
+
+        return SpiritProfile(
+            spirit=spirit,
+            system_number=system_number,
+            secret_number=secret_number,
+            system_star=self.star(system_number) if system_number is not None else None,
+            secret_star=self.star(secret_number) if secret_number is not None else None,
+            system_star_name=self._star_names[system_number % 10] if system_number is not None else None,
+            secret_star_name=self._star_names[secret_number % 10] if secret_number is not None else None,
+            fortune=spirit["吉凶"],
+            meaning=spirit["象意"],
+            ten_stems=ten_stems,
+            five_elements=five_elements,
+            system_star_id=star_ids[0],
+            secret_star_id=star_ids[1],
+            element_id=ELEMENT_NAMES.index(five_elements) if five_elements in ELEMENT_NAMES else -1,
+            star_bits=star_bits,
+            personnel_bits=personnel_bits
+        )
+
+    def spirit(self, number: int) -> Optional[Dict]:
+        """格の数値から数霊表レコードを取得（循環込み）"""
+        return self._spirits[fold_spirit_number(number)]
+
+    def star(self, number: int) -> Optional[str]:
+        """数字から星導（象意付き）を取得（一の位のみ使用）"""
+        return self._stars[number % 10]
+
+    def profile(self, value: int) -> SpiritProfile:
+        """格の数値からSpiritProfileを取得（循環込み）"""
+        if 0 <= value < SPIRIT_LOOKUP_SIZE:
+            return self._profiles[value]
+        return self._profiles[fold_spirit_number(value)]
+
+
+def parity_code(strokes: Iterable[int]) -> int:
+    """画数の並びを陰陽配列の符号に変換
+
+    i文字目が陽（奇数画）ならビットiを立て、最上位に番兵ビットを置いて文字数を表す
+    （例：[3, 9, 5, 4] → ○○○● → 0b10111）
+
+    Args:
+        strokes: 姓名の画数の並び
+
+    Returns:
+        陰陽配列の符号
+    """
+    code = 0
+    length = 0
+    for strokes_count in strokes:
+        code |= (strokes_count & 1) << length
+        length += 1
+    return code | (1 << length)
+
+
+def parity_pattern(code: int) -> str:
+    """陰陽配列の符号を ○● の文字列に変換（例：0b10111 → "○○○●"）"""
+    return "".join(YANG_MARK if code >> i & 1 else YIN_MARK for i in range(code.bit_length() - 1))
+
+
+def pattern_code(pattern: str) -> int:
+    """○● の文字列を陰陽配列の符号に変換（parity_patternの逆）"""
+    return parity_code(1 if mark == YANG_MARK else 0 for mark in pattern)
+
+
+def classify_parity_code(code: int) -> int:
+    """陰陽配列パターン.json の判定基準を任意の文字数に広げた規則で配列を評価
+
+    2文字姓2文字名の配列表と一致するよう、次の順で判定する：
+        全陽・全陰（陰陽の切り替わりなし） → 要注意
+        挟み込み型（3つの塊で中央が2文字以上） → 要注意
+        切り替わり2回以上（交互型） → 良好
+        切り替わり1回（前後に偏る） → 標準
+
+    Args:
+        code: 陰陽配列の符号
+
+    Returns:
+        評価番号（YIN_YANG_CLASS_NAMESの添字）
+    """
+    length = code.bit_length() - 1
+    runs = []
+    for i in range(length):
+        bit = code >> i & 1
+        if runs and runs[-1][0] == bit:
+            runs[-1][1] += 1
+        else:
+            runs.append([bit, 1])
+
+    if len(runs) <= 1:
+        return YIN_YANG_CAUTION
+    if len(runs) == 3 and runs[1][1] >= 2:
+        return YIN_YANG_CAUTION
+    if len(runs) >= 3:
+        return YIN_YANG_GOOD
+    return YIN_YANG_STANDARD
+
+
+class YinYangClassifier:
+    """陰陽配列と接合部の評価を符号の添字アクセスで引く判定表
+
+    陰陽配列パターン.json に載っている配列はその評価を、それ以外は
+    classify_parity_code の規則による評価を、YIN_YANG_TABLE_LENGTH文字までの
+    全符号について一度だけ計算しておく。接合部は (姓末の陰陽, 名頭の陰陽) の4通り。
+    """
+
+    __slots__ = ("_classes", "_junctions")
+
+    def __init__(self, yin_yang: Dict):
+        """
+        Args:
+            yin_yang: 陰陽配列パターン.json の内容
+        """
+        classes = bytearray(classify_parity_code(code) if code else YIN_YANG_CAUTION
+                            for code in range(1 << (YIN_YANG_TABLE_LENGTH + 1)))
+        for class_name, category in yin_yang["配列パターン分類"].items():
+            class_id = YIN_YANG_CLASS_NAMES.index(class_name)
+            for pattern in category["パターン"]:
+                classes[pattern_code(pattern)] = class_id
+        self._classes = bytes(classes)
+
+        # 添字は (姓末が陽なら2) | (名頭が陽なら1)
+        junctions = bytearray(4)
+        for label, description in yin_yang["接合部判定"]["パターン"].items():
+            surname_last, given_first = label.split("→")
+            index = (2 if surname_last == "陽" else 0) | (1 if given_first == "陽" else 0)
+            junctions[index] = 0 if description.startswith(JUNCTION_CLASS_NAMES[0]) else 1
+        self._junctions = bytes(junctions)
+
+    def classify(self, code: int) -> int:
+        """陰陽配列の符号から評価番号（YIN_YANG_CLASS_NAMESの添字）を取得"""
+        if code < len(self._classes):
+            return self._classes[code]
+        return classify_parity_code(code)
+
+    def junction(self, surname_last: int, given_first: int) -> int:
+        """姓末と名頭の画数から接合部の評価番号（JUNCTION_CLASS_NAMESの添字）を取得"""
+        return self._junctions[(surname_last & 1) << 1 | (given_first & 1)]
+
+
+def junction_label(surname_last: int, given_first: int) -> str:
+    """姓末と名頭の画数から接合部の陰陽の表記を作成（例："陰→陽"）"""
+    return f"{'陽' if surname_last & 1 else '陰'}→{'陽' if given_first & 1 else '陰'}"
+
+
+# 姓名判定で使うJSONテーブル（属性名 → ファイル名）
+TABLE_FILES = {
+    "spirit_table": "ここのそ数霊表.json",       # 数霊表（1-91の吉凶・象意）
+    "star_guide": "数理星導一覧.json",           # 数字と天体の対応表
+    "five_elements": "五気判定マトリックス.json",  # 五行相生相剋表
+    "yin_yang": "陰陽配列パターン.json"          # 陰陽配列の判定表
+}
+
+# 初期化時に必ず読み込むテーブル（それ以外は初回アクセス時に読み込む）
+EAGER_TABLES = ("spirit_table", "star_guide")
+
+# コンパイル済みスナップショット
+SNAPSHOT_FILE = "seimei_tables.snapshot"
+SNAPSHOT_MAGIC = b"SMTS"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_HEADER = struct.Struct("<4sHxxI16s32s")  # マジック / 版数 / 索引長 / 処理系タグ / SHA-256
+
+
+def load_json(filepath: Path):
+    """JSONファイルを読み込む
+
+    Args:
+        filepath: JSONファイルのパス
+    Returns:
+        読み込んだJSONデータ
+    """
+    with open(filepath, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def freeze(value):
+    """JSONデータを読み取り専用に変換（dict → MappingProxyType、list → tuple）"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def _source_stamp(filepath: Path) -> Tuple[int, int]:
+    """スナップショットの鮮度判定に使うソースファイルの (サイズ, 更新時刻ns)"""
+    stat = filepath.stat()
+    return stat.st_size, stat.st_mtime_ns
+
+
+def _interpreter_tag() -> bytes:
+    """marshal形式の互換性を判定する処理系タグ（例：b"cpython-311"）"""
+    return sys.implementation.cache_tag.encode("ascii")[:16].ljust(16, b"\0")
+
+
+def compile_snapshot(json_dir: Optional[str] = None, output_path: Optional[str] = None) -> Path:
+    """全JSONテーブルをバージョン・チェックサム付きのバイナリスナップショットに変換
+
+    スナップショットは「ヘッダ + 索引 + テーブルごとのmarshalデータ」で構成され、
+    索引には各ソースJSONのサイズと更新時刻を記録する。読み込み時にいずれかが
+    一致しなければスナップショットは無視され、JSONから読み込まれる。
+
+    Args:
+        json_dir: JSONファイルが格納されているディレクトリパス（省略時はこのファイルと同じ場所）
+        output_path: 出力先（省略時は json_dir/seimei_tables.snapshot）
+
+    Returns:
+        出力したスナップショットのパス
+    """
+    json_dir = Path(json_dir) if json_dir is not None else Path(__file__).parent
+    output_path = Path(output_path) if output_path is not None else json_dir / SNAPSHOT_FILE
+
+    index = {}
+    payload = bytearray()
+    for name, filename in TABLE_FILES.items():
+        source = json_dir / filename
+        blob = marshal.dumps(load_json(source))
+        index[name] = (filename,) + _source_stamp(source) + (len(payload), len(blob))
+        payload += blob
+
+    index_blob = marshal.dumps(index)
+    body = index_blob + payload
+    header = SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(index_blob),
+                                  _interpreter_tag(), hashlib.sha256(body).digest())
+
+    # 書き込み途中のファイルを読まれないよう一時ファイルから置き換える
+    temp_path = output_path.with_name(output_path.name + f".{os.getpid()}.tmp")
+    with open(temp_path, 'wb') as f:
+        f.write(header)
+        f.write(body)
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+def read_snapshot(json_dir: Path, snapshot_path: Optional[Path] = None) -> Optional[Dict[str, bytes]]:
+    """スナップショットを検証して、テーブル名 → marshalデータ の辞書を返す
+
+    ファイルが無い・版数や処理系が異なる・チェックサム不一致・ソースJSONが
+    更新されている場合はNoneを返す（呼び出し側はJSONから読み込む）。
+
+    Args:
+        json_dir: ソースJSONのディレクトリ
+        snapshot_path: スナップショットのパス（省略時は json_dir/seimei_tables.snapshot）
+
+    Returns:
+        テーブル名 → marshalデータ（未デコード）の辞書、または None
+    """
+    snapshot_path = snapshot_path or json_dir / SNAPSHOT_FILE
+    try:
+        with open(snapshot_path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return None
+    if len(data) < SNAPSHOT_HEADER.size:
+        return None
+
+    magic, version, index_length, tag, checksum = SNAPSHOT_HEADER.unpack_from(data, 0)
+    body = memoryview(data)[SNAPSHOT_HEADER.size:]
+    if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION or tag != _interpreter_tag():
+        return None
+    if hashlib.sha256(body).digest() != checksum:
+        return None
+
+    try:
+        index = marshal.loads(body[:index_length])
+    except (EOFError, ValueError, TypeError):
+        return None
+    if set(index) != set(TABLE_FILES):
+        return None
+
+    blobs = {}
+    payload = body[index_length:]
+    for name, (filename, size, mtime_ns, offset, length) in index.items():
+        try:
+            if _source_stamp(json_dir / filename) != (size, mtime_ns):
+                return None
+        except OSError:
+            return None
+        blobs[name] = bytes(payload[offset:offset + length])
+    return blobs
+
+
+def table_fingerprint(json_dir: Path) -> Tuple[Tuple[int, int], ...]:
+    """全ソースJSONの (サイズ, 更新時刻ns) の組（テーブル更新の検知に使用）"""
+    return tuple(_source_stamp(Path(json_dir) / filename) for filename in TABLE_FILES.values())
+
+
+class SeimeiTables:
+    """姓名判定で使う読み取り専用のテーブル一式
+
+    スナップショットが新しければそこから、そうでなければJSONから読み込む。
+    数霊表と数理星導一覧は初期化時に読み込んで参照テーブルを構築し、
+    五気判定マトリックスと陰陽配列パターンは初回アクセス時に読み込む。
+    テーブルは freeze() で読み取り専用にしてあるため、複数のインスタンスや
+    スレッドで共有できる（get_shared_tables参照）。
+    """
+
+    def __init__(self, json_dir: Path, use_snapshot: bool = True):
+        """
+        Args:
+            json_dir: JSONファイルが格納されているディレクトリパス
+            use_snapshot: Falseの場合はスナップショットを使わずJSONから読み込む
+        """
+        self.json_dir = Path(json_dir)
+        self.fingerprint = table_fingerprint(self.json_dir)
+        self._blobs = read_snapshot(self.json_dir) if use_snapshot else None
+        self.source = "snapshot" if self._blobs is not None else "json"
+        self._tables = {}
+        self._lock = threading.Lock()
+        self._yin_yang_classifier = None
+
+        for name in EAGER_TABLES:
+            self.table(name)
+        self.lookup = SpiritLookup(self.spirit_table, self.star_guide)
+
+    def table(self, name: str):
+        """テーブルを取得（未読み込みならスナップショットまたはJSONから読み込む）"""
+        table = self._tables.get(name)
+        if table is None:
+            with self._lock:
+                table = self._tables.get(name)
+                if table is None:
+                    if self._blobs is not None:
+                        table = freeze(marshal.loads(self._blobs.pop(name)))
+                    else:
+                        table = freeze(load_json(self.json_dir / TABLE_FILES[name]))
+                    self._tables[name] = table
+        return table
+
+    def load_all(self) -> None:
+        """遅延読み込みのテーブルも含めてすべて読み込む"""
+        for name in TABLE_FILES:
+            self.table(name)
+
+    def is_stale(self) -> bool:
+        """ソースJSONが読み込み後に更新されたかどうか"""
+        try:
+            return table_fingerprint(self.json_dir) != self.fingerprint
+        except OSError:
+            return True
+
+    @property
+    def spirit_table(self) -> List[Dict]:
+        """ここのそ数霊表"""
+        return self.table("spirit_table")
+
+    @property
+    def star_guide(self) -> List[Dict]:
+        """数理星導一覧"""
+        return self.table("star_guide")
+
+    @property
+    def five_elements(self) -> Dict:
+        """五気判定マトリックス（遅延読み込み）"""
+        return self.table("five_elements")
+
+    @property
+    def yin_yang(self) -> Dict:
+        """陰陽配列パターン（遅延読み込み）"""
+        return self.table("yin_yang")
+
+    @property
+    def yin_yang_classifier(self) -> YinYangClassifier:
+        """陰陽配列・接合部の判定表（初回アクセス時に構築）"""
+        if self._yin_yang_classifier is None:
+            self._yin_yang_classifier = YinYangClassifier(self.yin_yang)
+        return self._yin_yang_classifier
+
+
+# プロセス全体で共有するテーブルの登録簿（(ディレクトリ, スナップショット使用) → SeimeiTables）
+# モジュール変数のため、fork したワーカープロセスにはコピーオンライトで引き継がれる
+_shared_tables: Dict[Tuple[str, bool], SeimeiTables] = {}
+_shared_tables_lock = threading.Lock()
+
+
+def get_shared_tables(json_dir: Optional[str] = None, use_snapshot: bool = True) -> SeimeiTables:
+    """ディレクトリごとに共有されるテーブルを取得
+
+    登録済みのテーブルがあり、ソースJSONのサイズ・更新時刻が変わっていなければそれを返す。
+    変わっていれば読み込み直して差し替える（ホットリロード）。スレッドセーフ。
+
+    Args:
+        json_dir: JSONファイルが格納されているディレクトリパス（省略時はこのファイルと同じ場所）
+        use_snapshot: Falseの場合はスナップショットを使わずJSONから読み込む
+
+    Returns:
+        共有の SeimeiTables
+    """
+    json_dir = Path(json_dir) if json_dir is not None else Path(__file__).parent
+    key = (str(json_dir.resolve()), use_snapshot)
+    fingerprint = table_fingerprint(json_dir)
+
+    tables = _shared_tables.get(key)
+    if tables is not None and tables.fingerprint == fingerprint:
+        return tables
+    with _shared_tables_lock:
+        tables = _shared_tables.get(key)
+        if tables is None or tables.fingerprint != fingerprint:
+            tables = SeimeiTables(json_dir, use_snapshot)
+            _shared_tables[key] = tables
+        return tables
+
+
+def invalidate_shared_tables(json_dir: Optional[str] = None) -> None:
+    """共有テーブルを破棄（次回の取得時に読み込み直す）
+
+    Args:
+        json_dir: 破棄するディレクトリ（省略時はすべて破棄）
+    """
+    with _shared_tables_lock:
+        if json_dir is None:
+            _shared_tables.clear()
+            return
+        resolved = str(Path(json_dir).resolve())
+        for key in [key for key in _shared_tables if key[0] == resolved]:
+            del _shared_tables[key]
+
+
+def preload_shared_tables(json_dir: Optional[str] = None, use_snapshot: bool = True,
+                          freeze_gc: bool = False) -> SeimeiTables:
+    """fork前に親プロセスで共有テーブルをすべて読み込んでおく
+
+    Args:
+        json_dir: JSONファイルが格納されているディレクトリパス
+        use_snapshot: Falseの場合はスナップショットを使わずJSONから読み込む
+        freeze_gc: Trueの場合は gc.freeze() で読み込み済みオブジェクトをGC対象外にし、
+                   子プロセスでのコピーオンライトによるページ複製を抑える
+
+    Returns:
+        共有の SeimeiTables
+    """
+    tables = get_shared_tables(json_dir, use_snapshot)
+    tables.load_all()
+    if freeze_gc:
+        import gc
+        gc.freeze()
+    return tables
+
+
 @dataclass
 class Character:
     """文字とその画数を保持するデータクラス"""
@@ -42,6 +655,8 @@ class Frame:
     meaning: Optional[str] = None       # 象意
     ten_stems: Optional[str] = None     # 十干（甲乙丙丁戊己庚辛壬癸）
     five_elements: Optional[str] = None # 五行（木火土金水）
+    system_star_id: int = -1            # 系数の星導番号（STAR_NAMESの添字、無ければ-1）
+    secret_star_id: int = -1            # 秘数の星導番号（STAR_NAMESの添字、無ければ-1）
 
 @dataclass
 class SevenFrames:
@@ -104,82 +719,401 @@ class PersonnelTypes:
             "凡人度": self.凡人度
         }
 
+def unpack_counts(bits: int, width: int, size: int) -> Tuple[int, ...]:
+    """ビット詰めカウンタを区画ごとの整数に展開"""
+    mask = (1 << width) - 1
+    return tuple((bits >> (width * i)) & mask for i in range(size))
+
+
+class AssessmentRecord:
+    """整数で表した1名分の判定結果
+
+    七格の数値・SpiritProfile（参照テーブルの共有オブジェクト）・星導分布（10区画）・
+    人材4類型（4区画）だけを保持し、日本語キーの辞書やFrameは要求されたときに組み立てる。
+    """
+
+    __slots__ = ("surname", "given_name", "values", "profiles", "star_counts", "personnel_counts",
+                 "yin_yang_code", "yin_yang_class", "junction_class")
+
+    def __init__(self, surname: Sequence[Character], given_name: Sequence[Character],
+                 values: Tuple[int, ...], profiles: Tuple[SpiritProfile, ...],
+                 star_counts: Tuple[int, ...], personnel_counts: Tuple[int, ...],
+                 yin_yang_code: int, yin_yang_class: int, junction_class: int):
+        """
+        Args:
+            surname: 姓の文字リスト
+            given_name: 名の文字リスト
+            values: 七格の数値（FRAME_NAMESの順）
+            profiles: 七格の数霊情報（FRAME_NAMESの順）
+            star_counts: 星導ごとの出現回数（STAR_NAMESの順）
+            personnel_counts: 人材タイプごとの度数（PERSONNEL_TYPE_NAMESの順）
+            yin_yang_code: 姓名全体の陰陽配列の符号（parity_code参照）
+            yin_yang_class: 陰陽配列の評価番号（YIN_YANG_CLASS_NAMESの添字）
+            junction_class: 接合部の評価番号（JUNCTION_CLASS_NAMESの添字）
+        """
+        self.surname = surname
+        self.given_name = given_name
+        self.values = values
+        self.profiles = profiles
+        self.star_counts = star_counts
+        self.personnel_counts = personnel_counts
+        self.yin_yang_code = yin_yang_code
+        self.yin_yang_class = yin_yang_class
+        self.junction_class = junction_class
+
+    def frame(self, index: int) -> Frame:
+        """七格の1つをFrameとして取得
+
+        Args:
+            index: 格の番号（FRAME_NAMESの添字）
+        """
+        value = self.values[index]
+        profile = self.profiles[index]
+        return Frame(
+            name=FRAME_NAMES[index],
+            value=value,
+            spirit_number=value if value <= 91 else fold_spirit_number(value),  # 91超は循環
+            system_number=profile.system_number,
+            secret_number=profile.secret_number,
+            system_star=profile.system_star,
+            secret_star=profile.secret_star,
+            fortune=profile.fortune,
+            meaning=profile.meaning,
+            ten_stems=profile.ten_stems,
+            five_elements=profile.five_elements,
+            system_star_id=profile.system_star_id,
+            secret_star_id=profile.secret_star_id
+        )
+
+    def seven_frames(self) -> SevenFrames:
+        """七格すべてをSevenFramesとして取得"""
+        return SevenFrames(*map(self.frame, range(len(FRAME_NAMES))))
+
+    def star_distribution(self) -> StarDistribution:
+        """星導分布をStarDistributionとして取得"""
+        return StarDistribution(*self.star_counts)
+
+    def personnel_types(self) -> PersonnelTypes:
+        """人材4類型をPersonnelTypesとして取得"""
+        return PersonnelTypes(*self.personnel_counts)
+
+    def frames_dict(self) -> Dict[str, Dict]:
+        """七格の詳細情報を辞書形式で出力"""
+        frames = {}
+        for name, value, profile in zip(FRAME_NAMES, self.values, self.profiles):
+            frames[name] = {
+                "数": value,                                                  # 格の数値
+                "数霊": value if value <= 91 else fold_spirit_number(value),  # 数霊番号（1-91）
+                "系数": profile.system_number,                                # 系数（一の位）
+                "秘数": profile.secret_number,                                # 秘数（数字根）
+                "系数星導": profile.system_star_name if profile.system_star else None,  # 系数の星導名のみ
+                "秘数星導": profile.secret_star_name if profile.secret_star else None,  # 秘数の星導名のみ
+                "系数星導＋象意": profile.system_star,                        # 系数の星導（象意付き）
+                "秘数星導＋象意": profile.secret_star,                        # 秘数の星導（象意付き）
+                "吉凶": profile.fortune,                                      # 吉凶判定
+                "象意": profile.meaning,                                      # 象意
+                "十干": profile.ten_stems,                                    # 十干
+                "五行": profile.five_elements                                 # 五行
+            }
+        return frames
+
+    def yin_yang_dict(self) -> Dict[str, str]:
+        """陰陽配列の診断結果を辞書形式で出力"""
+        return {
+            "配列": parity_pattern(self.yin_yang_code),                                  # 例：●●○●
+            "評価": YIN_YANG_CLASS_NAMES[self.yin_yang_class],                          # 良好配列◎など
+            "接合部": junction_label(self.surname[-1].strokes, self.given_name[0].strokes),  # 例：陰→陽
+            "接合部評価": JUNCTION_CLASS_NAMES[self.junction_class]                     # 良好/要注意
+        }
+
+    def to_dict(self) -> Dict:
+        """鑑定結果を辞書形式で出力（assessの戻り値と同じ構造）"""
+        return {
+            # 姓の文字と画数（①大: 3, ②神: 9 のような形式）
+            "姓": {
+                f"{chr(0x2460 + i)}{c.char}": c.strokes for i, c in enumerate(self.surname)
+            },
+            # 名の文字と画数（①加: 5, ②五: 4... のような形式）
+            "名": {
+                f"{chr(0x2460 + i)}{c.char}": c.strokes for i, c in enumerate(self.given_name)
+            },
+            # 七格すべての詳細情報
+            "七格": self.frames_dict(),
+            # 星導分布（10天体ごとの出現回数）
+            "星導分布": dict(zip(STAR_NAMES, self.star_counts)),
+            # 人材4類型（軍人・天才・秀才・凡人の度数）
+            "人材4類型": dict(zip(PERSONNEL_TYPE_NAMES, self.personnel_counts)),
+            # 陰陽配列（奇数画=陽○、偶数画=陰●）と姓名の接合部
+            "陰陽配列": self.yin_yang_dict()
+        }
+
+
+@dataclass(frozen=True)
+class CacheInfo:
+    """判定結果キャッシュの統計"""
+    hits: int
+    misses: int
+    evictions: int
+    maxsize: int
+    currsize: int
+
+    @property
+    def hit_rate(self) -> float:
+        """ヒット率（0.0-1.0、未使用なら0.0）"""
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class AssessmentCache:
+    """画数の組 → 判定結果の本体（七格・星導分布・人材4類型）を保持するLRUキャッシュ
+
+    鑑定結果は文字そのものではなく画数の並びだけで決まるため、
+    (姓の画数タプル, 名の画数タプル) をキーにする。スレッドセーフ。
+    """
+
+    def __init__(self, maxsize: int = DEFAULT_CACHE_SIZE):
+        """
+        Args:
+            maxsize: 最大件数（0以下の場合はキャッシュしない）
+        """
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[Tuple[Tuple[int, ...], Tuple[int, ...]], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    def get(self, key: Tuple[Tuple[int, ...], Tuple[int, ...]]) -> Optional[Any]:
+        """キャッシュを引く（ヒットした項目は最新として扱う）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return entry
+
+    def put(self, key: Tuple[Tuple[int, ...], Tuple[int, ...]], entry: Any) -> None:
+        """項目を登録（最大件数を超えたら最も古い項目を追い出す）"""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self) -> None:
+        """項目と統計をすべて破棄"""
+        with self._lock:
+            self._entries.clear()
+            self._hits = self._misses = self._evictions = 0
+
+    def info(self) -> CacheInfo:
+        """現在の統計を取得"""
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self._evictions, self.maxsize, len(self._entries))
+
+
+@dataclass
+class NamingScore:
+    """命名候補の総合点の配点
+
+    総合点 = Σ 格の重み × 格の吉凶の点 + 陰陽配列の点 + 接合部の点
+             （+ favored_personnel が最大（同数を含む）の場合は personnel_points）
+    格・吉凶・評価の名前は FRAME_NAMES・数霊表の吉凶・YIN_YANG_CLASS_NAMES・JUNCTION_CLASS_NAMES のもの。
+    表に無い吉凶・評価は0点。
+    """
+    fortune_points: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_FORTUNE_POINTS))
+    frame_weights: Dict[str, float] = field(default_factory=lambda: dict(zip(FRAME_NAMES, FRAME_WEIGHTS)))
+    yin_yang_points: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_YIN_YANG_POINTS))
+    junction_points: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_JUNCTION_POINTS))
+    favored_personnel: Optional[str] = None  # 最大であるべき人材類型（例："秀才度"）
+    personnel_points: float = 0              # favored_personnel を満たす場合の加点
+
+    def validate(self) -> None:
+        """未知の格名・評価・人材類型があればValueErrorを送出"""
+        unknown = set(self.frame_weights) - set(FRAME_NAMES)
+        if unknown:
+            raise ValueError(f"未知の格名です：{sorted(unknown)}")
+        unknown = set(self.yin_yang_points) - set(YIN_YANG_CLASS_NAMES)
+        if unknown:
+            raise ValueError(f"未知の陰陽配列の評価です：{sorted(unknown)}")
+        unknown = set(self.junction_points) - set(JUNCTION_CLASS_NAMES)
+        if unknown:
+            raise ValueError(f"未知の接合部の評価です：{sorted(unknown)}")
+        if self.favored_personnel is not None and self.favored_personnel not in PERSONNEL_TYPE_NAMES:
+            raise ValueError(f"未知の人材類型です：{self.favored_personnel}")
+
+
+@dataclass
+class RankedName:
+    """総合点で順位付けした命名候補"""
+    score: float                  # 総合点
+    given_name: str               # 名
+    given_strokes: Tuple[int, ...]  # 名の各文字の画数
+    record: AssessmentRecord      # 判定結果（to_dict()でassessと同じ辞書になる）
+
+
 class FortuneTellerAssessment:
     """七格剖象法による姓名判定を実行するメインクラス"""
 
-    def __init__(self, json_dir: str = None):
+    def __init__(self, json_dir: str = None, stroke_dictionary: Optional[StrokeDictionary] = None,
+                 use_snapshot: bool = True, shared: bool = True, cache_size: int = DEFAULT_CACHE_SIZE,
+                 metrics: Optional[Any] = None):
         """JSONデータファイルを読み込んで初期化
 
         Args:
             json_dir: JSONファイルが格納されているディレクトリパス
                      Noneの場合は実行ファイルと同じディレクトリを使用
+            stroke_dictionary: 画数の自動解決に使う漢字画数辞書
+                     Noneの場合は同梱の kanji_strokes.bin を初回使用時に開く
+            use_snapshot: コンパイル済みスナップショット（seimei_tables.snapshot）が
+                     新しければ使用する。Falseの場合は常にJSONから読み込む
+            shared: Trueの場合はプロセス内で共有される読み取り専用テーブルを使う。
+                     Falseの場合はこのインスタンス専用に読み込む
+            cache_size: 判定結果キャッシュの最大件数（0の場合はキャッシュしない）
+            metrics: 計測シンク（increment / observe を持つオブジェクト。fortune_metrics 参照）
+                     Noneの場合は計測しない
         """
         # JSONファイルのディレクトリを決定
         if json_dir is None:
             json_dir = Path(__file__).parent
         else:
             json_dir = Path(json_dir)
+        self._json_dir = json_dir
+        self._use_snapshot = use_snapshot
+        self._shared = shared
+        self.metrics = metrics
 
-        # 各種JSONデータを読み込み
-        self.spirit_table = self._load_json(json_dir / "ここのそ数霊表.json")      # 数霊表（1-91の吉凶・象意）
-        self.star_guide = self._load_json(json_dir / "数理星導一覧.json")         # 数字と天体の対応表
-        self.five_elements = self._load_json(json_dir / "五気判定マトリックス.json")  # 五行相生相剋表
-        self.yin_yang = self._load_json(json_dir / "陰陽配列パターン.json")       # 陰陽配列の判定表
+        # 画数の組ごとの判定結果キャッシュ（テーブルを読み込み直したら破棄）
+        self.cache = AssessmentCache(cache_size)
 
-    def _load_json(self, filepath: Path) -> dict:
-        """JSONファイルを読み込む
+        # 各種テーブルを読み込み（五気判定マトリックス・陰陽配列パターンは初回アクセス時）
+        self._attach_tables(get_shared_tables(json_dir, use_snapshot) if shared else SeimeiTables(json_dir, use_snapshot))
+
+        # 漢字画数辞書（画数が指定されなかった文字の解決に使用）
+        self._stroke_dictionary = stroke_dictionary
+
+    def _attach_tables(self, tables: SeimeiTables) -> None:
+        """テーブル一式をこのインスタンスに結び付ける"""
+        self.tables = tables
+        self.spirit_table = tables.spirit_table    # 数霊表（1-91の吉凶・象意）
+        self.star_guide = tables.star_guide        # 数字と天体の対応表
+
+        # 数霊・星導の参照テーブル（読み込み時に一度だけ構築済み）
+        self.lookup = tables.lookup
+        self.cache.clear()
+
+    def cache_info(self) -> CacheInfo:
+        """判定結果キャッシュの統計（ヒット・ミス・追い出し件数など）を取得"""
+        return self.cache.info()
+
+    def reload_tables(self) -> bool:
+        """ソースJSONが更新されていればテーブルを読み込み直す
 
-        Args:
-            filepath: JSONファイルのパス
         Returns:
-            読み込んだJSONデータ
+            読み込み直した場合はTrue
         """
-        with open(filepath, 'r', encoding='utf-8') as f:
-            return json.load(f)
-
-    def parse_name(self, surname: str, given_name: str, surname_strokes: List[int], given_strokes: List[int]) -> NameComponents:
+        if not self.tables.is_stale():
+            return False
+        if self._shared:
+            self._attach_tables(get_shared_tables(self._json_dir, self._use_snapshot))
+        else:
+            self._attach_tables(SeimeiTables(self._json_dir, self._use_snapshot))
+        return True
+
+    @property
+    def stroke_dictionary(self) -> StrokeDictionary:
+        """漢字画数辞書（未指定なら同梱辞書を遅延取得）"""
+        if self._stroke_dictionary is None:
+            self._stroke_dictionary = get_default_stroke_dictionary()
+        return self._stroke_dictionary
+
+    @property
+    def five_elements(self) -> Dict:
+        """五行相生相剋表（初回アクセス時に読み込み）"""
+        return self.tables.five_elements
+
+    @property
+    def yin_yang(self) -> Dict:
+        """陰陽配列の判定表（初回アクセス時に読み込み）"""
+        return self.tables.yin_yang
+
+    @property
+    def yin_yang_classifier(self) -> YinYangClassifier:
+        """陰陽配列・接合部の判定表（初回アクセス時に構築）"""
+        return self.tables.yin_yang_classifier
+
+    def parse_name(self, surname: str, given_name: str, surname_strokes: Optional[List[int]] = None,
+                   given_strokes: Optional[List[int]] = None, form_policy: str = FORM_AS_WRITTEN) -> NameComponents:
         """姓名を文字単位に分解して画数と共に格納
 
+        画数リストで指定されなかった文字は、「々」の規則を適用したうえで
+        漢字画数辞書から form_policy に従って解決する。
+
         Args:
             surname: 姓（例："大神"）
             given_name: 名（例："加五郎兵衛"）
-            surname_strokes: 姓の各文字の画数リスト（必須。例：[3, 9]）
-            given_strokes: 名の各文字の画数リスト（必須。例：[5, 4, 9, 7, 16]）
+            surname_strokes: 姓の各文字の画数リスト（例：[3, 9]。省略時は辞書から解決）
+            given_strokes: 名の各文字の画数リスト（例：[5, 4, 9, 7, 16]。省略時は辞書から解決）
+            form_policy: 辞書で解決する際の字体の扱い
+                         （"as-written"：表記どおり / "new-form"：新字体 / "old-form"：旧字体）
 
         Returns:
             NameComponents: 文字ごとの画数を順序保持で格納したオブジェクト
         """
         components = NameComponents()
-
-        # ===== 姓の処理 =====
         # 例："大神" → [Character("大", 3), Character("神", 9)]
-        for i, char in enumerate(surname):
-            if i < len(surname_strokes):
-                # 画数リストから取得
-                strokes = surname_strokes[i]
-            elif char == '々' and i > 0:
-                # 「々」は前の文字の画数を引き継ぐ
-                strokes = components.surname[i-1].strokes if components.surname else 3
-            else:
-                # 画数が不明な場合はエラー
-                raise ValueError(f"姓の文字「{char}」（{i+1}文字目）の画数が指定されていません。surname_strokes引数で画数を提供してください。")
-            components.surname.append(Character(char, strokes))
-
-        # ===== 名の処理 =====
+        components.surname = self.parse_characters(surname, surname_strokes, form_policy, part="姓")
         # 例："加五郎兵衛" → [Character("加", 5), Character("五", 4), ...]
-        for i, char in enumerate(given_name):
-            if i < len(given_strokes):
+        components.given_name = self.parse_characters(given_name, given_strokes, form_policy, part="名")
+        return components
+
+    def parse_characters(self, name: str, strokes: Optional[Sequence[int]] = None,
+                         form_policy: str = FORM_AS_WRITTEN, part: str = "名") -> List[Character]:
+        """姓または名の一方を文字単位に分解して画数と共に格納
+
+        Args:
+            name: 姓または名
+            strokes: 各文字の画数リスト（省略した文字は辞書から解決）
+            form_policy: 辞書で解決する際の字体の扱い（parse_name参照）
+            part: "姓" または "名"（エラーメッセージ用）
+
+        Returns:
+            文字ごとの画数を順序保持で格納したリスト
+
+        Raises:
+            ValueError: 姓・名が空、画数リストが文字数より長い、画数が正の整数でない、
+                        または画数が不明な文字がある場合
+        """
+        strokes = strokes or []
+        argument = "surname_strokes" if part == "姓" else "given_strokes"
+        chars = split_name_characters(name)
+        if not chars:
+            raise ValueError(f"{part}が空です。")
+        if len(strokes) > len(chars):
+            raise ValueError(f"{argument}の要素数（{len(strokes)}）が{part}の文字数（{len(chars)}）より多くなっています。")
+        characters = []
+        for i, char in enumerate(chars):
+            if i < len(strokes):
                 # 画数リストから取得
-                strokes = given_strokes[i]
+                strokes_count = strokes[i]
+                if type(strokes_count) is not int or strokes_count < 1:
+                    raise ValueError(f"{argument}の{i+1}番目の画数は正の整数にしてください：{strokes_count!r}")
             elif char == '々' and i > 0:
                 # 「々」は前の文字の画数を引き継ぐ
-                strokes = components.given_name[i-1].strokes if components.given_name else 3
+                strokes_count = characters[i-1].strokes if characters else 3
             else:
+                # 漢字画数辞書から取得（1回の参照で有無と画数を得る）
+                strokes_count = self.stroke_dictionary.strokes(char, form_policy)
+            if strokes_count is None:
                 # 画数が不明な場合はエラー
-                raise ValueError(f"名の文字「{char}」（{i+1}文字目）の画数が指定されていません。given_strokes引数で画数を提供してください。")
-            components.given_name.append(Character(char, strokes))
-
-        return components
+                raise ValueError(f"{part}の文字「{char}」（{i+1}文字目）の画数が指定されておらず、画数辞書にも登録されていません。{argument}引数で画数を提供してください。")
+            characters.append(Character(char, strokes_count))
+        return characters
 
     def calculate_main_frames(self, components: NameComponents) -> Tuple[int, int, int, int, int]:
         """主要五格（天格・地格・人格・総格・外格）を計算
@@ -287,18 +1221,11 @@ class FortuneTellerAssessment:
         Returns:
             数霊情報（吉凶、象意、系数、秘数など）
         """
-        # まず直接検索
-        for spirit in self.spirit_table:
-            if spirit["数霊"] == number:
-                return spirit
-
-        # 91以上の場合は90で循環
         # 例：92 → ((92-1) % 90) + 1 = 2
-        adjusted = ((number - 1) % 90) + 1
-        for spirit in self.spirit_table:
-            if spirit["数霊"] == adjusted:
-                return spirit
-        return None
+        spirit = self.lookup.spirit(number)
+        if spirit is None and self.metrics is not None:
+            self.metrics.increment("seimei_spirit_lookup_misses_total")
+        return spirit
 
     def get_star_from_number(self, number: int) -> str:
         """数字（0-9）から対応する星導（天体）を取得
@@ -312,14 +1239,8 @@ class FortuneTellerAssessment:
         Returns:
             星導と象徴（例："太陽(創造)"）
         """
-        # 一の位を取得（念のため。通常は0-9が渡される）
-        digit = number % 10
-
-        # 数理星導一覧から対応する星導を検索
-        for star_info in self.star_guide:
-            if star_info["数霊"] == digit:
-                return f"{star_info['星導']}({star_info['象徴']})"
-        return None
+        # 一の位で数理星導一覧の配列を参照（念のため。通常は0-9が渡される）
+        return self.lookup.star(number)
 
     def create_frame(self, name: str, value: int) -> Frame:
         """格の数値から詳細情報を付加したFrameオブジェクトを作成
@@ -331,40 +1252,24 @@ class FortuneTellerAssessment:
         Returns:
             Frame: 数霊情報と星導情報を持つFrameオブジェクト
         """
-        # 数霊表から情報を取得
-        spirit_info = self.get_spirit_info(value)
-
-        # 系数と秘数の取得
-        system_number = spirit_info["系数"] if spirit_info else None
-        secret_number = spirit_info["秘数"] if spirit_info else None
-
-        # 系数と秘数の星導を個別に取得
-        system_star = self.get_star_from_number(system_number) if system_number is not None else None
-        secret_star = self.get_star_from_number(secret_number) if secret_number is not None else None
-
-        # 系数から十干と五行を決定
-        ten_stems = None
-        five_elements = None
-
-        if system_number is not None:
-            ten_stems_map = {0: "癸", 1: "甲", 2: "乙", 3: "丙", 4: "丁", 5: "戊", 6: "己", 7: "庚", 8: "辛", 9: "壬"}
-            five_elements_map = {0: "水", 1: "木", 2: "木", 3: "火", 4: "火", 5: "土", 6: "土", 7: "金", 8: "金", 9: "水"}
-            ten_stems = ten_stems_map.get(system_number, "不明")
-            five_elements = five_elements_map.get(system_number, "不明")
+        # 数霊・系数・秘数・星導・十干・五行は参照テーブルから一括取得
+        profile = self.lookup.profile(value)
 
         # Frameオブジェクトを作成
         frame = Frame(
             name=name,
             value=value,
-            spirit_number=value if value <= 91 else ((value - 1) % 90) + 1,  # 91超は循環
-            system_number=system_number,                                     # 一の位
-            secret_number=secret_number,                                     # 数字根
-            system_star=system_star,                                        # 系数の星導
-            secret_star=secret_star,                                        # 秘数の星導
-            fortune=spirit_info["吉凶"] if spirit_info else None,           # 吉凶判定
-            meaning=spirit_info["象意"] if spirit_info else None,           # 象意
-            ten_stems=ten_stems,                                            # 十干
-            five_elements=five_elements                                     # 五行
+            spirit_number=value if value <= 91 else fold_spirit_number(value),  # 91超は循環
+            system_number=profile.system_number,                              # 一の位
+            secret_number=profile.secret_number,                              # 数字根
+            system_star=profile.system_star,                                  # 系数の星導
+            secret_star=profile.secret_star,                                  # 秘数の星導
+            fortune=profile.fortune,                                          # 吉凶判定
+            meaning=profile.meaning,                                          # 象意
+            ten_stems=profile.ten_stems,                                      # 十干
+            five_elements=profile.five_elements,                              # 五行
+            system_star_id=profile.system_star_id,                            # 系数の星導番号
+            secret_star_id=profile.secret_star_id                             # 秘数の星導番号
         )
         return frame
 
@@ -408,27 +1313,16 @@ class FortuneTellerAssessment:
         Returns:
             StarDistribution: 10天体ごとのカウント結果（合計14）
         """
-        distribution = StarDistribution()
+        # 星導番号を添字とする10区画のカウンタ
+        counts = [0] * len(STAR_NAMES)
 
-        # 各格の星導をカウント
+        # 各格の系数（一の位）と秘数（数字根）の星導をカウント
         for frame in frames.all_frames():
-            # ===== 系数（一の位）の星導をカウント =====
-            if frame.system_star:
-                # Frameに保存された系数星導を使用
-                star_name = frame.system_star.split("(")[0]
-                if hasattr(distribution, star_name):
-                    setattr(distribution, star_name,
-                           getattr(distribution, star_name) + 1)
-
-            # ===== 秘数（数字根）の星導をカウント =====
-            if frame.secret_star:
-                # Frameに保存された秘数星導を使用
-                star_name = frame.secret_star.split("(")[0]
-                if hasattr(distribution, star_name):
-                    setattr(distribution, star_name,
-                           getattr(distribution, star_name) + 1)
-
-        return distribution
+            for star_id in (frame.system_star_id, frame.secret_star_id):
+                if star_id >= 0:
+                    counts[star_id] += 1
+
+        return StarDistribution(*counts)
 
     def calculate_personnel_types(self, frames: SevenFrames) -> PersonnelTypes:
         """人材4類型の度数を計算
@@ -442,46 +1336,21 @@ class FortuneTellerAssessment:
         Returns:
             PersonnelTypes: 4類型ごとの度数（合計18）
         """
-        types = PersonnelTypes()
-
-        # 天体と人材タイプの対応表
-        personnel_map = {
-            "火星": "軍人度",      # 闘争
-            "冥王星": "軍人度",    # 終末
-            "天王星": "天才度",    # 変化
-            "海王星": "天才度",    # 信念
-            "太陽": "秀才度",      # 創造
-            "木星": "秀才度",      # 発展
-            "水星": "秀才度",      # 調和
-            "月": "凡人度",        # 静寂
-            "金星": "凡人度",      # 豊饒
-            "土星": "凡人度"       # 忍耐
-        }
+        # 人材タイプ番号を添字とする4区画のカウンタ
+        counts = [0] * len(PERSONNEL_TYPE_NAMES)
 
-        # 各格の星導から人材タイプを集計
+        # 各格の系数（一の位）と秘数（数字根）の星導から集計
         for frame in frames.all_frames():
             # ★重要：人格と総格は2倍カウント
-            multiplier = 2 if frame.name in ["人格", "総格"] else 1
-
-            # ===== 系数（一の位）の星導から集計 =====
-            if frame.system_star:
-                star_name = frame.system_star.split("(")[0]
-                if star_name in personnel_map:
-                    personnel_type = personnel_map[star_name]
-                    current_value = getattr(types, personnel_type)
-                    setattr(types, personnel_type, current_value + multiplier)
-
-            # ===== 秘数（数字根）の星導から集計 =====
-            if frame.secret_star:
-                star_name = frame.secret_star.split("(")[0]
-                if star_name in personnel_map:
-                    personnel_type = personnel_map[star_name]
-                    current_value = getattr(types, personnel_type)
-                    setattr(types, personnel_type, current_value + multiplier)
-
-        return types
-
-    def assess(self, surname: str, given_name: str, surname_strokes: List[int], given_strokes: List[int]) -> Dict:
+            multiplier = 2 if frame.name in DOUBLE_WEIGHT_FRAMES else 1
+            for star_id in (frame.system_star_id, frame.secret_star_id):
+                if star_id >= 0:
+                    counts[PERSONNEL_INDEX_BY_STAR_ID[star_id]] += multiplier
+
+        return PersonnelTypes(*counts)
+
+    def assess(self, surname: str, given_name: str, surname_strokes: Optional[List[int]] = None,
+               given_strokes: Optional[List[int]] = None, form_policy: str = FORM_AS_WRITTEN) -> Dict:
         """姓名判定のメインメソッド
 
         姓名と画数を受け取り、七格剖象法による鑑定結果を返す
@@ -489,64 +1358,735 @@ class FortuneTellerAssessment:
         Args:
             surname: 姓（例："大神"）
             given_name: 名（例："加五郎兵衛"）
-            surname_strokes: 姓の各文字の画数リスト（必須。例：[3, 9]）
-            given_strokes: 名の各文字の画数リスト（必須。例：[5, 4, 9, 7, 16]）
+            surname_strokes: 姓の各文字の画数リスト（例：[3, 9]。省略時は辞書から解決）
+            given_strokes: 名の各文字の画数リスト（例：[5, 4, 9, 7, 16]。省略時は辞書から解決）
+            form_policy: 辞書で解決する際の字体の扱い（parse_name参照）
 
         Returns:
-            鑑定結果の辞書（七格、星導分布、人材4類型など）
+            鑑定結果の辞書（七格、星導分布、人材4類型、陰陽配列など）
         """
+        record = self.assess_record(surname, given_name, surname_strokes, given_strokes, form_policy)
+        if self.metrics is None:
+            return record.to_dict()
+        started = time.perf_counter()
+        result = record.to_dict()
+        self.metrics.observe("seimei_assess_stage_seconds", time.perf_counter() - started, stage="build")
+        return result
+
+    def assess_record(self, surname: str, given_name: str, surname_strokes: Optional[List[int]] = None,
+                      given_strokes: Optional[List[int]] = None,
+                      form_policy: str = FORM_AS_WRITTEN) -> AssessmentRecord:
+        """姓名判定を行い、整数で表した判定結果を返す
+
+        引数はassessと同じ。日本語キーの辞書は組み立てないため、
+        大量の判定で星導分布や人材4類型の数値だけを使う場合はこちらを使う。
+
+        Returns:
+            AssessmentRecord（to_dict()でassessと同じ辞書になる）
+        """
+        # 計測（シンクがなければ時刻も取らない）
+        metrics = self.metrics
+        if metrics is not None:
+            metrics.increment("seimei_assess_calls_total")
+            started = time.perf_counter()
+
         # ===== Step 1: 姓名を文字単位に分解 =====
-        components = self.parse_name(surname, given_name, surname_strokes, given_strokes)
+        components = self.parse_name(surname, given_name, surname_strokes, given_strokes, form_policy)
+        if metrics is not None:
+            parsed = time.perf_counter()
+            metrics.observe("seimei_assess_stage_seconds", parsed - started, stage="parse")
+
+        # ===== Step 2-4: 七格・星導分布・人材4類型（画数の組が同じならキャッシュから） =====
+        key = (tuple(c.strokes for c in components.surname), tuple(c.strokes for c in components.given_name))
+        core = self.cache.get(key)
+        computed = 0.0  # _assess_core の時間（frames・distribution・yin_yang として計測済み）
+        if core is None:
+            if metrics is not None:
+                computing = time.perf_counter()
+            core = self._assess_core(components)
+            if metrics is not None:
+                computed = time.perf_counter() - computing
+            self.cache.put(key, core)
+            if metrics is not None:
+                metrics.increment("seimei_cache_misses_total")
+        elif metrics is not None:
+            metrics.increment("seimei_cache_hits_total")
+
+        # ===== Step 5: 文字情報を付けて判定結果にする（辞書は to_dict() で遅延作成） =====
+        record = AssessmentRecord(components.surname, components.given_name, *core)
+        if metrics is not None:
+            # キャッシュの参照・格納と判定結果の作成の時間（計算した場合もその時間は含めない）
+            metrics.observe("seimei_assess_stage_seconds", time.perf_counter() - parsed - computed, stage="cache")
+        return record
+
+    def _assess_core(self, components: NameComponents) -> Tuple:
+        """画数だけで決まる判定結果の本体を計算（キャッシュに格納する不変の形）
 
-        # ===== Step 2: 七格を計算してJSONデータと結合 =====
-        frames = self.calculate_seven_frames(components)
+        Args:
+            components: 姓名の文字情報
 
-        # ===== Step 3: 星導分布図を作成（10天体ごとのカウント） =====
-        star_distribution = self.calculate_star_distribution(frames)
+        Returns:
+            (七格の数値, 七格のSpiritProfile, 星導分布, 人材4類型) の各タプルと
+            (陰陽配列の符号, 陰陽配列の評価番号, 接合部の評価番号)
+        """
+        metrics = self.metrics
+        if metrics is not None:
+            started = time.perf_counter()
 
-        # ===== Step 4: 人材4類型を計算（人格・総格は2倍） =====
-        personnel_types = self.calculate_personnel_types(frames)
+        # ===== 七格を計算 =====
+        天格, 地格, 人格, 総格, 外格 = self.calculate_main_frames(components)
+        雲格, 底格 = self.calculate_supplementary_frames(components, 総格)
+        values = (天格, 地格, 人格, 総格, 外格, 雲格, 底格)
+
+        # ===== 参照テーブルから数霊情報を結合 =====
+        profiles = tuple(map(self.lookup.profile, values))
+        if metrics is not None:
+            framed = time.perf_counter()
+            metrics.observe("seimei_assess_stage_seconds", framed - started, stage="frames")
+            misses = sum(1 for profile in profiles if profile.spirit is None)
+            if misses:
+                metrics.increment("seimei_spirit_lookup_misses_total", misses)
+
+        # ===== 星導分布・人材4類型（人格・総格は2倍）をビット詰めカウンタで集計 =====
+        star_bits = 0
+        personnel_bits = 0
+        for profile, weight in zip(profiles, FRAME_WEIGHTS):
+            star_bits += profile.star_bits
+            personnel_bits += profile.personnel_bits * weight
+        star_counts = unpack_counts(star_bits, STAR_COUNT_BITS, len(STAR_NAMES))
+        personnel_counts = unpack_counts(personnel_bits, PERSONNEL_COUNT_BITS, len(PERSONNEL_TYPE_NAMES))
+        if metrics is not None:
+            counted = time.perf_counter()
+            metrics.observe("seimei_assess_stage_seconds", counted - framed, stage="distribution")
+
+        # ===== 陰陽配列と接合部を判定表で評価 =====
+        classifier = self.yin_yang_classifier
+        yin_yang_code = parity_code(c.strokes for c in chain(components.surname, components.given_name))
+        junction_class = classifier.junction(components.surname[-1].strokes, components.given_name[0].strokes)
+        yin_yang_class = classifier.classify(yin_yang_code)
+        if metrics is not None:
+            metrics.observe("seimei_assess_stage_seconds", time.perf_counter() - counted, stage="yin_yang")
+
+        return (values, profiles, star_counts, personnel_counts, yin_yang_code, yin_yang_class, junction_class)
+
+    def assess_many(self, surname_matrix: Sequence[Sequence[int]], surname_lengths: Sequence[int],
+                    given_matrix: Sequence[Sequence[int]], given_lengths: Sequence[int]) -> Dict:
+        """複数の姓名を列指向でまとめて判定するバッチ版assess
+
+        画数は行ごとに0埋めした行列と、各行の有効文字数の配列で受け取る。
+        七格は calculate_main_frames / calculate_supplementary_frames と同じ規則
+        （1字姓・1字名の霊数を含む）を列単位の一括演算で求め、数霊・星導・十干・五行は
+        参照テーブルからの添字アクセスで結合する。星導分布と人材4類型は
+        SpiritProfileのビット詰めカウンタを格ごとに足し合わせ、最後に列へ展開する。
 
-        # ===== Step 5: 結果を構造化して返す =====
-        result = {
-            # 姓の文字と画数（①大: 3, ②神: 9 のような形式）
-            "姓": {
-                f"{chr(0x2460 + i)}{c.char}": c.strokes for i, c in enumerate(components.surname)
-            },
-            # 名の文字と画数（①加: 5, ②五: 4... のような形式）
-            "名": {
-                f"{chr(0x2460 + i)}{c.char}": c.strokes for i, c in enumerate(components.given_name)
+        Args:
+            surname_matrix: 姓の画数行列（例：[[3, 9, 0], [11, 0, 0]]）
+            surname_lengths: 各行の姓の文字数（例：[2, 1]）
+            given_matrix: 名の画数行列（例：[[5, 4, 9], [7, 0, 0]]）
+            given_lengths: 各行の名の文字数（例：[3, 1]）
+
+        Returns:
+            列指向の鑑定結果辞書。以下の構造を持つ（各列の長さは件数）：
+            {
+                '件数': int,
+                '七格': {格名: {'数': array, '数霊': array, '系数': list, '秘数': list,
+                                '系数星導': list, '秘数星導': list, '吉凶': list,
+                                '象意': list, '十干': list, '五行': list}},
+                '星導分布': {天体名: array},
+                '人材4類型': {類型名: array},
+                '陰陽配列': {'符号': array, '評価': list, '接合部評価': list}
+            }
+            陰陽配列の符号は parity_pattern() で ○● の文字列に変換できる
+
+        Raises:
+            ValueError: 件数が一致しない、文字数が1未満または行列の幅を超える、
+                        または有効な画数が正の整数でない行がある場合（メッセージに行番号を含む）
+        """
+        count = len(surname_lengths)
+        if not (len(surname_matrix) == len(given_matrix) == len(given_lengths) == count):
+            raise ValueError("姓・名の画数行列と文字数配列の件数が一致しません。")
+        # 各行の有効な画数を検証（assess と同じく、不正な画数は黙って計算せずにエラーにする）
+        for part, matrix, lengths in (("姓", surname_matrix, surname_lengths), ("名", given_matrix, given_lengths)):
+            for i, (row, n) in enumerate(zip(matrix, lengths)):
+                if not 1 <= n <= len(row):
+                    raise ValueError(f"{i}行目の{part}の文字数（{n}）は1以上、画数行列の幅（{len(row)}）以下にしてください。")
+                for stroke in row[:n]:
+                    if type(stroke) is not int or stroke < 1:
+                        raise ValueError(f"{i}行目の{part}の画数は正の整数にしてください：{stroke!r}")
+
+        # ===== 列の抽出（姓名の合計・先頭・末尾の画数） =====
+        surname_sum = [sum(row[:n]) for row, n in zip(surname_matrix, surname_lengths)]
+        given_sum = [sum(row[:n]) for row, n in zip(given_matrix, given_lengths)]
+        surname_first = [row[0] for row in surname_matrix]
+        surname_last = [row[n - 1] for row, n in zip(surname_matrix, surname_lengths)]
+        given_first = [row[0] for row in given_matrix]
+        given_last = [row[n - 1] for row, n in zip(given_matrix, given_lengths)]
+
+        # ===== 主要五格（霊数なし） =====
+        天格 = surname_sum
+        地格 = given_sum
+        人格 = list(map(add, surname_last, given_first))
+        総格 = list(map(add, surname_sum, given_sum))
+        # 1字姓1字名の場合は外格=総格
+        外格 = [total if s == 1 and g == 1 else total - person
+               for total, person, s, g in zip(総格, 人格, surname_lengths, given_lengths)]
+
+        # ===== 補助格（1字姓は雲格に、1字名は底格に霊数1を加える） =====
+        雲格 = [total + (1 if s == 1 else 0) - (0 if g == 1 else last)
+               for total, last, s, g in zip(総格, given_last, surname_lengths, given_lengths)]
+        底格 = [total + (1 if g == 1 else 0) - (0 if s == 1 else first)
+               for total, first, s, g in zip(総格, surname_first, surname_lengths, given_lengths)]
+
+        # ===== 参照テーブルとの結合（gather） =====
+        profile = self.lookup.profile
+        frames = {}
+        star_bits = [0] * count
+        personnel_bits = [0] * count
+        for name, values in zip(FRAME_NAMES, (天格, 地格, 人格, 総格, 外格, 雲格, 底格)):
+            profiles = list(map(profile, values))
+            frames[name] = {
+                "数": array("l", values),
+                "数霊": array("l", [v if v <= 91 else fold_spirit_number(v) for v in values]),
+                "系数": [p.system_number for p in profiles],
+                "秘数": [p.secret_number for p in profiles],
+                "系数星導": [p.system_star_name for p in profiles],
+                "秘数星導": [p.secret_star_name for p in profiles],
+                "吉凶": [p.fortune for p in profiles],
+                "象意": [p.meaning for p in profiles],
+                "十干": [p.ten_stems for p in profiles],
+                "五行": [p.five_elements for p in profiles]
+            }
+
+            # ビット詰めカウンタを加算（人格・総格は人材4類型で2倍）
+            star_bits = list(map(add, star_bits, map(attrgetter("star_bits"), profiles)))
+            weighted = map(attrgetter("personnel_bits"), profiles)
+            if name in DOUBLE_WEIGHT_FRAMES:
+                weighted = (bits << 1 for bits in weighted)
+            personnel_bits = list(map(add, personnel_bits, weighted))
+
+        # ===== 陰陽配列（姓名の画数の奇偶をビット列にして判定表を引く） =====
+        classifier = self.yin_yang_classifier
+        yin_yang_codes = array("L", [
+            parity_code(chain(surname_row[:s], given_row[:g]))
+            for surname_row, s, given_row, g in zip(surname_matrix, surname_lengths, given_matrix, given_lengths)
+        ])
+
+        # ===== ビット詰めカウンタを列へ展開 =====
+        star_mask = (1 << STAR_COUNT_BITS) - 1
+        personnel_mask = (1 << PERSONNEL_COUNT_BITS) - 1
+        return {
+            "件数": count,
+            "七格": frames,
+            "星導分布": {
+                star: array("B", [(bits >> (STAR_COUNT_BITS * i)) & star_mask for bits in star_bits])
+                for i, star in enumerate(STAR_NAMES)
             },
-            # 七格すべての詳細情報
-            "七格": {
-                frame.name: {
-                    "数": frame.value,            # 格の数値
-                    "数霊": frame.spirit_number,  # 数霊番号（1-91）
-                    "系数": frame.system_number,  # 系数（一の位）
-                    "秘数": frame.secret_number,  # 秘数（数字根）
-                    "系数星導": frame.system_star.split("(")[0] if frame.system_star else None,  # 系数の星導名のみ
-                    "秘数星導": frame.secret_star.split("(")[0] if frame.secret_star else None,  # 秘数の星導名のみ
-                    "系数星導＋象意": frame.system_star,  # 系数の星導（象意付き）
-                    "秘数星導＋象意": frame.secret_star,  # 秘数の星導（象意付き）
-                    "吉凶": frame.fortune,        # 吉凶判定
-                    "象意": frame.meaning,        # 象意
-                    "十干": frame.ten_stems,      # 十干
-                    "五行": frame.five_elements   # 五行
-                } for frame in frames.all_frames()
+            "人材4類型": {
+                personnel_type: array("B", [(bits >> (PERSONNEL_COUNT_BITS * i)) & personnel_mask for bits in personnel_bits])
+                for i, personnel_type in enumerate(PERSONNEL_TYPE_NAMES)
             },
-            # 星導分布（10天体ごとの出現回数）
-            "星導分布": star_distribution.to_dict(),
-            # 人材4類型（軍人・天才・秀才・凡人の度数）
-            "人材4類型": personnel_types.to_dict()
+            "陰陽配列": {
+                "符号": yin_yang_codes,
+                "評価": [YIN_YANG_CLASS_NAMES[classifier.classify(code)] for code in yin_yang_codes],
+                "接合部評価": [JUNCTION_CLASS_NAMES[classifier.junction(last, first)]
+                          for last, first in zip(surname_last, given_first)]
+            }
         }
 
-        return result
+    def search_given_strokes(self, surname_strokes: List[int],
+                             frame_fortunes: Optional[Dict[str, Sequence[str]]] = None,
+                             favored_personnel: Optional[str] = None,
+                             max_chars: int = 4, min_chars: int = 1,
+                             stroke_range: Tuple[int, int] = (1, 30),
+                             yin_yang_classes: Optional[Sequence[str]] = None,
+                             good_junction: bool = False) -> List[Tuple[int, ...]]:
+        """姓の画数から条件を満たす名の画数の組み合わせを逆算（命名相談用）
+
+        姓が決まれば天格と人格の姓側は固定される。さらに地格・総格・外格は名の合計画数、
+        雲格は名の最後の文字、人格は名の最初の文字だけで決まるため、
+        「名の先頭 → 名の合計 → 名の末尾」の順に部分和で枝刈りし、
+        条件を満たした組み合わせだけ中間の文字の画数を展開する。
+        接合部は名の先頭だけで決まるため最初に、陰陽配列は展開した組み合わせごとに判定表で絞り込む。
+
+        Args:
+            surname_strokes: 姓の各文字の画数リスト（例：[3, 9]）
+            frame_fortunes: 格名ごとに許容する吉凶（例：{"人格": ["◎大吉数"], "総格": ["◎大吉数"]}）
+            favored_personnel: 最大（同数を含む）であるべき人材類型（例："秀才度"）
+            max_chars: 名の最大文字数
+            min_chars: 名の最小文字数
+            stroke_range: 名の1文字あたりの画数の範囲（両端を含む）
+            yin_yang_classes: 姓名全体の陰陽配列として許容する評価（例：["良好配列◎"]）
+            good_junction: Trueの場合は接合部（姓末と名頭）が良好な組み合わせに限る
+
+        Returns:
+            条件を満たす名の画数タプルのリスト（文字数→画数の辞書順）
+        """
+        if not surname_strokes:
+            raise ValueError("姓の画数（surname_strokes）を1文字以上指定してください。")
+        frame_fortunes = frame_fortunes or {}
+        unknown = set(frame_fortunes) - set(FRAME_NAMES)
+        if unknown:
+            raise ValueError(f"未知の格名です：{sorted(unknown)}")
+        if favored_personnel is not None and favored_personnel not in PERSONNEL_TYPE_NAMES:
+            raise ValueError(f"未知の人材類型です：{favored_personnel}")
+        if yin_yang_classes is not None and not set(yin_yang_classes) <= set(YIN_YANG_CLASS_NAMES):
+            raise ValueError(f"未知の陰陽配列の評価です：{sorted(set(yin_yang_classes) - set(YIN_YANG_CLASS_NAMES))}")
+        low, high = stroke_range
+        if low < 1 or low > high:
+            raise ValueError(f"画数の範囲（stroke_range）は 1 ≦ 下限 ≦ 上限 にしてください：{tuple(stroke_range)}")
+        if min_chars < 1 or min_chars > max_chars:
+            raise ValueError(f"名の文字数は 1 ≦ min_chars ≦ max_chars にしてください：min_chars={min_chars}, max_chars={max_chars}")
+
+        surname_total = sum(surname_strokes)
+        surname_first = surname_strokes[0]
+        surname_last = surname_strokes[-1]
+        is_single_surname = len(surname_strokes) == 1
+        profile = self.lookup.profile
+
+        # 格ごとに「その数値が許容されるか」を数値を添字とする表にしておく
+        max_value = surname_total + max_chars * high + 1
+        allowed = {}
+        for name, fortunes in frame_fortunes.items():
+            fortunes = set(fortunes)
+            allowed[name] = bytes(profile(value).fortune in fortunes for value in range(max_value + 1))
+
+        def accepts(name: str, value: int) -> bool:
+            table = allowed.get(name)
+            return table is None or table[value]
+
+        # 人材4類型の判定（ビット詰めカウンタから最大の類型を判定）
+        personnel_mask = (1 << PERSONNEL_COUNT_BITS) - 1
+        favored_index = PERSONNEL_TYPE_NAMES.index(favored_personnel) if favored_personnel else None
+
+        def favors(values: Tuple[int, ...]) -> bool:
+            if favored_index is None:
+                return True
+            bits = 0
+            for name, value in zip(FRAME_NAMES, values):
+                contribution = profile(value).personnel_bits
+                bits += contribution << 1 if name in DOUBLE_WEIGHT_FRAMES else contribution
+            counts = [(bits >> (PERSONNEL_COUNT_BITS * i)) & personnel_mask for i in range(len(PERSONNEL_TYPE_NAMES))]
+            return counts[favored_index] == max(counts)
+
+        # 陰陽配列の判定（姓の部分の符号に名の奇偶を継ぎ足して判定表を引く）
+        classifier = self.yin_yang_classifier
+        surname_length = len(surname_strokes)
+        surname_parity = parity_code(surname_strokes) ^ (1 << surname_length)
+        allowed_classes = (set(YIN_YANG_CLASS_NAMES.index(name) for name in yin_yang_classes)
+                           if yin_yang_classes is not None else None)
+
+        def balanced(given: Tuple[int, ...]) -> bool:
+            if allowed_classes is None:
+                return True
+            code = surname_parity | (parity_code(given) << surname_length)
+            return classifier.classify(code) in allowed_classes
+
+        # 天格は姓だけで決まる
+        天格 = surname_total
+        if not accepts("天格", 天格):
+            return []
+
+        # 中間の文字（先頭・末尾以外）の画数の組み合わせを合計ごとに展開（メモ化）
+        compositions = {}
+
+        def middle_compositions(parts: int, total: int) -> List[Tuple[int, ...]]:
+            key = (parts, total)
+            if key not in compositions:
+                if parts == 0:
+                    compositions[key] = [()] if total == 0 else []
+                else:
+                    compositions[key] = [
+                        (first,) + rest
+                        for first in range(low, min(high, total - low * (parts - 1)) + 1)
+                        for rest in middle_compositions(parts - 1, total - first)
+                    ]
+            return compositions[key]
+
+        results = []
+        for chars in range(min_chars, max_chars + 1):
+            for given_first in range(low, high + 1):
+                # ===== 枝刈り1：人格（姓の最後 + 名の最初） =====
+                人格 = surname_last + given_first
+                if not accepts("人格", 人格):
+                    continue
+                if good_junction and classifier.junction(surname_last, given_first) != 0:
+                    continue
+
+                for rest in range((chars - 1) * low, (chars - 1) * high + 1):
+                    # ===== 枝刈り2：名の合計で決まる地格・総格・外格 =====
+                    地格 = given_first + rest
+                    総格 = surname_total + 地格
+                    外格 = 総格 if is_single_surname and chars == 1 else 総格 - 人格
+                    if not (accepts("地格", 地格) and accepts("総格", 総格) and accepts("外格", 外格)):
+                        continue
+
+                    # 底格は名の文字数と総格で決まる
+                    if chars == 1:
+                        底格 = 総格 + 1 - (0 if is_single_surname else surname_first)
+                    else:
+                        底格 = 総格 - (0 if is_single_surname else surname_first)
+                    if not accepts("底格", 底格):
+                        continue
+
+                    if chars == 1:
+                        雲格 = 総格 + 1 if is_single_surname else 総格
+                        values = (天格, 地格, 人格, 総格, 外格, 雲格, 底格)
+                        if accepts("雲格", 雲格) and favors(values) and balanced((given_first,)):
+                            results.append((given_first,))
+                        continue
+
+                    # ===== 枝刈り3：名の最後の文字で決まる雲格 =====
+                    middle_parts = chars - 2
+                    for given_last in range(max(low, rest - middle_parts * high), min(high, rest - middle_parts * low) + 1):
+                        雲格 = 総格 + (1 if is_single_surname else 0) - given_last
+                        if not accepts("雲格", 雲格):
+                            continue
+                        if not favors((天格, 地格, 人格, 総格, 外格, 雲格, 底格)):
+                            continue
+                        for middle in middle_compositions(middle_parts, rest - given_last):
+                            given = (given_first,) + middle + (given_last,)
+                            if balanced(given):
+                                results.append(given)
+
+        results.sort(key=lambda strokes: (len(strokes), strokes))
+        return results
+
+    def surname_context(self, surname: str, surname_strokes: Optional[List[int]] = None,
+                        form_policy: str = FORM_AS_WRITTEN) -> "SurnameContext":
+        """姓だけで決まる部分を事前計算した判定器を作成（1つの姓に多数の名を当てる命名相談用）
+
+        Args:
+            surname: 姓（例："大神"）
+            surname_strokes: 姓の各文字の画数リスト（例：[3, 9]。省略時は辞書から解決）
+            form_policy: 辞書で解決する際の字体の扱い（parse_name参照）
+
+        Returns:
+            SurnameContext（assess / assess_record / rank で名を判定）
+        """
+        return SurnameContext(self, self.parse_characters(surname, surname_strokes, form_policy, part="姓"))
+
+class SurnameContext:
+    """1つの姓について、名に依らない部分を事前計算した判定器（命名相談用）
+
+    天格（姓の合計）・総格の姓側・人格の姓側（姓の最後の文字）・底格の姓側（姓の最初の文字）・
+    陰陽配列の姓側の符号・接合部の姓側の陰陽は姓だけで決まるため、作成時に一度だけ求める。
+    名ごとの計算は名の合計・先頭・末尾・文字数から七格を出し、参照テーブルを引くだけで済む。
+    結果は FortuneTellerAssessment.assess_record と同じ（判定結果キャッシュも共有する）。
+    テーブルを読み込み直した場合（reload_tables）は作り直すこと。
+    """
+
+    def __init__(self, assessment: FortuneTellerAssessment, surname: Sequence[Character]):
+        """
+        Args:
+            assessment: 判定に使う FortuneTellerAssessment
+            surname: 姓の文字リスト（parse_characters の結果）
+        """
+        if not surname:
+            raise ValueError("姓は1文字以上必要です。")
+        self.assessment = assessment
+        self.surname = list(surname)
+        self.surname_strokes = tuple(c.strokes for c in surname)
+        self._profile = assessment.lookup.profile
+        self._cache = assessment.cache
+        classifier = assessment.yin_yang_classifier
+        self._classify = classifier.classify
+
+        strokes = self.surname_strokes
+        length = len(strokes)
+        is_single_surname = length == 1
+        self._surname_total = sum(strokes)
+        self._surname_last = strokes[-1]
+        self._is_single_surname = is_single_surname
+
+        # 天格は姓だけで決まる（星導分布・人材4類型への寄与も固定）
+        self._heaven = self._surname_total
+        self._heaven_profile = self._profile(self._heaven)
+
+        # 雲格 = 総格 + (1字姓なら霊数1) - (2字以上の名なら名の最後の文字)
+        self._cloud_spirit = 1 if is_single_surname else 0
+        # 底格 = 総格 + 底格の補正（名が1字か否かで2通り：1字名は霊数1、2字以上の姓は姓の最初の文字を引く）
+        surname_first = 0 if is_single_surname else strokes[0]
+        self._floor_offsets = (-surname_first, 1 - surname_first)
+
+        # 陰陽配列は姓の部分の符号（番兵なし）に名の符号を継ぎ足す。接合部は名頭の奇偶で2通り
+        self._surname_length = length
+        self._surname_parity = parity_code(strokes) ^ (1 << length)
+        self._junctions = (classifier.junction(self._surname_last, 0), classifier.junction(self._surname_last, 1))
+
+    def frame_values(self, given_strokes: Sequence[int]) -> Tuple[int, ...]:
+        """名の画数から七格の数値を計算（calculate_main_frames / calculate_supplementary_frames と同じ規則）
+
+        Args:
+            given_strokes: 名の各文字の画数（1文字以上）
+
+        Returns:
+            七格の数値（FRAME_NAMESの順）
+        """
+        is_single_given = len(given_strokes) == 1
+        地格 = sum(given_strokes)
+        人格 = self._surname_last + given_strokes[0]
+        総格 = self._surname_total + 地格
+        外格 = 総格 if self._is_single_surname and is_single_given else 総格 - 人格
+        雲格 = 総格 + self._cloud_spirit - (0 if is_single_given else given_strokes[-1])
+        底格 = 総格 + self._floor_offsets[is_single_given]
+        return (self._heaven, 地格, 人格, 総格, 外格, 雲格, 底格)
+
+    def core(self, given_strokes: Sequence[int]) -> Tuple:
+        """名の画数から判定結果の本体を計算（_assess_core と同じ形。判定結果キャッシュを共有）
+
+        Args:
+            given_strokes: 名の各文字の画数（1文字以上）
+
+        Returns:
+            AssessmentRecord の引数のうち文字リスト以外（_assess_core 参照）
+        """
+        given_strokes = tuple(given_strokes)
+        key = (self.surname_strokes, given_strokes)
+        core = self._cache.get(key)
+        if core is not None:
+            return core
+
+        values = self.frame_values(given_strokes)
+        profiles = (self._heaven_profile,) + tuple(map(self._profile, values[1:]))
+        star_bits = 0
+        personnel_bits = 0
+        for profile, weight in zip(profiles, FRAME_WEIGHTS):
+            star_bits += profile.star_bits
+            personnel_bits += profile.personnel_bits * weight
+        yin_yang_code = self._surname_parity | (parity_code(given_strokes) << self._surname_length)
+        core = (values, profiles,
+                unpack_counts(star_bits, STAR_COUNT_BITS, len(STAR_NAMES)),
+                unpack_counts(personnel_bits, PERSONNEL_COUNT_BITS, len(PERSONNEL_TYPE_NAMES)),
+                yin_yang_code, self._classify(yin_yang_code), self._junctions[given_strokes[0] & 1])
+        self._cache.put(key, core)
+        return core
+
+    def assess_record(self, given_name: str, given_strokes: Optional[List[int]] = None,
+                      form_policy: str = FORM_AS_WRITTEN) -> AssessmentRecord:
+        """名を判定して整数で表した判定結果を取得（assess_record と同じ結果）
+
+        Args:
+            given_name: 名（例："加五郎兵衛"）
+            given_strokes: 名の各文字の画数リスト（省略時は辞書から解決）
+            form_policy: 辞書で解決する際の字体の扱い（parse_name参照）
+
+        Returns:
+            AssessmentRecord
+        """
+        given = self.assessment.parse_characters(given_name, given_strokes, form_policy, part="名")
+        if not given:
+            raise ValueError("名は1文字以上必要です。")
+        return AssessmentRecord(self.surname, given, *self.core([c.strokes for c in given]))
+
+    def assess(self, given_name: str, given_strokes: Optional[List[int]] = None,
+               form_policy: str = FORM_AS_WRITTEN) -> Dict:
+        """名を判定して鑑定結果の辞書を取得（assess と同じ結果）
+
+        Args:
+            given_name: 名（例："加五郎兵衛"）
+            given_strokes: 名の各文字の画数リスト（省略時は辞書から解決）
+            form_policy: 辞書で解決する際の字体の扱い（parse_name参照）
+
+        Returns:
+            鑑定結果の辞書
+        """
+        return self.assess_record(given_name, given_strokes, form_policy).to_dict()
+
+    def _score_tables(self, scoring: NamingScore) -> Tuple[Tuple[List[float], ...], float, Tuple[float, ...],
+                                                           Tuple[float, ...]]:
+        """総合点の計算表（格ごとの「数値 → 重み×吉凶の点」、天格の点、陰陽配列・接合部の点）"""
+        scoring.validate()
+        fortune_points = scoring.fortune_points
+        profiles = [self._profile(value) for value in range(SPIRIT_LOOKUP_SIZE)]
+        frame_tables = tuple(
+            [scoring.frame_weights.get(name, 0) * fortune_points.get(profile.fortune, 0) for profile in profiles]
+            for name in FRAME_NAMES
+        )
+        heaven_points = scoring.frame_weights.get("天格", 0) * fortune_points.get(self._heaven_profile.fortune, 0)
+        yin_yang_points = tuple(scoring.yin_yang_points.get(name, 0) for name in YIN_YANG_CLASS_NAMES)
+        junction_points = tuple(scoring.junction_points.get(name, 0) for name in JUNCTION_CLASS_NAMES)
+        return frame_tables, heaven_points, yin_yang_points, junction_points
+
+    def rank(self, candidates: Iterable[Any], k: int = 10, scoring: Optional[NamingScore] = None,
+             form_policy: str = FORM_AS_WRITTEN, skip_unknown: bool = False) -> List[RankedName]:
+        """名の候補を総合点で順位付けし、上位k件を取得
+
+        候補ごとには七格の数値と計算表の参照だけで総合点を求め（画数の並びが同じ候補は1回だけ）、
+        大きさkのヒープで上位を保持する。判定結果（AssessmentRecord）は上位k件だけ作る。
+
+        Args:
+            candidates: 名の候補。名の文字列（画数は辞書から解決）、または (名, 画数リスト) の組
+            k: 取得する件数
+            scoring: 総合点の配点（省略時は NamingScore() の既定値）
+            form_policy: 辞書で解決する際の字体の扱い（parse_name参照）
+            skip_unknown: Trueの場合は画数を解決できない候補を飛ばす（Falseの場合はValueError）
+
+        Returns:
+            総合点の高い順の RankedName のリスト（同点は候補の順）
+        """
+        if k <= 0:
+            return []
+        scoring = scoring or NamingScore()
+        frame_tables, heaven_points, yin_yang_points, junction_points = self._score_tables(scoring)
+        地格_table, 人格_table, 総格_table, 外格_table, 雲格_table, 底格_table = frame_tables[1:]
+        size = SPIRIT_LOOKUP_SIZE
+        favored_index = (PERSONNEL_TYPE_NAMES.index(scoring.favored_personnel)
+                         if scoring.favored_personnel is not None else None)
+        personnel_mask = (1 << PERSONNEL_COUNT_BITS) - 1
+        profile = self._profile
+        parse_characters = self.assessment.parse_characters
+        frame_values = self.frame_values
+        classify = self._classify
+        surname_parity = self._surname_parity
+        surname_length = self._surname_length
+        junctions = self._junctions
+
+        def score_of(given_strokes: Tuple[int, ...]) -> float:
+            values = frame_values(given_strokes)
+            _, 地格, 人格, 総格, 外格, 雲格, 底格 = values
+            if max(values) < size:
+                score = (heaven_points + 地格_table[地格] + 人格_table[人格] + 総格_table[総格] + 外格_table[外格]
+                         + 雲格_table[雲格] + 底格_table[底格])
+            else:
+                score = heaven_points + sum(table[fold_spirit_number(value)]
+                                            for table, value in zip(frame_tables[1:], values[1:]))
+            code = surname_parity | (parity_code(given_strokes) << surname_length)
+            score += yin_yang_points[classify(code)] + junction_points[junctions[given_strokes[0] & 1]]
+            if favored_index is not None:
+                bits = 0
+                for value, weight in zip(values, FRAME_WEIGHTS):
+                    bits += profile(value).personnel_bits * weight
+                counts = [(bits >> (PERSONNEL_COUNT_BITS * i)) & personnel_mask
+                          for i in range(len(PERSONNEL_TYPE_NAMES))]
+                if counts[favored_index] == max(counts):
+                    score += scoring.personnel_points
+            return score
+
+        # 文字 → 画数（候補どうしで同じ字を何度も辞書で引かないよう、この呼び出しの間だけ覚えておく）
+        known_strokes: Dict[str, int] = {}
+        scores: Dict[Tuple[int, ...], float] = {}
+        heap: List[Tuple[float, int, str, List[Character]]] = []
+        for order, candidate in enumerate(candidates):
+            if isinstance(candidate, str):
+                given_name, given_strokes = candidate, None
+            else:
+                given_name, given_strokes = candidate
+            given = None
+            if given_strokes is None:
+                characters = split_name_characters(given_name)
+                if all(char in known_strokes for char in characters):
+                    given = [Character(char, known_strokes[char]) for char in characters]
+            if given is None:
+                try:
+                    given = parse_characters(given_name, given_strokes, form_policy, part="名")
+                except ValueError:
+                    if skip_unknown:
+                        continue
+                    raise
+                if given_strokes is None:
+                    # 「々」は前の文字に依るため覚えない
+                    known_strokes.update((c.char, c.strokes) for c in given if c.char != '々')
+            if not given:
+                continue
+            strokes = tuple(c.strokes for c in given)
+            score = scores.get(strokes)
+            if score is None:
+                score = scores[strokes] = score_of(strokes)
+
+            # 最小ヒープの先頭が上位k件の最下位（同点なら後の候補ほど小さい）
+            if len(heap) < k:
+                heappush(heap, (score, -order, given_name, given))
+            elif score > heap[0][0]:
+                heappushpop(heap, (score, -order, given_name, given))
+
+        ranked = []
+        for score, _, given_name, given in sorted(heap, reverse=True):
+            strokes = tuple(c.strokes for c in given)
+            ranked.append(RankedName(score, given_name, strokes, AssessmentRecord(self.surname, given, *self.core(strokes))))
+        return ranked
+
+
+def run_command(argv: List[str]) -> int:
+    """サブコマンドを実行
+
+    Args:
+        argv: コマンドライン引数（サブコマンド以降）
+
+    Returns:
+        終了コード
+    """
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="fortune_teller_assessment.py", description="七格剖象法 姓名判定ツール")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    snapshot_parser = subparsers.add_parser("compile-snapshot", help="JSONテーブルをスナップショットにコンパイル")
+    snapshot_parser.add_argument("--json-dir", help="JSONファイルのディレクトリ（省略時はこのファイルと同じ場所）")
+    snapshot_parser.add_argument("--output", help="出力先（省略時は <json-dir>/seimei_tables.snapshot）")
+
+    rank_parser = subparsers.add_parser("rank", help="1つの姓に対して名の候補を総合点で順位付け（命名相談）")
+    rank_parser.add_argument("surname", help="姓")
+    rank_parser.add_argument("candidates", help="名の候補のファイル（1行に1つ。「名<TAB>画数 画数 ...」も可。- は標準入力）")
+    rank_parser.add_argument("--surname-strokes", help="姓の各文字の画数（例：3,9。省略時は辞書から解決）")
+    rank_parser.add_argument("-k", "--top", type=int, default=10, help="表示する件数")
+    rank_parser.add_argument("--favored-personnel", choices=PERSONNEL_TYPE_NAMES, help="最大であるべき人材類型")
+    rank_parser.add_argument("--personnel-points", type=float, default=1, help="人材類型の条件を満たす場合の加点")
+    rank_parser.add_argument("--skip-unknown", action="store_true", help="画数を解決できない候補を飛ばす")
+
+    import seimei_batch
+    batch_parser = subparsers.add_parser("batch", help="JSONL/CSVの名簿を一括判定してJSONLに書き出す")
+    seimei_batch.add_arguments(batch_parser)
+
+    args = parser.parse_args(argv)
+    if args.command == "compile-snapshot":
+        output_path = compile_snapshot(args.json_dir, args.output)
+        print(f"スナップショットを作成しました：{output_path}")
+    elif args.command == "batch":
+        return seimei_batch.run_from_args(args)
+    elif args.command == "rank":
+        return run_rank(args)
+    return 0
+
+
+def run_rank(args) -> int:
+    """rank サブコマンド：名の候補を総合点で順位付けして上位を表示"""
+    from seimei_batch import parse_strokes
+
+    def candidates(stream) -> Iterable[Tuple[str, Optional[List[int]]]]:
+        for line in stream:
+            name, _, strokes = line.rstrip("\n").partition("\t")
+            if name.strip():
+                yield name.strip(), parse_strokes(strokes)
+
+    assessment = FortuneTellerAssessment()
+    context = assessment.surname_context(args.surname, parse_strokes(args.surname_strokes))
+    scoring = NamingScore(favored_personnel=args.favored_personnel, personnel_points=args.personnel_points)
+    stream = sys.stdin if args.candidates == "-" else open(args.candidates, encoding="utf-8")
+    try:
+        ranked = context.rank(candidates(stream), args.top, scoring, skip_unknown=args.skip_unknown)
+    except ValueError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    for position, entry in enumerate(ranked, start=1):
+        result = entry.record
+        fortunes = " ".join(f"{name}{result.profiles[i].fortune}" for i, name in enumerate(FRAME_NAMES) if i)
+        strokes = ",".join(map(str, entry.given_strokes))
+        print(f"{position:3d}. {entry.score:g}点  {args.surname} {entry.given_name}（{strokes}）  {fortunes}  "
+              f"{YIN_YANG_CLASS_NAMES[result.yin_yang_class]}")
+    return 0
 
 
 def main():
     """
-    直接実行時の警告とガイダンス
+    直接実行時の警告とガイダンス（サブコマンド指定時はそのコマンドを実行）
     """
+    if len(sys.argv) > 1:
+        return run_command(sys.argv[1:])
+
     print("=" * 80)
     print("WARNING: Direct Execution Mode / 警告：直接実行モード")
     print("=" * 80)
@@ -593,6 +2133,6 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
 
 
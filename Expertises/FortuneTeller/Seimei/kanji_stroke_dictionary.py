@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+姓名判断用 漢字画数辞書
+
+kanji_strokes.tsv（人が編集するソースデータ）をコンパクトなバイナリ
+kanji_strokes.bin に変換し、mmapで遅延的に開いて画数を引く。
+コードポイントからレコードへは2段のページ表で O(1) に到達するため、
+起動時に辞書全体を読み込む必要がなく、複数ワーカーでもページキャッシュを共有できる。
+
+バイナリ形式（リトルエンディアン）：
+    ヘッダ      : マジック(4) / 版数(u16) / ページ数(u16) / 登録文字数(u32) / 予約(u32)
+    ページ表    : コードポイント上位ビット（cp >> 8）ごとのページ番号(u16)、未使用は0xFFFF
+    ページ本体  : 1ページ256文字 × レコード(8バイト)
+    レコード    : 画数(u8) / 種別フラグ(u8) / 予約(2) / 対応字体のコードポイント(u32)
+"""
+
+import mmap
+import struct
+import sys
+import unicodedata
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# 字体の扱い（画数の解決方針）
+FORM_AS_WRITTEN = "as-written"  # 表記どおりの字体で数える（七格剖象法の標準）
+FORM_NEW = "new-form"           # 旧字体・異体字を新字体に直して数える
+FORM_OLD = "old-form"           # 新字体を旧字体に直して数える
+FORM_POLICIES = (FORM_AS_WRITTEN, FORM_NEW, FORM_OLD)
+
+# レコードの種別フラグ
+FLAG_VARIANT = 0x01     # 旧字体・異体字（対応字体は新字体）
+FLAG_HAS_OLD = 0x02     # 旧字体を持つ新字体（対応字体は旧字体）
+
+MAGIC = b"KSTR"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHHII")
+PAGE_ENTRY = struct.Struct("<H")
+RECORD = struct.Struct("<BBxxI")
+PAGE_BITS = 8
+PAGE_SIZE = 1 << PAGE_BITS
+MAX_CODEPOINT = 0x30000      # CJK統合漢字拡張Bまでを収録対象とする
+PAGE_TABLE_SIZE = MAX_CODEPOINT >> PAGE_BITS
+NO_PAGE = 0xFFFF
+
+DEFAULT_SOURCE_PATH = Path(__file__).parent / "kanji_strokes.tsv"
+DEFAULT_DICTIONARY_PATH = Path(__file__).parent / "kanji_strokes.bin"
+
+
+def is_variation_selector(char: str) -> bool:
+    """異体字セレクタ（VS1-256）かどうかを判定"""
+    return unicodedata.name(char, "").startswith("VARIATION SELECTOR")
+
+
+def split_name_characters(text: str) -> List[str]:
+    """姓名を文字単位に分割（異体字セレクタは直前の文字と結合して1文字とする）
+
+    Args:
+        text: 姓または名（例："葛\U000E0100城"）
+
+    Returns:
+        文字のリスト（例：["葛\U000E0100", "城"]）
+    """
+    chars = []
+    for char in text:
+        if chars and is_variation_selector(char):
+            chars[-1] += char
+        else:
+            chars.append(char)
+    return chars
+
+
+def read_stroke_source(paths: Iterable[Path]) -> Dict[str, Tuple[int, Optional[str]]]:
+    """TSV形式のソースデータを読み込む
+
+    Args:
+        paths: ソースTSVのパス（後のファイルの登録が優先される）
+
+    Returns:
+        文字 → (画数, 新字体 or None) の辞書
+    """
+    entries = {}
+    for path in paths:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line_number, line in enumerate(f, 1):
+                line = line.rstrip("\n")
+                if not line.strip() or line.startswith("#"):
+                    continue
+                columns = line.split("\t")
+                if len(columns) not in (2, 3) or len(columns[0]) != 1:
+                    raise ValueError(f"{path}:{line_number} の書式が不正です：{line!r}")
+                new_form = columns[2] if len(columns) == 3 and columns[2] else None
+                entries[columns[0]] = (int(columns[1]), new_form)
+    return entries
+
+
+def build_stroke_dictionary(source_paths: Optional[Iterable[Path]] = None,
+                            output_path: Optional[Path] = None) -> Path:
+    """ソースTSVからバイナリ辞書を生成
+
+    同梱の kanji_strokes.tsv は常に最初に読み込み、追加のソースはその登録を上書き・追加する。
+
+    Args:
+        source_paths: 追加のソースTSVのパス（省略時は kanji_strokes.tsv のみ）
+        output_path: 出力先（省略時は kanji_strokes.bin。追加のソースを指定する場合は必須）
+
+    Returns:
+        出力したファイルのパス
+
+    Raises:
+        ValueError: 追加のソースを指定して出力先を省略した場合、またはソースの内容が不正な場合
+    """
+    extra_paths = [Path(p) for p in (source_paths or [])
+                   if Path(p).resolve() != DEFAULT_SOURCE_PATH.resolve()]
+    if extra_paths and output_path is None:
+        # 同梱の kanji_strokes.bin は kanji_strokes.tsv だけから作る（追加の字表で上書きしない）
+        raise ValueError("追加のソースTSVを指定する場合は出力先を指定してください。")
+    source_paths = [DEFAULT_SOURCE_PATH] + extra_paths
+    output_path = Path(output_path or DEFAULT_DICTIONARY_PATH)
+    entries = read_stroke_source(source_paths)
+
+    # 新字体 → 旧字体の逆引き（最初に登録された旧字体を採用）
+    old_forms = {}
+    for char, (_, new_form) in entries.items():
+        if new_form is not None:
+            if new_form not in entries:
+                raise ValueError(f"旧字体「{char}」に対応する新字体「{new_form}」が辞書にありません。")
+            old_forms.setdefault(new_form, char)
+
+    # ページ単位にレコードを配置
+    pages: Dict[int, bytearray] = {}
+    for char, (strokes, new_form) in entries.items():
+        codepoint = ord(char)
+        if codepoint >= MAX_CODEPOINT:
+            raise ValueError(f"「{char}」(U+{codepoint:X}) は収録範囲外です。")
+        if not 0 < strokes < 256:
+            raise ValueError(f"「{char}」の画数 {strokes} が不正です。")
+
+        if new_form is not None:
+            flags, counterpart = FLAG_VARIANT, ord(new_form)
+        elif char in old_forms:
+            flags, counterpart = FLAG_HAS_OLD, ord(old_forms[char])
+        else:
+            flags, counterpart = 0, 0
+
+        page = pages.setdefault(codepoint >> PAGE_BITS, bytearray(PAGE_SIZE * RECORD.size))
+        RECORD.pack_into(page, (codepoint & (PAGE_SIZE - 1)) * RECORD.size, strokes, flags, counterpart)
+
+    # ヘッダ・ページ表・ページ本体の順に書き出す
+    page_table = [NO_PAGE] * PAGE_TABLE_SIZE
+    body = bytearray()
+    for page_number, page_key in enumerate(sorted(pages)):
+        page_table[page_key] = page_number
+        body += pages[page_key]
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(pages), len(entries), 0))
+        f.write(struct.pack(f"<{PAGE_TABLE_SIZE}H", *page_table))
+        f.write(body)
+    return output_path
+
+
+class StrokeDictionary:
+    """mmapで開くバイナリ漢字画数辞書
+
+    ファイルは最初の検索時に開くため、インスタンス生成だけではI/Oが発生しない。
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        """
+        Args:
+            path: バイナリ辞書のパス（省略時は同梱の kanji_strokes.bin）
+        """
+        self.path = Path(path) if path is not None else DEFAULT_DICTIONARY_PATH
+        self._buffer = None
+        self._file = None
+        self._pages_offset = 0
+        self._size = 0
+
+    def _open(self) -> None:
+        """辞書ファイルをmmapで開いてヘッダを検証"""
+        self._file = open(self.path, 'rb')
+        self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, self._size, _ = HEADER.unpack_from(self._buffer, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"{self.path} は対応していない画数辞書です（magic={magic!r}, version={version}）。")
+        self._pages_offset = HEADER.size + PAGE_TABLE_SIZE * PAGE_ENTRY.size
+
+    def close(self) -> None:
+        """mmapとファイルを閉じる（次の検索時に再度開く）"""
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __len__(self) -> int:
+        if self._buffer is None:
+            self._open()
+        return self._size
+
+    def __contains__(self, char: str) -> bool:
+        return self._record(char) is not None
+
+    def _record(self, char: str) -> Optional[Tuple[int, int, int]]:
+        """1文字分のレコード（画数, フラグ, 対応字体）を O(1) で取得"""
+        if self._buffer is None:
+            self._open()
+
+        # 異体字セレクタ付きの文字は基底文字で引く
+        codepoint = ord(char[0])
+        if codepoint >= MAX_CODEPOINT:
+            return None
+        page_number, = PAGE_ENTRY.unpack_from(self._buffer, HEADER.size + (codepoint >> PAGE_BITS) * PAGE_ENTRY.size)
+        if page_number == NO_PAGE:
+            return None
+        offset = self._pages_offset + ((page_number << PAGE_BITS) + (codepoint & (PAGE_SIZE - 1))) * RECORD.size
+        record = RECORD.unpack_from(self._buffer, offset)
+        return record if record[0] else None
+
+    def strokes(self, char: str, form_policy: str = FORM_AS_WRITTEN) -> Optional[int]:
+        """文字の画数を字体の扱いに従って取得
+
+        Args:
+            char: 1文字（異体字セレクタ付きも可）
+            form_policy: FORM_AS_WRITTEN / FORM_NEW / FORM_OLD のいずれか
+
+        Returns:
+            画数（辞書に無い場合はNone）
+        """
+        if form_policy not in FORM_POLICIES:
+            raise ValueError(f"未知の字体の扱いです：{form_policy}（{', '.join(FORM_POLICIES)}のいずれか）")
+        record = self._record(char)
+        if record is None:
+            return None
+
+        strokes, flags, counterpart = record
+        if (form_policy == FORM_NEW and flags & FLAG_VARIANT) or (form_policy == FORM_OLD and flags & FLAG_HAS_OLD):
+            converted = self._record(chr(counterpart))
+            if converted is not None:
+                return converted[0]
+        return strokes
+
+    def variant(self, char: str) -> Optional[str]:
+        """対応する字体（旧字体なら新字体、新字体なら旧字体）を取得"""
+        record = self._record(char)
+        if record is None or not record[1]:
+            return None
+        return chr(record[2])
+
+
+_default_dictionary: Optional[StrokeDictionary] = None
+
+
+def get_default_stroke_dictionary() -> StrokeDictionary:
+    """同梱の画数辞書を返す（プロセス内で1つだけ作成）"""
+    global _default_dictionary
+    if _default_dictionary is None:
+        _default_dictionary = StrokeDictionary()
+    return _default_dictionary
+
+
+def main():
+    """辞書の生成と検索を行うコマンドライン"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="姓名判断用 漢字画数辞書の生成・検索")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    build_parser = subparsers.add_parser("build", help="ソースTSVからバイナリ辞書を生成")
+    build_parser.add_argument("--source", action="append",
+                              help="kanji_strokes.tsv に加えて読み込むソースTSV（複数指定可。後のファイルが優先）")
+    build_parser.add_argument("--output", help="出力先（省略時は kanji_strokes.bin。--source を指定する場合は必須）")
+
+    lookup_parser = subparsers.add_parser("lookup", help="文字列の各文字の画数を表示")
+    lookup_parser.add_argument("text", help="調べる文字列")
+    lookup_parser.add_argument("--form", choices=FORM_POLICIES, default=FORM_AS_WRITTEN, help="字体の扱い")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        if args.source and not args.output:
+            parser.error("--source を指定する場合は --output で出力先を指定してください（同梱の kanji_strokes.bin は上書きしません）")
+        output_path = build_stroke_dictionary(args.source, args.output)
+        dictionary = StrokeDictionary(output_path)
+        print(f"{output_path}: {len(dictionary)}文字")
+        dictionary.close()
+    else:
+        dictionary = get_default_stroke_dictionary()
+        for char in split_name_characters(args.text):
+            strokes = dictionary.strokes(char, args.form)
+            print(f"{char}\t{strokes if strokes is not None else '未登録'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,498 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+姓名判断 一括判定ランナー
+
+JSONL/CSVの名簿をストリームで読み、一定件数ずつのチャンクに分けて
+プロセスプールのワーカー（テーブル読み込み済みの FortuneTellerAssessment）で判定し、
+結果をJSONLで書き出す。
+
+- 同時に処理中のチャンク数に上限を設け、読み込みを待たせて（背圧）メモリ使用量を一定に保つ
+- 出力は入力順（ordered）または完了順（unordered）
+- チャンクごとにチェックポイント（完了済みチャンクと出力ファイルの長さ）を記録し、中断後に再開できる
+- 処理件数とスループットを標準エラー出力に表示する
+- 指定すると集団統計（seimei_statistics）をワーカーごとに集計して結合し、JSONで保存する
+
+入力の各行（JSONLの1オブジェクト、またはCSVの1行）の項目：
+    surname          姓（必須）
+    given_name       名（必須）
+    surname_strokes  姓の各文字の画数（省略時は画数辞書から解決。CSVでは空白区切り）
+    given_strokes    名の各文字の画数（同上）
+    id               任意の識別子（出力にそのまま付ける）
+
+出力の各行：
+    {"index": 入力の通し番号, "id": 識別子, "result": assess()の結果}
+    判定できなかった行は "result" の代わりに "error" にメッセージを入れる
+"""
+
+import csv
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, TextIO, Tuple
+
+from fortune_teller_assessment import FortuneTellerAssessment, preload_shared_tables
+from kanji_stroke_dictionary import split_name_characters
+from seimei_statistics import PopulationStatistics, save_statistics
+
+
+INPUT_FORMATS = ("jsonl", "csv")
+DEFAULT_CHUNK_SIZE = 1000
+CHECKPOINT_VERSION = 1
+PROGRESS_INTERVAL = 1.0  # 進捗表示の間隔（秒）
+
+
+@dataclass
+class BatchSummary:
+    """一括判定の集計"""
+    rows: int = 0          # 今回処理した件数
+    errors: int = 0        # 判定できなかった件数
+    chunks: int = 0        # 今回処理したチャンク数
+    skipped_chunks: int = 0  # チェックポイントにより飛ばしたチャンク数
+    seconds: float = 0.0   # 所要時間
+
+    @property
+    def rows_per_second(self) -> float:
+        """スループット（件/秒）"""
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+def default_workers() -> int:
+    """このプロセスが使えるCPU数（ワーカー数の既定値）"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+# ===== 入力 =====
+
+def detect_format(path: str) -> str:
+    """拡張子から入力形式を判定（.csv 以外はJSONL）"""
+    return "csv" if str(path).lower().endswith(".csv") else "jsonl"
+
+
+def parse_strokes(value: Any) -> Optional[List[int]]:
+    """画数の項目をリストに変換（CSVでは "3 9" のような空白区切り、空欄はNone）
+
+    Raises:
+        ValueError: 画数が正の整数でない場合
+    """
+    if value is None:
+        return None
+    if isinstance(value, list):
+        strokes = value
+    else:
+        text = str(value).strip()
+        if not text:
+            return None
+        strokes = [int(part) for part in text.replace(",", " ").split()]
+    for stroke in strokes:
+        if type(stroke) is not int or stroke < 1:
+            raise ValueError(f"画数は正の整数にしてください：{stroke!r}")
+    return strokes
+
+
+def parse_name_input(record: Dict[str, Any]) -> Tuple[str, str, Optional[List[int]], Optional[List[int]]]:
+    """入力1件から (姓, 名, 姓の画数, 名の画数) を取り出して検証
+
+    画数を指定する場合は各文字の画数をすべて指定する（文字数と要素数が一致しない入力は誤りとして扱う）。
+
+    Raises:
+        KeyError: 姓・名の項目がない場合
+        ValueError: 姓・名が空、画数が正の整数でない、または文字数と画数の要素数が一致しない場合
+    """
+    fields = []
+    for name_key, strokes_key in (("surname", "surname_strokes"), ("given_name", "given_strokes")):
+        name = record[name_key]
+        if not isinstance(name, str) or not name.strip():
+            raise ValueError(f"{name_key} は空でない文字列にしてください")
+        strokes = parse_strokes(record.get(strokes_key))
+        if strokes is not None and len(strokes) != len(split_name_characters(name)):
+            raise ValueError(f"{strokes_key} の要素数（{len(strokes)}）が {name_key} の文字数"
+                             f"（{len(split_name_characters(name))}）と一致しません")
+        fields.append((name, strokes))
+    (surname, surname_strokes), (given_name, given_strokes) = fields
+    return surname, given_name, surname_strokes, given_strokes
+
+
+def iter_records(stream: TextIO, input_format: str) -> Iterator[Any]:
+    """入力を1件ずつ読み出す（JSONLは行の文字列のまま、CSVは列名 → 値の辞書）
+
+    JSONLの解析はワーカー側で行い、親プロセスの負荷を抑える。
+    """
+    if input_format == "csv":
+        yield from csv.DictReader(stream)
+        return
+    for line in stream:
+        if line.strip():
+            yield line
+
+
+def iter_chunks(records: Iterator[Any], chunk_size: int) -> Iterator[Tuple[int, List[Any]]]:
+    """入力をチャンク（チャンク番号, レコードのリスト）に分ける"""
+    chunk_index = 0
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            return
+        yield chunk_index, chunk
+        chunk_index += 1
+
+
+# ===== ワーカー =====
+
+_worker_assessment: Optional[FortuneTellerAssessment] = None
+
+
+def _init_worker(json_dir: Optional[str], use_snapshot: bool) -> None:
+    """ワーカープロセスの初期化（テーブルを読み込んだ判定エンジンを1つ用意）"""
+    global _worker_assessment
+    _worker_assessment = FortuneTellerAssessment(json_dir, use_snapshot=use_snapshot)
+
+
+def assess_line(assessment: FortuneTellerAssessment, record: Any,
+                statistics: Optional[PopulationStatistics] = None) -> Dict[str, Any]:
+    """入力1件を判定して出力1件分の辞書にする
+
+    Args:
+        assessment: 判定エンジン
+        record: JSONLの行の文字列、またはCSVの行の辞書
+        statistics: 判定結果を足し込む集団統計（省略時は集計しない）
+
+    Returns:
+        {"id": ..., "result": ...} または {"id": ..., "error": ...}
+    """
+    output: Dict[str, Any] = {}
+    try:
+        if isinstance(record, str):
+            record = json.loads(record)
+        if record.get("id") not in (None, ""):
+            output["id"] = record["id"]
+        assessed = assessment.assess_record(*parse_name_input(record))
+        output["result"] = assessed.to_dict()
+        if statistics is not None:
+            statistics.add_record(assessed)
+    except (ValueError, KeyError, TypeError, AttributeError, IndexError) as e:
+        output.pop("result", None)
+        output["error"] = f"{type(e).__name__}: {e}"
+    return output
+
+
+def assess_chunk(chunk_index: int, start: int, records: List[Any],
+                 collect_statistics: bool = False) -> Tuple[int, int, int, str, Optional[PopulationStatistics]]:
+    """チャンク1つを判定してJSONLの文字列にする（ワーカーで実行）
+
+    Args:
+        chunk_index: チャンク番号
+        start: チャンク先頭の入力の通し番号
+        records: 入力レコードのリスト
+        collect_statistics: Trueの場合はチャンクの集団統計も作成する
+
+    Returns:
+        (チャンク番号, 件数, エラー件数, JSONLの文字列, チャンクの集団統計またはNone)
+    """
+    assessment = _worker_assessment or FortuneTellerAssessment()
+    statistics = PopulationStatistics() if collect_statistics else None
+    lines = []
+    errors = 0
+    for offset, record in enumerate(records):
+        output = {"index": start + offset}
+        output.update(assess_line(assessment, record, statistics))
+        errors += "error" in output
+        lines.append(json.dumps(output, ensure_ascii=False))
+    lines.append("")
+    return chunk_index, len(records), errors, "\n".join(lines), statistics
+
+
+# ===== チェックポイント =====
+
+class Checkpoint:
+    """完了済みチャンクと出力ファイルの長さを記録するチェックポイント
+
+    watermark未満のチャンクはすべて完了、done はwatermark以降の完了済みチャンク。
+    記録は出力を書いて同期した後に一時ファイル経由で置き換えるため、
+    再開時は出力を記録した長さに切り詰めれば各行がちょうど1回ずつ出力される。
+    集団統計を取っている場合は、完了済みチャンク分の集計の状態も一緒に記録する。
+    """
+
+    def __init__(self, path: Path, chunk_size: int):
+        self.path = Path(path)
+        self.chunk_size = chunk_size
+        self.watermark = 0
+        self.done: Set[int] = set()
+        self.output_size = 0
+        self.statistics: Optional[PopulationStatistics] = None
+
+    @classmethod
+    def load(cls, path: Path, chunk_size: int) -> "Checkpoint":
+        """チェックポイントを読み込む（無ければ新規）"""
+        checkpoint = cls(path, chunk_size)
+        if checkpoint.path.exists():
+            with open(checkpoint.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get("version") != CHECKPOINT_VERSION or state.get("chunk_size") != chunk_size:
+                raise ValueError(f"{path} は別の設定（チャンクサイズ {state.get('chunk_size')}）のチェックポイントです。")
+            checkpoint.watermark = state["watermark"]
+            checkpoint.done = set(state["done"])
+            checkpoint.output_size = state["output_size"]
+            if state.get("statistics") is not None:
+                checkpoint.statistics = PopulationStatistics.from_dict(state["statistics"])
+        return checkpoint
+
+    def is_done(self, chunk_index: int) -> bool:
+        return chunk_index < self.watermark or chunk_index in self.done
+
+    def mark_done(self, chunk_index: int, output_size: int,
+                  statistics: Optional[PopulationStatistics] = None) -> None:
+        """チャンクの完了を記録して保存（statistics はそのチャンクまでの集団統計）"""
+        self.statistics = statistics
+        self.done.add(chunk_index)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+        self.output_size = output_size
+        self.save()
+
+    def save(self) -> None:
+        state = {
+            "version": CHECKPOINT_VERSION,
+            "chunk_size": self.chunk_size,
+            "watermark": self.watermark,
+            "done": sorted(self.done),
+            "output_size": self.output_size,
+            "statistics": self.statistics.to_dict() if self.statistics is not None else None
+        }
+        temporary = self.path.with_name(self.path.name + ".tmp")
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(temporary, self.path)
+
+
+# ===== 進捗表示 =====
+
+class Progress:
+    """処理件数とスループットを標準エラー出力に上書き表示"""
+
+    def __init__(self, enabled: bool = True, stream: TextIO = sys.stderr):
+        self.enabled = enabled
+        self.stream = stream
+        self.started = time.perf_counter()
+        self._last = 0.0
+
+    def update(self, summary: BatchSummary, pending: int, force: bool = False) -> None:
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if not force and now - self._last < PROGRESS_INTERVAL:
+            return
+        self._last = now
+        elapsed = now - self.started
+        rate = summary.rows / elapsed if elapsed else 0.0
+        self.stream.write(f"\r{summary.rows:,}件 {rate:,.0f}件/秒 エラー{summary.errors:,}件 "
+                          f"処理中{pending}チャンク 経過{elapsed:,.0f}秒")
+        self.stream.flush()
+
+    def finish(self, summary: BatchSummary) -> None:
+        if self.enabled:
+            self.update(summary, 0, force=True)
+            self.stream.write("\n")
+            self.stream.flush()
+
+
+# ===== 実行 =====
+
+def run_batch(input_path: str, output_path: str, input_format: Optional[str] = None,
+              workers: Optional[int] = None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+              ordered: bool = True, max_pending: Optional[int] = None,
+              checkpoint_path: Optional[str] = None, json_dir: Optional[str] = None,
+              use_snapshot: bool = True, progress: bool = True,
+              statistics_path: Optional[str] = None) -> BatchSummary:
+    """名簿を一括判定してJSONLに書き出す
+
+    Args:
+        input_path: 入力ファイル（"-" は標準入力）
+        output_path: 出力ファイル（"-" は標準出力）
+        input_format: "jsonl" または "csv"（省略時は拡張子から判定）
+        workers: ワーカープロセス数（省略時はCPU数、0の場合はこのプロセス内で処理）
+        chunk_size: 1チャンクの件数
+        ordered: Trueの場合は入力順に、Falseの場合は完了順に書き出す
+        max_pending: 同時に処理中にするチャンク数の上限（省略時はワーカー数の2倍）
+        checkpoint_path: チェックポイントファイル（指定時は再開可能。出力はファイルのみ）
+        json_dir: JSONテーブルのディレクトリ
+        use_snapshot: コンパイル済みスナップショットを使うかどうか
+        progress: 進捗を標準エラー出力に表示するかどうか
+        statistics_path: 集団統計の保存先（指定時はワーカーごとの部分集計を結合して保存）
+
+    Returns:
+        BatchSummary
+    """
+    input_format = input_format or detect_format(input_path)
+    if input_format not in INPUT_FORMATS:
+        raise ValueError(f"未知の入力形式です：{input_format}（{', '.join(INPUT_FORMATS)}のいずれか）")
+    if chunk_size < 1:
+        raise ValueError("chunk_size は1以上を指定してください。")
+    if checkpoint_path and output_path == "-":
+        raise ValueError("チェックポイントを使う場合は出力ファイルを指定してください。")
+    if workers is None:
+        workers = default_workers()
+    max_pending = max_pending or max(2 * workers, 1)
+
+    checkpoint = Checkpoint.load(Path(checkpoint_path), chunk_size) if checkpoint_path else None
+    summary = BatchSummary()
+    collect_statistics = statistics_path is not None
+    statistics = None
+    if collect_statistics:
+        if checkpoint is not None and checkpoint.statistics is None and (checkpoint.watermark or checkpoint.done):
+            raise ValueError("集団統計を取らずに途中まで処理したチェックポイントからは、集団統計を取って再開できません。")
+        statistics = (checkpoint.statistics if checkpoint is not None and checkpoint.statistics is not None
+                      else PopulationStatistics())
+    reporter = Progress(progress)
+    started = time.perf_counter()
+
+    # 出力を開く（再開時は記録済みの長さに切り詰めて追記）
+    if output_path == "-":
+        output = sys.stdout
+    elif checkpoint is not None and checkpoint.output_size:
+        output = open(output_path, 'r+', encoding='utf-8', newline="\n")
+        output.truncate(checkpoint.output_size)
+        output.seek(checkpoint.output_size)
+    else:
+        output = open(output_path, 'w', encoding='utf-8', newline="\n")
+    source = sys.stdin if input_path == "-" else open(input_path, 'r', encoding='utf-8', newline="")
+
+    def write(chunk_index: int, count: int, errors: int, text: str,
+              chunk_statistics: Optional[PopulationStatistics]) -> None:
+        output.write(text)
+        summary.rows += count
+        summary.errors += errors
+        summary.chunks += 1
+        if chunk_statistics is not None:
+            statistics.merge(chunk_statistics)
+        if checkpoint is not None:
+            output.flush()
+            os.fsync(output.fileno())
+            checkpoint.mark_done(chunk_index, output.tell(), statistics)
+
+    def remaining_chunks() -> Iterator[Tuple[int, List[Any]]]:
+        # チェックポイントで完了済みのチャンクは読み飛ばす
+        for chunk_index, records in iter_chunks(iter_records(source, input_format), chunk_size):
+            if checkpoint is not None and checkpoint.is_done(chunk_index):
+                summary.skipped_chunks += 1
+                continue
+            yield chunk_index, records
+
+    chunks = remaining_chunks()
+
+    try:
+        if workers == 0:
+            # プロセスプールを使わずこのプロセス内で順に処理
+            _init_worker(json_dir, use_snapshot)
+            for chunk_index, records in chunks:
+                write(*assess_chunk(chunk_index, chunk_index * chunk_size, records, collect_statistics))
+                reporter.update(summary, 0)
+        else:
+            # 親でテーブルを読み込んでおき、fork したワーカーに引き継ぐ
+            preload_shared_tables(json_dir, use_snapshot)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                     initargs=(json_dir, use_snapshot)) as pool:
+                pending: Set[Future] = set()
+                finished: Dict[int, Tuple] = {}
+                order = deque()  # 投入したチャンク番号（入力順）
+
+                def drain(block: bool) -> None:
+                    nonlocal pending
+                    if not pending:
+                        return
+                    done, pending = wait(pending, timeout=None if block else 0, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        result = future.result()
+                        if ordered:
+                            finished[result[0]] = result
+                        else:
+                            write(*result)
+                    # 入力順の場合は先頭から連続して完了した分だけ書き出す
+                    while ordered and order and order[0] in finished:
+                        write(*finished.pop(order.popleft()))
+                    reporter.update(summary, len(pending))
+
+                for chunk_index, records in chunks:
+                    # 背圧：処理中（と書き出し待ち）のチャンクが上限に達したら完了を待つ
+                    while len(pending) + len(finished) >= max_pending:
+                        drain(block=True)
+                    pending.add(pool.submit(assess_chunk, chunk_index, chunk_index * chunk_size, records,
+                                            collect_statistics))
+                    if ordered:
+                        order.append(chunk_index)
+                    drain(block=False)
+                while pending:
+                    drain(block=True)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+        else:
+            output.flush()
+
+    if statistics is not None:
+        save_statistics(statistics, statistics_path)
+
+    summary.seconds = time.perf_counter() - started
+    reporter.finish(summary)
+    return summary
+
+
+def add_arguments(parser) -> None:
+    """一括判定のコマンドライン引数を登録（fortune_teller_assessment.py batch と共用）"""
+    parser.add_argument("input", help="入力ファイル（JSONL/CSV、\"-\" は標準入力）")
+    parser.add_argument("output", help="出力ファイル（JSONL、\"-\" は標準出力）")
+    parser.add_argument("--format", choices=INPUT_FORMATS, help="入力形式（省略時は拡張子から判定）")
+    parser.add_argument("--workers", type=int, help="ワーカープロセス数（省略時はCPU数、0はプロセス内で処理）")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="1チャンクの件数")
+    parser.add_argument("--max-pending", type=int, help="同時に処理中にするチャンク数の上限")
+    parser.add_argument("--unordered", action="store_true", help="完了順に書き出す（入力順を保たない）")
+    parser.add_argument("--checkpoint", help="チェックポイントファイル（指定すると中断後に再開できる）")
+    parser.add_argument("--json-dir", help="JSONテーブルのディレクトリ")
+    parser.add_argument("--no-snapshot", action="store_true", help="スナップショットを使わずJSONから読み込む")
+    parser.add_argument("--stats", help="集団統計（七格の吉凶率・星導分布・人材4類型など）の保存先（JSON）")
+    parser.add_argument("--quiet", action="store_true", help="進捗を表示しない")
+
+
+def run_from_args(args) -> int:
+    """解析済みの引数で一括判定を実行"""
+    summary = run_batch(
+        args.input, args.output,
+        input_format=args.format,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        ordered=not args.unordered,
+        max_pending=args.max_pending,
+        checkpoint_path=args.checkpoint,
+        json_dir=args.json_dir,
+        use_snapshot=not args.no_snapshot,
+        progress=not args.quiet,
+        statistics_path=args.stats
+    )
+    if not args.quiet:
+        print(f"完了：{summary.rows:,}件（エラー{summary.errors:,}件、スキップ{summary.skipped_chunks}チャンク）"
+              f" {summary.seconds:,.1f}秒 {summary.rows_per_second:,.0f}件/秒", file=sys.stderr)
+    return 1 if summary.errors else 0
+
+
+def main():
+    """一括判定のコマンドライン"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="姓名判断 一括判定（JSONL/CSV → JSONL）")
+    add_arguments(parser)
+    return run_from_args(parser.parse_args())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
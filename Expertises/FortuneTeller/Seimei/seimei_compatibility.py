@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+姓名判断用 五気相性エンジン
+
+七格剖象法鑑定理論の「個人間相性」に従い、二人の人格・総格の五行から
+4つの関係（自分の人格→相手の人格、人格→総格、総格→人格、総格→総格）の
+五気を五気判定マトリックス.jsonで判定し、影響度の合計を相性スコアとする。
+
+相性は (人格の五行, 総格の五行) の25通りの組（相性符号）だけで決まるため、
+25×25のスコア表を一度だけ作り、個人は相性符号（整数）で表す。
+N人どうしのスコアは表の行を添字で引くだけのブロック演算になり、
+上位k人の相手や上位kペアの検索は符号ごとの名簿をスコア順にたどるため、
+N×Nの行列を作らずに済む。
+"""
+
+import sys
+from array import array
+from bisect import bisect_right
+from heapq import merge
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from fortune_teller_assessment import ELEMENT_NAMES, AssessmentRecord, FortuneTellerAssessment
+
+
+# 相性を見る4つの関係（自分の格 → 相手の格）
+RELATION_NAMES = ("人格→人格", "人格→総格", "総格→人格", "総格→総格")
+
+# 相性符号 = 人格の五行番号 × 5 + 総格の五行番号（五行が不明な場合は INVALID_CODE）
+ELEMENT_COUNT = len(ELEMENT_NAMES)
+CODE_COUNT = ELEMENT_COUNT * ELEMENT_COUNT
+INVALID_CODE = CODE_COUNT
+
+ELEMENT_IDS = {name: element_id for element_id, name in enumerate(ELEMENT_NAMES)}
+
+
+def element_code(personality_element: int, total_element: int) -> int:
+    """人格・総格の五行番号から相性符号を作成
+
+    Args:
+        personality_element: 人格の五行番号（ELEMENT_NAMESの添字、不明なら-1）
+        total_element: 総格の五行番号（ELEMENT_NAMESの添字、不明なら-1）
+
+    Returns:
+        相性符号（0-24、不明な場合は INVALID_CODE）
+    """
+    if not (0 <= personality_element < ELEMENT_COUNT and 0 <= total_element < ELEMENT_COUNT):
+        return INVALID_CODE
+    return personality_element * ELEMENT_COUNT + total_element
+
+
+def code_from_record(record: AssessmentRecord) -> int:
+    """assess_record() の判定結果から相性符号を作成"""
+    return element_code(record.profiles[2].element_id, record.profiles[3].element_id)
+
+
+def code_from_result(result: Mapping) -> int:
+    """assess() の結果の辞書から相性符号を作成"""
+    frames = result["七格"]
+    return element_code(ELEMENT_IDS.get(frames["人格"]["五行"], -1), ELEMENT_IDS.get(frames["総格"]["五行"], -1))
+
+
+def codes_from_columns(columns: Mapping) -> array:
+    """assess_many() の列指向の結果から相性符号の列を作成"""
+    frames = columns["七格"]
+    return array("B", [
+        element_code(ELEMENT_IDS.get(personality, -1), ELEMENT_IDS.get(total, -1))
+        for personality, total in zip(frames["人格"]["五行"], frames["総格"]["五行"])
+    ])
+
+
+class CompatibilityEngine:
+    """五気判定マトリックスから作る相性スコア表
+
+    スコア表の行・列は相性符号（最後の INVALID_CODE は常に0点）。
+    片方向のスコアは「自分から見た」4関係の影響度の合計（-12〜+12）、
+    相互スコア（mutual=True）は両方向の合計（-24〜+24）。
+    """
+
+    def __init__(self, five_elements: Mapping):
+        """
+        Args:
+            five_elements: 五気判定マトリックス.json の内容
+        """
+        matrix = five_elements["五行判定マトリックス"]
+        # 五行番号 × 五行番号 → 五気判定マトリックスのレコード（行が自分、列が相手）
+        self._relations = tuple(tuple(matrix[own][other] for other in ELEMENT_NAMES) for own in ELEMENT_NAMES)
+        influence = [[relation["影響度"] for relation in row] for row in self._relations]
+
+        directed = []
+        for own in range(CODE_COUNT + 1):
+            row = array("b", bytes(CODE_COUNT + 1))
+            if own != INVALID_CODE:
+                own_personality, own_total = divmod(own, ELEMENT_COUNT)
+                for other in range(CODE_COUNT):
+                    other_personality, other_total = divmod(other, ELEMENT_COUNT)
+                    row[other] = (influence[own_personality][other_personality]
+                                  + influence[own_personality][other_total]
+                                  + influence[own_total][other_personality]
+                                  + influence[own_total][other_total])
+            directed.append(row)
+        self._directed = tuple(directed)
+        self._mutual = tuple(
+            array("b", [directed[own][other] + directed[other][own] for other in range(CODE_COUNT + 1)])
+            for own in range(CODE_COUNT + 1)
+        )
+
+    @classmethod
+    def from_assessment(cls, assessment: FortuneTellerAssessment) -> "CompatibilityEngine":
+        """姓名判定エンジンが読み込んだ五気判定マトリックスから作成"""
+        return cls(assessment.five_elements)
+
+    def table(self, mutual: bool = False) -> Tuple[array, ...]:
+        """相性符号 × 相性符号のスコア表（行が自分）"""
+        return self._mutual if mutual else self._directed
+
+    def score(self, own_code: int, other_code: int, mutual: bool = False) -> int:
+        """二人の相性スコア
+
+        Args:
+            own_code: 自分の相性符号
+            other_code: 相手の相性符号
+            mutual: Trueの場合は両方向の合計
+
+        Returns:
+            相性スコア
+        """
+        return self.table(mutual)[own_code][other_code]
+
+    def relations(self, own_code: int, other_code: int) -> Dict[str, Dict]:
+        """4つの関係それぞれの五気と影響度（鑑定書用の詳細）
+
+        Args:
+            own_code: 自分の相性符号
+            other_code: 相手の相性符号
+
+        Returns:
+            {'人格→人格': {'五気': str, '影響度': int, '説明': str}, ..., '合計': int}
+        """
+        if own_code == INVALID_CODE or other_code == INVALID_CODE:
+            raise ValueError("五行が不明な人物の相性は判定できません。")
+        own = divmod(own_code, ELEMENT_COUNT)
+        other = divmod(other_code, ELEMENT_COUNT)
+        details = {}
+        for name, (own_index, other_index) in zip(RELATION_NAMES, ((0, 0), (0, 1), (1, 0), (1, 1))):
+            relation = self._relations[own[own_index]][other[other_index]]
+            details[name] = {"五気": relation["五気"], "影響度": relation["影響度"], "説明": relation["説明"]}
+        details["合計"] = self.score(own_code, other_code)
+        return details
+
+    def score_block(self, row_codes: Sequence[int], column_codes: Sequence[int],
+                    mutual: bool = False) -> List[array]:
+        """行の人物 × 列の人物のスコア行列（ブロック）を作成
+
+        Args:
+            row_codes: 行（自分）の相性符号の列
+            column_codes: 列（相手）の相性符号の列
+            mutual: Trueの場合は両方向の合計
+
+        Returns:
+            行ごとのスコア配列のリスト
+        """
+        table = self.table(mutual)
+        return [array("b", map(table[code].__getitem__, column_codes)) for code in row_codes]
+
+    def iter_score_blocks(self, codes: Sequence[int], block_size: int = 1024,
+                          mutual: bool = False) -> Iterator[Tuple[int, List[array]]]:
+        """全員 × 全員のスコア行列を行ブロックごとに順に作成
+
+        一度に保持するのは block_size × N のブロックだけのため、N×Nの行列が
+        メモリに載らない人数でも全ペアを走査できる。
+
+        Args:
+            codes: 全員の相性符号の列
+            block_size: 1ブロックの行数
+            mutual: Trueの場合は両方向の合計
+
+        Yields:
+            (ブロック先頭の行番号, 行ごとのスコア配列のリスト)
+        """
+        for start in range(0, len(codes), block_size):
+            yield start, self.score_block(codes[start:start + block_size], codes, mutual)
+
+    def team_score(self, codes: Iterable[int], mutual: bool = False) -> int:
+        """チーム内の全ペア（自分自身を除く順序対）のスコアの合計
+
+        相性符号ごとの人数から計算するため、人数に関わらず25×25の演算で済む。
+
+        Args:
+            codes: チーム全員の相性符号
+            mutual: Trueの場合は両方向の合計（各ペアを2回数えることになる）
+
+        Returns:
+            スコアの合計
+        """
+        counts = [0] * (CODE_COUNT + 1)
+        for code in codes:
+            counts[code] += 1
+        table = self.table(mutual)
+        total = 0
+        present = [(code, count) for code, count in enumerate(counts) if count]
+        for own, own_count in present:
+            row = table[own]
+            total += own_count * sum(row[other] * other_count for other, other_count in present)
+            total -= own_count * row[own]  # 自分自身とのペアを除く
+        return total
+
+
+class CompatibilityRoster:
+    """相性符号ごとに人物番号をまとめた名簿（上位k件の検索用）
+
+    人物は追加順に0からの番号を振る。名簿は符号ごとの番号配列だけを持つため、
+    ストリームで読み込みながら追加でき、メモリはN個の番号分で済む。
+    """
+
+    def __init__(self, engine: CompatibilityEngine, codes: Iterable[int] = ()):
+        """
+        Args:
+            engine: 相性スコア表
+            codes: 初期メンバーの相性符号
+        """
+        self.engine = engine
+        self.codes = array("B")
+        self._members = tuple(array("l") for _ in range(CODE_COUNT + 1))
+        self.extend(codes)
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def add(self, code: int) -> int:
+        """人物を追加して番号を返す"""
+        if not 0 <= code <= INVALID_CODE:
+            raise ValueError(f"相性符号が範囲外です：{code}")
+        person = len(self.codes)
+        self.codes.append(code)
+        self._members[code].append(person)
+        return person
+
+    def extend(self, codes: Iterable[int]) -> None:
+        """複数の人物を追加（ストリームからの逐次追加にも使える）"""
+        for code in codes:
+            self.add(code)
+
+    def _codes_by_score(self, row: array) -> List[Tuple[int, List[int]]]:
+        """スコアの高い順に (スコア, 該当する相性符号のリスト) を並べる"""
+        levels: Dict[int, List[int]] = {}
+        for code in range(CODE_COUNT):
+            if self._members[code]:
+                levels.setdefault(row[code], []).append(code)
+        return sorted(levels.items(), reverse=True)
+
+    def top_partners(self, own_code: int, k: int, mutual: bool = False,
+                     exclude: Optional[int] = None) -> List[Tuple[int, int]]:
+        """ある人物から見て相性の良い上位k人を検索
+
+        Args:
+            own_code: 自分の相性符号
+            k: 取得する人数
+            mutual: Trueの場合は両方向の合計で評価
+            exclude: 結果から除く人物番号（名簿内の本人など）
+
+        Returns:
+            (スコア, 人物番号) のリスト（スコアの高い順、同点は番号順）
+        """
+        if own_code == INVALID_CODE:
+            raise ValueError("五行が不明な人物の相性は判定できません。")
+        results = []
+        for score, codes in self._codes_by_score(self.engine.table(mutual)[own_code]):
+            # 同点の符号グループは番号順に併合して必要な人数だけ取り出す
+            people = merge(*(self._members[code] for code in codes))
+            if exclude is not None:
+                people = (person for person in people if person != exclude)
+            for person in islice(people, k - len(results)):
+                results.append((score, person))
+            if len(results) >= k:
+                break
+        return results
+
+    def top_partners_of(self, person: int, k: int, mutual: bool = False) -> List[Tuple[int, int]]:
+        """名簿内の人物から見て相性の良い上位k人を検索（本人を除く）"""
+        return self.top_partners(self.codes[person], k, mutual, exclude=person)
+
+    def _pairs(self, own: int, other: int, mutual: bool) -> Iterator[Tuple[int, int]]:
+        """符号の組に属するペアを番号の辞書順に列挙"""
+        own_members = self._members[own]
+        other_members = self._members[other]
+        if not mutual:
+            return ((i, j) for i in own_members for j in other_members if i != j)
+        if own == other:
+            return ((i, j) for index, i in enumerate(own_members) for j in own_members[index + 1:])
+        # 相互スコアは対称のため、小さい番号を先にした組を両方向から集めて併合
+        forward = ((i, j) for i in own_members for j in other_members[bisect_right(other_members, i):])
+        backward = ((j, i) for j in other_members for i in own_members[bisect_right(own_members, j):])
+        return merge(forward, backward)
+
+    def top_pairs(self, k: int, mutual: bool = True) -> List[Tuple[int, int, int]]:
+        """名簿全体で相性の良い上位kペアを検索（マッチング・チーム編成用）
+
+        Args:
+            k: 取得するペア数
+            mutual: Trueの場合は両方向の合計で評価し、各ペアを1回だけ数える。
+                    Falseの場合は片方向のスコアで (自分, 相手) の順序対を評価する
+
+        Returns:
+            (スコア, 人物番号, 人物番号) のリスト（スコアの高い順、同点は番号の辞書順）
+        """
+        table = self.engine.table(mutual)
+        levels: Dict[int, List[Tuple[int, int]]] = {}
+        for own in range(CODE_COUNT):
+            if not self._members[own]:
+                continue
+            for other in range(own if mutual else 0, CODE_COUNT):
+                if self._members[other]:
+                    levels.setdefault(table[own][other], []).append((own, other))
+
+        results = []
+        for score, code_pairs in sorted(levels.items(), reverse=True):
+            pairs = merge(*(self._pairs(own, other, mutual) for own, other in code_pairs))
+            for i, j in islice(pairs, k - len(results)):
+                results.append((score, i, j))
+            if len(results) >= k:
+                break
+        return results
+
+
+def main():
+    """assess_many と同じ画数を与えて、上位の相性ペアを表示するコマンドライン"""
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="姓名判断 五気相性の上位ペア検索")
+    parser.add_argument("names", help="姓名の画数のJSON（例：[[[3, 9], [5, 4]], [[11], [7]]]）")
+    parser.add_argument("--top", type=int, default=10, help="表示するペア数")
+    parser.add_argument("--directed", action="store_true", help="片方向のスコアで評価する")
+    args = parser.parse_args()
+
+    assessment = FortuneTellerAssessment()
+    engine = CompatibilityEngine.from_assessment(assessment)
+    roster = CompatibilityRoster(engine)
+    for surname_strokes, given_strokes in json.loads(args.names):
+        record = assessment.assess_record("姓" * len(surname_strokes), "名" * len(given_strokes),
+                                          surname_strokes, given_strokes)
+        roster.add(code_from_record(record))
+    for score, i, j in roster.top_pairs(args.top, mutual=not args.directed):
+        print(f"{score:+d}\t{i}\t{j}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+姓名判断 集団統計
+
+判定結果を1名ずつ足し込んでいく、結合可能な集計器。
+部署ごとの人材4類型の構成、格ごとの吉凶の割合、星導の分布などを
+全件を判定し直さずに更新できる。
+
+1名あたりの星導の出現回数は0-14、人材4類型の度数は0-18と値域が小さいため、
+値ごとの件数（ヒストグラム）をそのまま持つ。これにより平均だけでなく
+分位点も誤差なく求められ、並列ワーカーの部分集計は要素ごとの足し算で結合できる。
+格の数値は値ごとの件数を辞書で持つ。
+"""
+
+import json
+import math
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence
+
+from fortune_teller_assessment import (
+    FRAME_NAMES, JUNCTION_CLASS_NAMES, PERSONNEL_TYPE_NAMES, STAR_NAMES, YIN_YANG_CLASS_NAMES,
+    AssessmentRecord
+)
+
+
+# 1名あたりの最大値（七格×系数・秘数=14、人格・総格を2倍にして18）
+MAX_STAR_COUNT = 2 * len(FRAME_NAMES)
+MAX_PERSONNEL_COUNT = MAX_STAR_COUNT + 4
+
+# 集計結果に出す分位点
+SUMMARY_QUANTILES = (("第1四分位", 0.25), ("中央値", 0.5), ("第3四分位", 0.75))
+
+
+def histogram_quantile(histogram: Sequence[int], q: float) -> Optional[int]:
+    """値ごとの件数（添字が値）から分位点を求める（最近順位法）
+
+    Args:
+        histogram: 値ごとの件数
+        q: 0.0-1.0
+
+    Returns:
+        分位点の値（件数が0ならNone）
+    """
+    total = sum(histogram)
+    if not total:
+        return None
+    rank = max(1, math.ceil(q * total))
+    cumulative = 0
+    for value, count in enumerate(histogram):
+        cumulative += count
+        if cumulative >= rank:
+            return value
+    return len(histogram) - 1
+
+
+def histogram_mean(histogram: Sequence[int]) -> Optional[float]:
+    """値ごとの件数（添字が値）から平均を求める"""
+    total = sum(histogram)
+    if not total:
+        return None
+    return sum(value * count for value, count in enumerate(histogram)) / total
+
+
+def _sparse_histogram(counts: Mapping[int, int]) -> List[int]:
+    """値 → 件数の辞書を、最小値からの密なヒストグラム（と最小値）に変換"""
+    low = min(counts)
+    dense = [0] * (max(counts) - low + 1)
+    for value, count in counts.items():
+        dense[value - low] = count
+    return [low] + dense
+
+
+def _describe(histogram: Sequence[int], offset: int = 0) -> Dict[str, Optional[float]]:
+    """ヒストグラムの平均・分位点"""
+    mean = histogram_mean(histogram)
+    description = {"平均": None if mean is None else round(mean + offset, 4)}
+    for label, q in SUMMARY_QUANTILES:
+        value = histogram_quantile(histogram, q)
+        description[label] = None if value is None else value + offset
+    return description
+
+
+class PopulationStatistics:
+    """判定結果を足し込む結合可能な集計器
+
+    add_record / add_result / add_columns で判定結果を加え、
+    merge（または +=）で別の集計器の内容を結合する。
+    to_dict / from_dict の状態はJSONで保存でき、保存した部分集計どうしも結合できる。
+    """
+
+    def __init__(self):
+        self.count = 0
+        # 星導・人材類型ごとに「1名あたりの回数 → 人数」のヒストグラム
+        self.star_histograms = [[0] * (MAX_STAR_COUNT + 1) for _ in STAR_NAMES]
+        self.personnel_histograms = [[0] * (MAX_PERSONNEL_COUNT + 1) for _ in PERSONNEL_TYPE_NAMES]
+        # 最大の度数を持つ人材類型ごとの人数（同数の場合はそれぞれに数える）
+        self.dominant_personnel = [0] * len(PERSONNEL_TYPE_NAMES)
+        # 格ごとの「吉凶 → 人数」と「数 → 人数」
+        self.fortunes: Dict[str, Dict[str, int]] = {name: {} for name in FRAME_NAMES}
+        self.frame_values: Dict[str, Dict[int, int]] = {name: {} for name in FRAME_NAMES}
+        # 陰陽配列・接合部の評価ごとの人数
+        self.yin_yang = [0] * len(YIN_YANG_CLASS_NAMES)
+        self.junction = [0] * len(JUNCTION_CLASS_NAMES)
+
+    # ===== 足し込み =====
+
+    def _add(self, values: Sequence[int], fortunes: Sequence[Optional[str]], star_counts: Sequence[int],
+             personnel_counts: Sequence[int], yin_yang_class: int, junction_class: int) -> None:
+        """1名分を足し込む（各引数はFRAME_NAMES・STAR_NAMES・PERSONNEL_TYPE_NAMESの順）"""
+        self.count += 1
+        for histogram, count in zip(self.star_histograms, star_counts):
+            histogram[count] += 1
+        for histogram, count in zip(self.personnel_histograms, personnel_counts):
+            histogram[count] += 1
+        highest = max(personnel_counts)
+        for index, count in enumerate(personnel_counts):
+            if count == highest:
+                self.dominant_personnel[index] += 1
+        for name, value, fortune in zip(FRAME_NAMES, values, fortunes):
+            frame_values = self.frame_values[name]
+            frame_values[value] = frame_values.get(value, 0) + 1
+            frame_fortunes = self.fortunes[name]
+            frame_fortunes[fortune] = frame_fortunes.get(fortune, 0) + 1
+        self.yin_yang[yin_yang_class] += 1
+        self.junction[junction_class] += 1
+
+    def add_record(self, record: AssessmentRecord) -> None:
+        """assess_record() の判定結果を1件足し込む"""
+        self._add(record.values, [profile.fortune for profile in record.profiles], record.star_counts,
+                  record.personnel_counts, record.yin_yang_class, record.junction_class)
+
+    def add_result(self, result: Mapping) -> None:
+        """assess() の結果の辞書（一括判定の出力の "result"）を1件足し込む"""
+        frames = result["七格"]
+        yin_yang = result["陰陽配列"]
+        self._add(
+            [frames[name]["数"] for name in FRAME_NAMES],
+            [frames[name]["吉凶"] for name in FRAME_NAMES],
+            [result["星導分布"][star] for star in STAR_NAMES],
+            [result["人材4類型"][personnel_type] for personnel_type in PERSONNEL_TYPE_NAMES],
+            YIN_YANG_CLASS_NAMES.index(yin_yang["評価"]),
+            JUNCTION_CLASS_NAMES.index(yin_yang["接合部評価"])
+        )
+
+    def add_columns(self, columns: Mapping) -> None:
+        """assess_many() の列指向の結果をまとめて足し込む"""
+        frames = columns["七格"]
+        value_columns = [frames[name]["数"] for name in FRAME_NAMES]
+        fortune_columns = [frames[name]["吉凶"] for name in FRAME_NAMES]
+        star_columns = [columns["星導分布"][star] for star in STAR_NAMES]
+        personnel_columns = [columns["人材4類型"][personnel_type] for personnel_type in PERSONNEL_TYPE_NAMES]
+        yin_yang_classes = [YIN_YANG_CLASS_NAMES.index(name) for name in columns["陰陽配列"]["評価"]]
+        junction_classes = [JUNCTION_CLASS_NAMES.index(name) for name in columns["陰陽配列"]["接合部評価"]]
+        for row in range(columns["件数"]):
+            self._add(
+                [column[row] for column in value_columns],
+                [column[row] for column in fortune_columns],
+                [column[row] for column in star_columns],
+                [column[row] for column in personnel_columns],
+                yin_yang_classes[row],
+                junction_classes[row]
+            )
+
+    # ===== 結合 =====
+
+    def merge(self, other: "PopulationStatistics") -> "PopulationStatistics":
+        """別の集計器の内容をこの集計器に結合（自分自身を返す）"""
+        self.count += other.count
+        for mine, theirs in zip(self.star_histograms + self.personnel_histograms,
+                                other.star_histograms + other.personnel_histograms):
+            for index, count in enumerate(theirs):
+                mine[index] += count
+        for counters, others in ((self.dominant_personnel, other.dominant_personnel),
+                                 (self.yin_yang, other.yin_yang), (self.junction, other.junction)):
+            for index, count in enumerate(others):
+                counters[index] += count
+        for name in FRAME_NAMES:
+            for mine, theirs in ((self.fortunes[name], other.fortunes[name]),
+                                 (self.frame_values[name], other.frame_values[name])):
+                for key, count in theirs.items():
+                    mine[key] = mine.get(key, 0) + count
+        return self
+
+    def __iadd__(self, other: "PopulationStatistics") -> "PopulationStatistics":
+        return self.merge(other)
+
+    @classmethod
+    def combine(cls, parts: Iterable["PopulationStatistics"]) -> "PopulationStatistics":
+        """複数の部分集計を結合した新しい集計器を作成"""
+        combined = cls()
+        for part in parts:
+            combined.merge(part)
+        return combined
+
+    # ===== 保存・復元 =====
+
+    def to_dict(self) -> Dict:
+        """JSONで保存できる状態を出力（from_dictで復元、結合可能）"""
+        return {
+            "件数": self.count,
+            "星導分布": dict(zip(STAR_NAMES, self.star_histograms)),
+            "人材4類型": dict(zip(PERSONNEL_TYPE_NAMES, self.personnel_histograms)),
+            "主類型": dict(zip(PERSONNEL_TYPE_NAMES, self.dominant_personnel)),
+            "吉凶": self.fortunes,
+            "七格": {name: {str(value): count for value, count in sorted(values.items())}
+                   for name, values in self.frame_values.items()},
+            "陰陽配列": dict(zip(YIN_YANG_CLASS_NAMES, self.yin_yang)),
+            "接合部": dict(zip(JUNCTION_CLASS_NAMES, self.junction))
+        }
+
+    @classmethod
+    def from_dict(cls, state: Mapping) -> "PopulationStatistics":
+        """to_dict() の状態から復元"""
+        statistics = cls()
+        statistics.count = state["件数"]
+        statistics.star_histograms = [list(state["星導分布"][star]) for star in STAR_NAMES]
+        statistics.personnel_histograms = [list(state["人材4類型"][name]) for name in PERSONNEL_TYPE_NAMES]
+        statistics.dominant_personnel = [state["主類型"][name] for name in PERSONNEL_TYPE_NAMES]
+        statistics.fortunes = {name: dict(state["吉凶"][name]) for name in FRAME_NAMES}
+        statistics.frame_values = {name: {int(value): count for value, count in state["七格"][name].items()}
+                                   for name in FRAME_NAMES}
+        statistics.yin_yang = [state["陰陽配列"][name] for name in YIN_YANG_CLASS_NAMES]
+        statistics.junction = [state["接合部"][name] for name in JUNCTION_CLASS_NAMES]
+        return statistics
+
+    # ===== 集計結果 =====
+
+    def summary(self) -> Dict:
+        """ダッシュボード向けの集計結果（平均・分位点・割合）"""
+        count = self.count
+
+        def rate(value: int) -> Optional[float]:
+            return round(value / count, 4) if count else None
+
+        frames = {}
+        for name in FRAME_NAMES:
+            values = self.frame_values[name]
+            if values:
+                low, *histogram = _sparse_histogram(values)
+                description = _describe(histogram, low)
+            else:
+                description = _describe([])
+            description["吉凶率"] = {fortune: rate(n) for fortune, n in
+                                  sorted(self.fortunes[name].items(), key=lambda item: (-item[1], str(item[0])))}
+            frames[name] = description
+
+        return {
+            "件数": count,
+            "七格": frames,
+            "星導分布": {star: _describe(histogram) for star, histogram in zip(STAR_NAMES, self.star_histograms)},
+            "人材4類型": {name: _describe(histogram)
+                       for name, histogram in zip(PERSONNEL_TYPE_NAMES, self.personnel_histograms)},
+            "主類型の割合": {name: rate(n) for name, n in zip(PERSONNEL_TYPE_NAMES, self.dominant_personnel)},
+            "陰陽配列の割合": {name: rate(n) for name, n in zip(YIN_YANG_CLASS_NAMES, self.yin_yang)},
+            "接合部の割合": {name: rate(n) for name, n in zip(JUNCTION_CLASS_NAMES, self.junction)}
+        }
+
+
+def load_statistics(path: str) -> PopulationStatistics:
+    """保存した集計（一括判定の --stats 出力、または to_dict() の状態）を読み込む"""
+    with open(path, 'r', encoding='utf-8') as f:
+        state = json.load(f)
+    return PopulationStatistics.from_dict(state.get("状態", state))
+
+
+def save_statistics(statistics: PopulationStatistics, path: str) -> None:
+    """集計結果と結合用の状態をJSONで保存"""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({"集計": statistics.summary(), "状態": statistics.to_dict()}, f, ensure_ascii=False, indent=2)
+
+
+def main():
+    """一括判定の出力（JSONL）や保存した集計（JSON）を結合して集計結果を表示するコマンドライン"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="姓名判断 集団統計の集計・結合")
+    parser.add_argument("inputs", nargs="+", help="一括判定の出力（.jsonl）または保存した集計（.json）")
+    parser.add_argument("--save", help="結合した集計の保存先（JSON）")
+    args = parser.parse_args()
+
+    statistics = PopulationStatistics()
+    for path in args.inputs:
+        if Path(path).suffix == ".jsonl":
+            with open(path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    row = json.loads(line)
+                    if "result" in row:
+                        statistics.add_result(row["result"])
+        else:
+            statistics.merge(load_statistics(path))
+
+    if args.save:
+        save_statistics(statistics, args.save)
+    print(json.dumps(statistics.summary(), ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+姓名判定エンジン（fortune_teller_assessment）のテスト
+
+    python -m unittest discover -s Expertises/FortuneTeller/Seimei -p "test_*.py"
+"""
+
+import itertools
+import random
+import sys
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fortune_teller_assessment import FortuneTellerAssessment  # noqa: E402
+
+
+# 大神 加五郎兵衛（[3, 9] / [5, 4, 9, 7, 16]）の鑑定結果（docstringの例）
+EXAMPLE_RESULT = {
+    "姓": {"①大": 3, "②神": 9},
+    "名": {"①加": 5, "②五": 4, "③郎": 9, "④兵": 7, "⑤衛": 16},
+    "七格": {
+        "天格": {"数": 12, "数霊": 12, "系数": 2, "秘数": 3,
+               "系数星導": "月", "秘数星導": "木星",
+               "系数星導＋象意": "月(静寂)", "秘数星導＋象意": "木星(発展)",
+               "吉凶": "▲注意数", "象意": "挫折", "十干": "乙", "五行": "木"},
+        "地格": {"数": 41, "数霊": 41, "系数": 1, "秘数": 5,
+               "系数星導": "太陽", "秘数星導": "水星",
+               "系数星導＋象意": "太陽(創造)", "秘数星導＋象意": "水星(調和)",
+               "吉凶": "○吉数", "象意": "実力", "十干": "甲", "五行": "木"},
+        "人格": {"数": 14, "数霊": 14, "系数": 4, "秘数": 5,
+               "系数星導": "天王星", "秘数星導": "水星",
+               "系数星導＋象意": "天王星(変化)", "秘数星導＋象意": "水星(調和)",
+               "吉凶": "△半吉数", "象意": "不遜", "十干": "丁", "五行": "火"},
+        "総格": {"数": 53, "数霊": 53, "系数": 3, "秘数": 8,
+               "系数星導": "木星", "秘数星導": "土星",
+               "系数星導＋象意": "木星(発展)", "秘数星導＋象意": "土星(忍耐)",
+               "吉凶": "○吉数", "象意": "深謀", "十干": "丙", "五行": "火"},
+        "外格": {"数": 39, "数霊": 39, "系数": 9, "秘数": 3,
+               "系数星導": "火星", "秘数星導": "木星",
+               "系数星導＋象意": "火星(闘争)", "秘数星導＋象意": "木星(発展)",
+               "吉凶": "◎大吉数", "象意": "大器", "十干": "壬", "五行": "水"},
+        "雲格": {"数": 37, "数霊": 37, "系数": 7, "秘数": 0,
+               "系数星導": "海王星", "秘数星導": "冥王星",
+               "系数星導＋象意": "海王星(信念)", "秘数星導＋象意": "冥王星(終末)",
+               "吉凶": "◎大吉数", "象意": "立志", "十干": "庚", "五行": "金"},
+        "底格": {"数": 50, "数霊": 50, "系数": 0, "秘数": 5,
+               "系数星導": "冥王星", "秘数星導": "水星",
+               "系数星導＋象意": "冥王星(終末)", "秘数星導＋象意": "水星(調和)",
+               "吉凶": "×凶数", "象意": "破裂", "十干": "癸", "五行": "水"},
+    },
+    "星導分布": {"太陽": 1, "月": 1, "木星": 3, "天王星": 1, "水星": 3,
+              "金星": 0, "海王星": 1, "土星": 1, "火星": 1, "冥王星": 2},
+    "人材4類型": {"軍人度": 3, "天才度": 3, "秀才度": 9, "凡人度": 3},
+    "陰陽配列": {"配列": "○○○●○○●", "評価": "良好配列◎", "接合部": "陽→陽", "接合部評価": "要注意"},
+}
+
+
+def frame_values(result):
+    """鑑定結果の七格の数値（天格・地格・人格・総格・外格・雲格・底格）"""
+    return tuple(frame["数"] for frame in result["七格"].values())
+
+
+class AssessTest(unittest.TestCase):
+    """assess の鑑定結果と、同じ結果を返す経路（assess_record・SurnameContext）"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.assessment = FortuneTellerAssessment()
+
+    def test_documented_example(self):
+        result = self.assessment.assess("大神", "加五郎兵衛", [3, 9], [5, 4, 9, 7, 16])
+        self.assertEqual(result, EXAMPLE_RESULT)
+        self.assertEqual(list(result["七格"]), ["天格", "地格", "人格", "総格", "外格", "雲格", "底格"])
+
+    def test_single_character_spirit_number(self):
+        # 霊数1は雲格（1字姓）・底格（1字名）にだけ加え、主要五格には加えない
+        cases = [
+            # 1字姓・2字名：雲格 = 総格 + 1 - 名の末字、底格 = 総格
+            ("林", "奈緒", [11], [5, 7], (11, 12, 16, 23, 7, 17, 23)),
+            # 2字姓・1字名：雲格 = 総格、底格 = 総格 + 1 - 姓の頭字
+            ("大神", "昇", [3, 9], [8], (12, 8, 17, 20, 3, 20, 18)),
+            # 1字姓・1字名：外格 = 総格、雲格 = 底格 = 総格 + 1
+            ("林", "昇", [11], [8], (11, 8, 19, 19, 19, 20, 20)),
+        ]
+        for surname, given_name, surname_strokes, given_strokes, expected in cases:
+            with self.subTest(surname=surname, given_name=given_name):
+                result = self.assessment.assess(surname, given_name, surname_strokes, given_strokes)
+                self.assertEqual(frame_values(result), expected)
+                columns = self.assessment.assess_many([surname_strokes], [len(surname_strokes)],
+                                                      [given_strokes], [len(given_strokes)])
+                self.assertEqual(tuple(columns["七格"][name]["数"][0] for name in result["七格"]), expected)
+
+    def test_record_and_surname_context_match_assess(self):
+        rng = random.Random(5)
+        for _ in range(200):
+            surname_strokes = [rng.randint(1, 30) for _ in range(rng.randint(1, 3))]
+            given_strokes = [rng.randint(1, 30) for _ in range(rng.randint(1, 4))]
+            surname, given_name = "山田川"[:len(surname_strokes)], "一二三四"[:len(given_strokes)]
+            with self.subTest(surname_strokes=surname_strokes, given_strokes=given_strokes):
+                expected = self.assessment.assess(surname, given_name, surname_strokes, given_strokes)
+                record = self.assessment.assess_record(surname, given_name, surname_strokes, given_strokes)
+                self.assertEqual(record.to_dict(), expected)
+                context = self.assessment.surname_context(surname, surname_strokes)
+                self.assertEqual(context.assess(given_name, given_strokes), expected)
+                self.assertEqual(context.assess_record(given_name, given_strokes).to_dict(), expected)
+
+
+class AssessManyValidationTest(unittest.TestCase):
+    """assess_many の入力の検証（assess と同じ入力を同じく拒否する）"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.assessment = FortuneTellerAssessment()
+
+    def assertRejected(self, surname_matrix, surname_lengths, given_matrix, given_lengths, message):
+        with self.assertRaises(ValueError) as caught:
+            self.assessment.assess_many(surname_matrix, surname_lengths, given_matrix, given_lengths)
+        self.assertIn(message, str(caught.exception))
+
+    def test_negative_stroke(self):
+        self.assertRejected([[3, -9]], [2], [[5, 4]], [2], "0行目の姓の画数")
+
+    def test_zero_stroke(self):
+        self.assertRejected([[3, 9], [11, 0]], [2, 1], [[5, 4], [5, 0]], [2, 2], "1行目の名の画数")
+
+    def test_non_integer_stroke(self):
+        self.assertRejected([[3, 9.0]], [2], [[5, 4]], [2], "0行目の姓の画数")
+
+    def test_length_wider_than_matrix(self):
+        self.assertRejected([[3, 9], [4, 0]], [2, 1], [[5, 4], [7, 0]], [2, 3], "1行目の名の文字数")
+        self.assertRejected([[3, 9]], [3], [[5, 4]], [2], "0行目の姓の文字数")
+
+    def test_empty_name(self):
+        self.assertRejected([[3, 9]], [0], [[5, 4]], [2], "0行目の姓の文字数")
+
+    def test_mismatched_counts(self):
+        self.assertRejected([[3, 9]], [2, 1], [[5, 4]], [2], "件数が一致しません")
+
+    def test_padding_after_length_is_ignored(self):
+        # 有効な文字数より後ろの0埋めは検証しない
+        columns = self.assessment.assess_many([[3, 9, 0]], [2], [[5, 4, 0, 0]], [2])
+        self.assertEqual(columns["七格"]["総格"]["数"][0], 21)
+
+
+
+class SearchGivenStrokesTest(unittest.TestCase):
+    """search_given_strokes（枝刈り探索）と全件の総当たりの一致"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.assessment = FortuneTellerAssessment()
+
+    def brute_force(self, surname_strokes, frame_fortunes=None, favored_personnel=None, max_chars=4, min_chars=1,
+                    stroke_range=(1, 30), yin_yang_classes=None, good_junction=False):
+        """範囲内の全ての名の画数を assess で判定し、条件で絞り込む"""
+        low, high = stroke_range
+        surname = "山" * len(surname_strokes)
+        found = []
+        for length in range(min_chars, max_chars + 1):
+            for given_strokes in itertools.product(range(low, high + 1), repeat=length):
+                result = self.assessment.assess(surname, "一" * length, surname_strokes, list(given_strokes))
+                frames = result["七格"]
+                if any(frames[name]["吉凶"] not in fortunes for name, fortunes in (frame_fortunes or {}).items()):
+                    continue
+                personnel = result["人材4類型"]
+                if favored_personnel and personnel[favored_personnel] != max(personnel.values()):
+                    continue
+                if yin_yang_classes is not None and result["陰陽配列"]["評価"] not in yin_yang_classes:
+                    continue
+                if good_junction and result["陰陽配列"]["接合部評価"] != "良好":
+                    continue
+                found.append(given_strokes)
+        return found
+
+    def assertMatchesBruteForce(self, surname_strokes, **conditions):
+        expected = self.brute_force(surname_strokes, **conditions)
+        self.assertEqual(self.assessment.search_given_strokes(surname_strokes, **conditions), expected)
+        return expected
+
+    def test_without_conditions(self):
+        # 条件なしは範囲内の全ての組み合わせ（文字数→辞書順）
+        found = self.assertMatchesBruteForce([3, 9], max_chars=2, stroke_range=(2, 6))
+        self.assertEqual(len(found), 5 + 5 * 5)
+
+    def test_frame_fortunes(self):
+        for surname_strokes in ([3, 9], [11], [5, 4, 7]):
+            with self.subTest(surname_strokes=surname_strokes):
+                found = self.assertMatchesBruteForce(
+                    surname_strokes, max_chars=2, stroke_range=(1, 12),
+                    frame_fortunes={"人格": ["◎大吉数", "○吉数"], "総格": ["◎大吉数", "○吉数"],
+                                    "雲格": ["◎大吉数", "○吉数", "△半吉数"]})
+                self.assertTrue(found)
+
+    def test_favored_personnel(self):
+        for favored in ("軍人度", "秀才度"):
+            with self.subTest(favored_personnel=favored):
+                self.assertTrue(self.assertMatchesBruteForce([3, 9], max_chars=2, stroke_range=(1, 12),
+                                                             favored_personnel=favored))
+
+    def test_yin_yang_and_junction(self):
+        for surname_strokes in ([3, 9], [8]):
+            with self.subTest(surname_strokes=surname_strokes):
+                self.assertTrue(self.assertMatchesBruteForce(surname_strokes, max_chars=2, stroke_range=(3, 10),
+                                                             yin_yang_classes=["良好配列◎"]))
+                self.assertTrue(self.assertMatchesBruteForce(surname_strokes, max_chars=2, stroke_range=(3, 10),
+                                                             good_junction=True))
+
+    def test_combined_conditions(self):
+        self.assertMatchesBruteForce([4, 5], min_chars=2, max_chars=2, stroke_range=(1, 14),
+                                     frame_fortunes={"地格": ["◎大吉数", "○吉数"], "外格": ["◎大吉数", "○吉数"]},
+                                     favored_personnel="天才度", yin_yang_classes=["良好配列◎", "標準配列○"],
+                                     good_junction=True)
+        # 1文字の名だけ・1文字の姓（霊数を含む格）
+        self.assertMatchesBruteForce([12], min_chars=1, max_chars=1, stroke_range=(1, 25),
+                                     frame_fortunes={"人格": ["◎大吉数"], "底格": ["◎大吉数", "○吉数"]},
+                                     yin_yang_classes=["良好配列◎", "標準配列○"])
+
+    def test_no_match(self):
+        # 許容する吉凶が無ければ空
+        self.assertEqual(self.assertMatchesBruteForce([3, 9], max_chars=2, stroke_range=(1, 5),
+                                                      frame_fortunes={"総格": []}), [])
+
+    def test_invalid_arguments(self):
+        search = self.assessment.search_given_strokes
+        for stroke_range in ((0, 10), (5, 4), (-3, 2)):
+            with self.subTest(stroke_range=stroke_range):
+                with self.assertRaises(ValueError) as caught:
+                    search([3, 9], stroke_range=stroke_range)
+                self.assertIn("stroke_range", str(caught.exception))
+        for min_chars, max_chars in ((0, 2), (3, 2), (1, 0)):
+            with self.subTest(min_chars=min_chars, max_chars=max_chars):
+                with self.assertRaises(ValueError) as caught:
+                    search([3, 9], min_chars=min_chars, max_chars=max_chars)
+                self.assertIn("min_chars", str(caught.exception))
+        with self.assertRaises(ValueError):
+            search([])
+        with self.assertRaises(ValueError):
+            search([3, 9], frame_fortunes={"幸格": ["◎大吉数"]})
+        with self.assertRaises(ValueError):
+            search([3, 9], favored_personnel="達人度")
+        with self.assertRaises(ValueError):
+            search([3, 9], yin_yang_classes=["最良配列"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+名簿一括判定（seimei_batch）のテスト
+
+チェックポイントからの再開（出力の切り詰め・完了済みチャンクの読み飛ばし・集団統計の復元）と、
+入力順・完了順の書き出しを確かめる。
+
+    python -m unittest discover -s Expertises/FortuneTeller/Seimei -p "test_*.py"
+"""
+
+import json
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import seimei_batch  # noqa: E402
+from fortune_teller_assessment import FortuneTellerAssessment  # noqa: E402
+from seimei_batch import Checkpoint, run_batch  # noqa: E402
+from seimei_statistics import load_statistics  # noqa: E402
+
+
+RECORD_COUNT = 53
+CHUNK_SIZE = 5
+
+
+def make_records(count: int, seed: int = 7):
+    """画数を指定した入力レコード（辞書に頼らない）と、誤りのレコードを混ぜて作る"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(count):
+        if i % 17 == 16:
+            records.append({"id": f"r{i}", "surname": "山田", "given_name": "太郎", "given_strokes": [0, 9]})
+            continue
+        surname_strokes = [rng.randint(1, 25) for _ in range(rng.randint(1, 3))]
+        given_strokes = [rng.randint(1, 25) for _ in range(rng.randint(1, 3))]
+        records.append({"id": f"r{i}", "surname": "山田川"[:len(surname_strokes)],
+                        "given_name": "一二三"[:len(given_strokes)],
+                        "surname_strokes": surname_strokes, "given_strokes": given_strokes})
+    return records
+
+
+def read_output(path: Path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+class RunBatchTest(unittest.TestCase):
+    """run_batch の書き出しと再開"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.records = make_records(RECORD_COUNT)
+        cls.assessment = FortuneTellerAssessment()
+
+    def setUp(self):
+        temp = tempfile.TemporaryDirectory()
+        self.addCleanup(temp.cleanup)
+        self.directory = Path(temp.name)
+        self.input_path = self.directory / "names.jsonl"
+        with open(self.input_path, "w", encoding="utf-8") as f:
+            for record in self.records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def run_batch(self, output_name: str, **kwargs):
+        kwargs.setdefault("workers", 0)
+        kwargs.setdefault("chunk_size", CHUNK_SIZE)
+        return run_batch(str(self.input_path), str(self.directory / output_name), progress=False, **kwargs)
+
+    def expected(self, index: int):
+        record = self.records[index]
+        return self.assessment.assess(record["surname"], record["given_name"],
+                                      record.get("surname_strokes"), record["given_strokes"])
+
+    def test_ordered_output_follows_input(self):
+        summary = self.run_batch("ordered.jsonl", workers=2, max_pending=3)
+        rows = read_output(self.directory / "ordered.jsonl")
+        self.assertEqual([row["index"] for row in rows], list(range(RECORD_COUNT)))
+        self.assertEqual(summary.rows, RECORD_COUNT)
+        self.assertEqual(summary.errors, RECORD_COUNT // 17)
+        for row in rows:
+            self.assertEqual(row["id"], self.records[row["index"]]["id"])
+            if row["index"] % 17 == 16:
+                self.assertIn("error", row)
+            else:
+                self.assertEqual(row["result"], self.expected(row["index"]))
+
+    def test_unordered_output_has_every_row_once(self):
+        self.run_batch("ordered.jsonl")
+        self.run_batch("unordered.jsonl", workers=2, ordered=False, max_pending=4)
+        ordered = read_output(self.directory / "ordered.jsonl")
+        unordered = read_output(self.directory / "unordered.jsonl")
+        # 各チャンクの中は入力順のまま
+        for start in range(0, RECORD_COUNT, CHUNK_SIZE):
+            position = next(i for i, row in enumerate(unordered) if row["index"] == start)
+            chunk = unordered[position:position + min(CHUNK_SIZE, RECORD_COUNT - start)]
+            self.assertEqual([row["index"] for row in chunk], list(range(start, start + len(chunk))))
+        self.assertEqual(sorted(unordered, key=lambda row: row["index"]), ordered)
+
+    def test_resume_from_checkpoint(self):
+        self.run_batch("reference.jsonl", statistics_path=str(self.directory / "reference_stats.json"))
+        checkpoint_path = self.directory / "batch.checkpoint"
+        output_path = self.directory / "resumed.jsonl"
+        statistics_path = str(self.directory / "resumed_stats.json")
+
+        # 4番目のチャンクの判定中に中断させる
+        assess_chunk = seimei_batch.assess_chunk
+
+        def interrupt_at_chunk_3(chunk_index, *args):
+            if chunk_index == 3:
+                raise KeyboardInterrupt
+            return assess_chunk(chunk_index, *args)
+
+        with mock.patch.object(seimei_batch, "assess_chunk", interrupt_at_chunk_3):
+            with self.assertRaises(KeyboardInterrupt):
+                self.run_batch("resumed.jsonl", checkpoint_path=str(checkpoint_path), statistics_path=statistics_path)
+        checkpoint = Checkpoint.load(checkpoint_path, CHUNK_SIZE)
+        self.assertEqual((checkpoint.watermark, checkpoint.done), (3, set()))
+        self.assertEqual(checkpoint.output_size, output_path.stat().st_size)
+        self.assertEqual(checkpoint.statistics.count, 3 * CHUNK_SIZE)
+
+        # チェックポイントの記録後に書いた出力（再開後の出力より長くしておき、上書きではなく切り詰めを確かめる）
+        with open(output_path, "a", encoding="utf-8") as f:
+            f.write('{"index": 15, "result": ' + " " * output_path.stat().st_size * 10)
+
+        summary = self.run_batch("resumed.jsonl", checkpoint_path=str(checkpoint_path), statistics_path=statistics_path)
+        self.assertEqual(summary.skipped_chunks, 3)
+        self.assertEqual(summary.rows, RECORD_COUNT - 3 * CHUNK_SIZE)
+        self.assertEqual(output_path.read_bytes(), (self.directory / "reference.jsonl").read_bytes())
+        # 完了済みチャンクの集計を引き継いで全件の集団統計になる
+        self.assertEqual(load_statistics(statistics_path).to_dict(),
+                         load_statistics(str(self.directory / "reference_stats.json")).to_dict())
+
+    def test_resume_records_out_of_order_chunks(self):
+        checkpoint = Checkpoint(self.directory / "batch.checkpoint", CHUNK_SIZE)
+        for chunk_index, size in ((1, 20), (0, 10), (3, 40)):
+            checkpoint.mark_done(chunk_index, size)
+        loaded = Checkpoint.load(checkpoint.path, CHUNK_SIZE)
+        self.assertEqual((loaded.watermark, loaded.done, loaded.output_size), (2, {3}, 40))
+        self.assertEqual([loaded.is_done(i) for i in range(5)], [True, True, False, True, False])
+        with self.assertRaises(ValueError):
+            Checkpoint.load(checkpoint.path, CHUNK_SIZE + 1)
+
+    def test_statistics_cannot_start_midway(self):
+        checkpoint_path = str(self.directory / "batch.checkpoint")
+        checkpoint = Checkpoint(Path(checkpoint_path), CHUNK_SIZE)
+        checkpoint.mark_done(0, 0)
+        with self.assertRaises(ValueError):
+            self.run_batch("out.jsonl", checkpoint_path=checkpoint_path,
+                           statistics_path=str(self.directory / "stats.json"))
+
+
+if __name__ == "__main__":
+    unittest.main()
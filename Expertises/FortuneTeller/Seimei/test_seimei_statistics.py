@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+集団統計（seimei_statistics）のテスト
+
+部分集計を結合した結果が全件を1つの集計器に足し込んだ結果と一致すること
+（足し込みの方法・保存と復元・結合の順序によらないこと）を確かめる。
+
+    python -m unittest discover -s Expertises/FortuneTeller/Seimei -p "test_*.py"
+"""
+
+import random
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fortune_teller_assessment import FortuneTellerAssessment  # noqa: E402
+from seimei_statistics import PopulationStatistics, load_statistics, save_statistics  # noqa: E402
+
+
+def make_names(count: int, seed: int = 11):
+    """(姓の画数, 名の画数) の組を作る"""
+    rng = random.Random(seed)
+    return [([rng.randint(1, 30) for _ in range(rng.randint(1, 3))],
+             [rng.randint(1, 30) for _ in range(rng.randint(1, 4))]) for _ in range(count)]
+
+
+class PopulationStatisticsMergeTest(unittest.TestCase):
+    """部分集計の結合"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.assessment = FortuneTellerAssessment()
+        cls.names = make_names(300)
+        cls.records = [cls.assessment.assess_record("山" * len(surname), "一" * len(given), surname, given)
+                       for surname, given in cls.names]
+        cls.whole = PopulationStatistics()
+        for record in cls.records:
+            cls.whole.add_record(record)
+
+    def partial(self, records) -> PopulationStatistics:
+        statistics = PopulationStatistics()
+        for record in records:
+            statistics.add_record(record)
+        return statistics
+
+    def test_merge_equals_single_pass(self):
+        parts = [self.partial(self.records[start:start + 70]) for start in range(0, len(self.records), 70)]
+        merged = PopulationStatistics()
+        for part in parts:
+            merged.merge(part)
+        self.assertEqual(merged.to_dict(), self.whole.to_dict())
+        self.assertEqual(merged.summary(), self.whole.summary())
+
+        # 結合の順序によらない（combine と += も同じ）
+        self.assertEqual(PopulationStatistics.combine(reversed(parts)).to_dict(), self.whole.to_dict())
+        accumulated = PopulationStatistics()
+        for part in parts[::-1]:
+            accumulated += part
+        self.assertEqual(accumulated.to_dict(), self.whole.to_dict())
+
+    def test_merge_does_not_change_other(self):
+        first = self.partial(self.records[:100])
+        second = self.partial(self.records[100:])
+        before = second.to_dict()
+        first.merge(second)
+        self.assertEqual(second.to_dict(), before)
+        self.assertEqual(first.count, len(self.records))
+
+    def test_merge_with_empty(self):
+        merged = self.partial(self.records).merge(PopulationStatistics())
+        self.assertEqual(merged.to_dict(), self.whole.to_dict())
+        self.assertEqual(PopulationStatistics().merge(self.whole).to_dict(), self.whole.to_dict())
+
+    def test_merge_restored_state(self):
+        # JSONに保存した部分集計（一括判定のチェックポイント・--stats の出力）を復元して結合する
+        with tempfile.TemporaryDirectory() as directory:
+            path = str(Path(directory) / "part.json")
+            save_statistics(self.partial(self.records[:150]), path)
+            merged = load_statistics(path).merge(self.partial(self.records[150:]))
+        self.assertEqual(merged.to_dict(), self.whole.to_dict())
+
+        restored = PopulationStatistics.from_dict(self.partial(self.records[150:]).to_dict())
+        merged = self.partial(self.records[:150]).merge(restored)
+        self.assertEqual(merged.to_dict(), self.whole.to_dict())
+
+    def test_add_methods_agree(self):
+        by_result = PopulationStatistics()
+        for record in self.records:
+            by_result.add_result(record.to_dict())
+        self.assertEqual(by_result.to_dict(), self.whole.to_dict())
+
+        surname_width = max(len(surname) for surname, _ in self.names)
+        given_width = max(len(given) for _, given in self.names)
+        columns = self.assessment.assess_many(
+            [surname + [0] * (surname_width - len(surname)) for surname, _ in self.names],
+            [len(surname) for surname, _ in self.names],
+            [given + [0] * (given_width - len(given)) for _, given in self.names],
+            [len(given) for _, given in self.names])
+        by_columns = PopulationStatistics()
+        by_columns.add_columns(columns)
+        self.assertEqual(by_columns.to_dict(), self.whole.to_dict())
+
+
+if __name__ == "__main__":
+    unittest.main()
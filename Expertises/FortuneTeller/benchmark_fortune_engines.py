@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+占術エンジン ベンチマーク
+
+姓名判断（FortuneTellerAssessment）と周易（IChingDivination）について、
+固定シードの合成データで次の指標を計測する。
+
+- 初期化（コールド）：新しいPythonプロセスでのimportと初期化の時間
+- 初期化（ウォーム）：同じプロセスでの共有テーブルを使わない初期化の時間
+- 1回あたりのレイテンシ：assess / divine の中央値・95パーセンタイル
+- スループット：assess_many・divine_many と、キャッシュ有効時の assess の件数/秒
+- 1回あたりのメモリ：tracemalloc で計測した確保量のピーク
+
+計測の前に、バッチ版（assess_many・divine_many）の結果が1件ずつの呼び出し
+（assess・divine）と一致することを合成データ全件で確かめる。
+結果はJSONで保存でき、一致しない結果があった場合や、保存したベースラインと比較して
+許容幅を超えて悪化した指標があれば終了コード1を返す（回帰の検出）。
+
+使用例：
+    python benchmark_fortune_engines.py --save-baseline baseline.json
+    python benchmark_fortune_engines.py --baseline baseline.json --tolerance 0.25
+"""
+
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+BASE_DIR = Path(__file__).parent
+SEIMEI_DIR = BASE_DIR / "Seimei"
+ICHING_DIR = BASE_DIR / "I-Ching"
+sys.path.append(str(SEIMEI_DIR))
+sys.path.append(str(ICHING_DIR))
+
+BASELINE_VERSION = 1
+DEFAULT_SEED = 20240501
+DEFAULT_CORPUS_SIZE = 2000
+DEFAULT_REPEATS = 5
+DEFAULT_TOLERANCE = 0.2
+WARMUP_CALLS = 100
+CHECK_EXAMPLES = 5  # 結果に残す不一致の例の件数
+
+# 指標ごとの良い方向（"lower" は小さいほど良い、"higher" は大きいほど良い）
+METRIC_DIRECTIONS = {
+    "cold_init_ms": "lower",
+    "warm_init_ms": "lower",
+    "latency_p50_us": "lower",
+    "latency_p95_us": "lower",
+    "cached_throughput_per_s": "higher",
+    "batch_throughput_per_s": "higher",
+    "memory_peak_bytes_per_call": "lower",
+}
+
+
+# ===== 合成データ =====
+
+def seimei_corpus(size: int, seed: int) -> List[Tuple[List[int], List[int]]]:
+    """姓名の画数の組を固定シードで生成（姓1-3文字、名1-4文字、1-30画）"""
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(size):
+        surname = [rng.randint(1, 30) for _ in range(rng.choice((1, 2, 2, 2, 3)))]
+        given = [rng.randint(1, 30) for _ in range(rng.choice((1, 2, 2, 3, 4)))]
+        corpus.append((surname, given))
+    return corpus
+
+
+def iching_corpus(size: int, seed: int) -> List[Tuple[str, str, float]]:
+    """占的・状況整理・占機の組を固定シードで生成"""
+    rng = random.Random(seed)
+    subjects = ("転職", "結婚", "新規事業", "引っ越し", "投資", "留学", "人間関係", "健康")
+    corpus = []
+    for i in range(size):
+        subject = rng.choice(subjects)
+        question = f"{subject}について今後{rng.randint(1, 24)}か月の見通しはどうか（{i}）"
+        context = "。".join(f"{rng.choice(subjects)}に関する状況{rng.randint(1, 999)}" for _ in range(rng.randint(1, 6)))
+        corpus.append((question, context, 1_700_000_000.0 + i * 0.137))
+    return corpus
+
+
+def pad_matrix(rows: Sequence[Sequence[int]]) -> Tuple[List[List[int]], List[int]]:
+    """画数の並びを0埋めの行列と文字数の配列に変換（assess_many用）"""
+    width = max(len(row) for row in rows)
+    return [list(row) + [0] * (width - len(row)) for row in rows], [len(row) for row in rows]
+
+
+# ===== 計測 =====
+
+def percentile(samples: Sequence[float], q: float) -> float:
+    """最近順位法のパーセンタイル"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def measure_latency(call: Callable[[int], object], count: int) -> Tuple[float, float]:
+    """1回ずつ呼び出したときの (中央値, 95パーセンタイル) をマイクロ秒で返す"""
+    for i in range(min(count, WARMUP_CALLS)):  # 初回のみの読み込みなどを除くための予備実行
+        call(i)
+    samples = []
+    clock = time.perf_counter_ns
+    for i in range(count):
+        started = clock()
+        call(i)
+        samples.append((clock() - started) / 1000)
+    return statistics.median(samples), percentile(samples, 0.95)
+
+
+def measure_memory(call: Callable[[int], object], count: int) -> float:
+    """1回あたりの確保量のピーク（バイト、呼び出しごとのピークの中央値）"""
+    peaks = []
+    reset_peak = getattr(tracemalloc, "reset_peak", None)  # Python 3.9以降
+    tracemalloc.start()
+    try:
+        for i in range(count):
+            if reset_peak is not None:
+                reset_peak()
+            else:
+                # ピークを戻せない版では計測を開始し直す（追跡中の確保もいったん消える）
+                tracemalloc.stop()
+                tracemalloc.start()
+            baseline, _ = tracemalloc.get_traced_memory()
+            result = call(i)
+            _, peak = tracemalloc.get_traced_memory()
+            peaks.append(peak - baseline)
+            del result
+    finally:
+        tracemalloc.stop()
+    return statistics.median(peaks)
+
+
+def measure_cold_init(module: str, directory: Path, statement: str) -> float:
+    """新しいプロセスでのimport＋初期化の時間（ミリ秒）"""
+    script = (
+        "import sys, time\n"
+        f"sys.path.insert(0, {str(directory)!r})\n"
+        "started = time.perf_counter()\n"
+        f"import {module}\n"
+        f"{statement}\n"
+        "print((time.perf_counter() - started) * 1000)\n"
+    )
+    output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True)
+    return float(output.stdout.strip().splitlines()[-1])
+
+
+def median_of(repeats: int, run: Callable[[], float]) -> float:
+    """複数回計測した中央値"""
+    return statistics.median(run() for _ in range(repeats))
+
+
+# ===== 正しさの確認 =====
+
+def column_mismatches(columns: Dict, result: Dict, row: int, path: str = "") -> List[str]:
+    """列指向の結果の row 行目と1件分の結果の辞書を比べ、一致しない項目の名前を返す
+
+    列指向の結果にある項目のうち、1件分の結果にも同じ名前であるものだけを比べる。
+    """
+    mismatches = []
+    for key, column in columns.items():
+        if key not in result:
+            continue
+        name = f"{path}.{key}" if path else key
+        if isinstance(column, dict):
+            mismatches.extend(column_mismatches(column, result[key], row, name))
+        elif column[row] != result[key]:
+            mismatches.append(f"{name}: {column[row]!r} != {result[key]!r}")
+    return mismatches
+
+
+def check_seimei(corpus_size: int, seed: int) -> List[str]:
+    """assess_many の各行が assess の結果と一致するか確かめる（一致しない行の説明を返す）"""
+    from fortune_teller_assessment import FortuneTellerAssessment
+
+    corpus = seimei_corpus(corpus_size, seed)
+    engine = FortuneTellerAssessment(cache_size=0)
+    surname_matrix, surname_lengths = pad_matrix([surname for surname, _ in corpus])
+    given_matrix, given_lengths = pad_matrix([given for _, given in corpus])
+    columns = engine.assess_many(surname_matrix, surname_lengths, given_matrix, given_lengths)
+
+    errors = []
+    if columns["件数"] != corpus_size:
+        errors.append(f"件数: {columns['件数']} != {corpus_size}")
+    for row, (surname, given) in enumerate(corpus[:columns["件数"]]):
+        result = engine.assess("姓" * len(surname), "名" * len(given), surname, given)
+        for mismatch in column_mismatches({key: columns[key] for key in ("七格", "星導分布", "人材4類型", "陰陽配列")},
+                                          result, row):
+            errors.append(f"{row}行目 {surname}/{given} {mismatch}")
+    return errors
+
+
+def check_iching(corpus_size: int, seed: int) -> List[str]:
+    """divine_many の各行が divine の得卦・得爻と一致するか確かめる（一致しない行の説明を返す）"""
+    from iching_divination import IChingDivination
+
+    corpus = iching_corpus(corpus_size, seed)
+    engine = IChingDivination(quiet=True)
+    columns = engine.divine_many(corpus)
+
+    errors = []
+    for row, (question, context, timestamp) in enumerate(corpus):
+        result = engine.divine(question, context, timestamp)
+        expected = (result["得卦"]["番号"], result["得爻"]["番号"])
+        actual = (columns["卦番号"][row], columns["爻番号"][row])
+        if actual != expected:
+            errors.append(f"{row}行目 (卦番号, 爻番号): {actual} != {expected}")
+    return errors
+
+
+# ===== ベンチマーク本体 =====
+
+def benchmark_seimei(corpus_size: int, repeats: int, seed: int) -> Dict[str, float]:
+    """姓名判断エンジンの計測"""
+    from fortune_teller_assessment import FortuneTellerAssessment
+
+    corpus = seimei_corpus(corpus_size, seed)
+    labels = [("姓" * len(surname), "名" * len(given)) for surname, given in corpus]
+
+    def warm_init() -> float:
+        started = time.perf_counter()
+        FortuneTellerAssessment(shared=False)
+        return (time.perf_counter() - started) * 1000
+
+    uncached = FortuneTellerAssessment(cache_size=0)
+    cached = FortuneTellerAssessment()
+
+    def assess(engine: FortuneTellerAssessment, i: int):
+        surname, given = corpus[i % corpus_size]
+        surname_label, given_label = labels[i % corpus_size]
+        return engine.assess(surname_label, given_label, surname, given)
+
+    latencies = [measure_latency(lambda i: assess(uncached, i), corpus_size) for _ in range(repeats)]
+
+    def cached_throughput() -> float:
+        for i in range(corpus_size):  # キャッシュを温める
+            assess(cached, i)
+        started = time.perf_counter()
+        for i in range(corpus_size):
+            assess(cached, i)
+        return corpus_size / (time.perf_counter() - started)
+
+    surname_matrix, surname_lengths = pad_matrix([surname for surname, _ in corpus])
+    given_matrix, given_lengths = pad_matrix([given for _, given in corpus])
+
+    def batch_throughput() -> float:
+        started = time.perf_counter()
+        uncached.assess_many(surname_matrix, surname_lengths, given_matrix, given_lengths)
+        return corpus_size / (time.perf_counter() - started)
+
+    return {
+        "cold_init_ms": median_of(repeats, lambda: measure_cold_init(
+            "fortune_teller_assessment", SEIMEI_DIR, "fortune_teller_assessment.FortuneTellerAssessment()")),
+        "warm_init_ms": median_of(repeats, warm_init),
+        "latency_p50_us": statistics.median(p50 for p50, _ in latencies),
+        "latency_p95_us": statistics.median(p95 for _, p95 in latencies),
+        "cached_throughput_per_s": median_of(repeats, cached_throughput),
+        "batch_throughput_per_s": median_of(repeats, batch_throughput),
+        "memory_peak_bytes_per_call": measure_memory(lambda i: assess(uncached, i), min(corpus_size, 500)),
+    }
+
+
+def benchmark_iching(corpus_size: int, repeats: int, seed: int) -> Dict[str, float]:
+    """周易エンジンの計測（口上の画面出力は quiet で止める）"""
+    from iching_divination import IChingDivination
+
+    corpus = iching_corpus(corpus_size, seed)
+
+    def warm_init() -> float:
+        started = time.perf_counter()
+        IChingDivination(shared=False)
+        return (time.perf_counter() - started) * 1000
+
+    engine = IChingDivination(quiet=True)
+
+    def divine(i: int):
+        question, context, timestamp = corpus[i % corpus_size]
+        return engine.divine(question, context, timestamp)
+
+    latencies = [measure_latency(divine, corpus_size) for _ in range(repeats)]
+
+    def batch_throughput() -> float:
+        started = time.perf_counter()
+        engine.divine_many(corpus)
+        return corpus_size / (time.perf_counter() - started)
+
+    batch = median_of(repeats, batch_throughput)
+    memory = measure_memory(divine, min(corpus_size, 500))
+
+    return {
+        "cold_init_ms": median_of(repeats, lambda: measure_cold_init(
+            "iching_divination", ICHING_DIR, "iching_divination.IChingDivination()")),
+        "warm_init_ms": median_of(repeats, warm_init),
+        "latency_p50_us": statistics.median(p50 for p50, _ in latencies),
+        "latency_p95_us": statistics.median(p95 for _, p95 in latencies),
+        "batch_throughput_per_s": batch,
+        "memory_peak_bytes_per_call": memory,
+    }
+
+
+ENGINES = {
+    "seimei": benchmark_seimei,
+    "iching": benchmark_iching,
+}
+
+CHECKS = {
+    "seimei": check_seimei,
+    "iching": check_iching,
+}
+
+
+def run_benchmarks(engines: Sequence[str], corpus_size: int, repeats: int, seed: int) -> Dict:
+    """指定したエンジンの正しさを確かめ、ベンチマークを実行して結果をまとめる"""
+    checks = {name: CHECKS[name](corpus_size, seed) for name in engines}
+    return {
+        "version": BASELINE_VERSION,
+        "environment": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "cpu_count": os.cpu_count(),
+        },
+        "settings": {"corpus_size": corpus_size, "repeats": repeats, "seed": seed},
+        "checks": {name: {"mismatches": len(errors), "examples": errors[:CHECK_EXAMPLES]}
+                   for name, errors in checks.items()},
+        "results": {name: ENGINES[name](corpus_size, repeats, seed) for name in engines},
+    }
+
+
+# ===== ベースラインとの比較 =====
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[Dict]:
+    """ベースラインと比較して各指標の変化を求める
+
+    Args:
+        current: 今回の結果
+        baseline: ベースラインの結果
+        tolerance: 許容する悪化の割合（0.2 なら20%まで）
+
+    Returns:
+        指標ごとの比較結果（regression が True のものは許容幅を超えた悪化）
+    """
+    if baseline.get("settings") != current.get("settings"):
+        raise ValueError(f"ベースラインと計測条件が異なります：{baseline.get('settings')} / {current.get('settings')}")
+
+    rows = []
+    for engine, metrics in current["results"].items():
+        for metric, value in metrics.items():
+            previous = baseline["results"].get(engine, {}).get(metric)
+            if previous is None or not previous:
+                continue
+            change = (value - previous) / previous
+            worse = change if METRIC_DIRECTIONS[metric] == "lower" else -change
+            rows.append({
+                "engine": engine,
+                "metric": metric,
+                "baseline": previous,
+                "current": value,
+                "change": change,
+                "regression": worse > tolerance,
+            })
+    return rows
+
+
+def format_report(results: Dict, comparison: Optional[List[Dict]] = None) -> str:
+    """結果（と比較）を表形式の文字列にする"""
+    lines = []
+    if comparison is None:
+        for engine, metrics in results["results"].items():
+            lines.append(f"[{engine}]")
+            for metric, value in metrics.items():
+                lines.append(f"  {metric:<28} {value:>14,.2f}")
+        return "\n".join(lines)
+
+    for row in comparison:
+        mark = "回帰" if row["regression"] else ""
+        lines.append(f"{row['engine']:<8} {row['metric']:<28} {row['baseline']:>14,.2f} → {row['current']:>14,.2f}"
+                     f" ({row['change']:+.1%}) {mark}")
+    return "\n".join(lines)
+
+
+def main():
+    """ベンチマークのコマンドライン"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description="姓名判断・周易エンジンのベンチマーク")
+    parser.add_argument("--engine", choices=sorted(ENGINES), action="append", help="計測するエンジン（複数指定可、省略時はすべて）")
+    parser.add_argument("--corpus-size", type=int, default=DEFAULT_CORPUS_SIZE, help="合成データの件数")
+    parser.add_argument("--repeats", type=int, default=DEFAULT_REPEATS, help="各指標の計測回数（中央値を採用）")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help="合成データの乱数シード")
+    parser.add_argument("--output", help="今回の結果の保存先（JSON）")
+    parser.add_argument("--save-baseline", help="今回の結果をベースラインとして保存する先（JSON）")
+    parser.add_argument("--baseline", help="比較するベースライン（JSON）")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="許容する悪化の割合（既定0.2=20%%）")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.engine or sorted(ENGINES), args.corpus_size, args.repeats, args.seed)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    comparison = None
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        comparison = compare(results, baseline, args.tolerance)
+    print(format_report(results, comparison))
+
+    status = 0
+    for engine, check in results["checks"].items():
+        if check["mismatches"]:
+            print(f"\n{engine}: バッチ版と1件ずつの結果が{check['mismatches']}件一致しません。", file=sys.stderr)
+            for example in check["examples"]:
+                print(f"  {example}", file=sys.stderr)
+            status = 1
+    regressions = [row for row in comparison or [] if row["regression"]]
+    if regressions:
+        print(f"\n{len(regressions)}件の指標が許容幅（{args.tolerance:.0%}）を超えて悪化しました。")
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
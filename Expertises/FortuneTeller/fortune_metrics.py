@@ -0,0 +1,436 @@
+"""
+占術エンジン用の計測（メトリクス）モジュール
+
+姓名判定（Seimei）と易占（I-Ching）のエンジンに metrics 引数として渡すと、
+段階ごとの処理時間・呼び出し回数・参照ミス件数を記録する。
+渡さなければエンジン側は計測を一切行わない（is None の判定のみ）。
+
+エンジンが呼び出すのは次の2つのメソッドだけ：
+    increment(name, value=1, **labels)  … カウンタを加算
+    observe(name, seconds, **labels)    … 処理時間（秒）を記録
+
+このメソッドを持つオブジェクトなら何でもシンクとして使える。
+同梱のシンク：
+    MetricsRegistry     … プロセス内に集計を保持（スナップショット取得・リセット可能）
+    PrometheusExporter  … MetricsRegistry を Prometheus テキスト形式で出力・HTTP公開
+    LogSink             … 記録1件ごとに構造化ログ（JSON 1行）を出力
+    FanoutSink          … 複数のシンクへ同時に記録
+
+使用例：
+    from fortune_metrics import MetricsRegistry, PrometheusExporter
+    registry = MetricsRegistry()
+    assessment = FortuneTellerAssessment(metrics=registry)
+    assessment.assess("大神", "加五郎兵衛", [3, 9], [5, 4, 9, 7, 16])
+    print(PrometheusExporter(registry).render())
+"""
+
+import argparse
+import bisect
+import json
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+# 処理時間ヒストグラムのバケット上限（秒）。1判定は数μs〜数百μsの範囲に収まる
+DEFAULT_BUCKETS = (1e-6, 2.5e-6, 5e-6, 1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4,
+                   5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 1e-1, 1.0)
+
+# Prometheus テキスト形式の Content-Type
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# エンジンが記録するメトリクス名と説明（Prometheus の HELP 行に使用）
+METRIC_HELP = {
+    "seimei_assess_calls_total": "姓名判定（assess_record）の呼び出し回数",
+    "seimei_assess_stage_seconds": "姓名判定の段階ごとの処理時間（秒）",
+    "seimei_cache_hits_total": "判定結果キャッシュのヒット件数",
+    "seimei_cache_misses_total": "判定結果キャッシュのミス件数",
+    "seimei_spirit_lookup_misses_total": "数霊表に該当がなかった格の件数",
+    "iching_divine_calls_total": "易占（divine）の呼び出し回数",
+    "iching_divine_stage_seconds": "易占の段階ごとの処理時間（秒）",
+    "iching_divine_batch_items_total": "易占のバッチ（divine_many）で処理した件数",
+    "service_requests_total": "常駐サービスが応答したリクエスト数",
+    "service_request_seconds": "常駐サービスの1リクエストの処理時間（秒）",
+    "service_rejected_total": "同時処理数の上限により断ったリクエスト数",
+}
+
+# ラベルの組（名前順に並べたタプル）
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def label_key(labels: Dict[str, Any]) -> LabelKey:
+    """ラベル辞書を集計用のキー（名前順のタプル）に変換"""
+    if not labels:
+        return ()
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+class Histogram:
+    """処理時間のヒストグラム（件数・合計・最小・最大と累積前のバケット件数）"""
+
+    __slots__ = ("bounds", "buckets", "count", "total", "minimum", "maximum")
+
+    def __init__(self, bounds: Sequence[float]):
+        self.bounds = tuple(bounds)
+        # 最後の要素は +Inf バケット
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.minimum = float("inf")
+        self.maximum = 0.0
+
+    def observe(self, value: float) -> None:
+        """値を1件記録"""
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value < self.minimum:
+            self.minimum = value
+        if value > self.maximum:
+            self.maximum = value
+
+    def cumulative(self) -> List[int]:
+        """Prometheus 形式の累積バケット件数（+Inf を含む）"""
+        result = []
+        running = 0
+        for n in self.buckets:
+            running += n
+            result.append(running)
+        return result
+
+    def to_dict(self) -> Dict:
+        """集計値を辞書に変換"""
+        return {
+            "件数": self.count,
+            "合計秒": self.total,
+            "平均秒": self.total / self.count if self.count else 0.0,
+            "最小秒": self.minimum if self.count else 0.0,
+            "最大秒": self.maximum,
+        }
+
+
+class MetricsRegistry:
+    """プロセス内でカウンタと処理時間を集計するシンク
+
+    スレッドセーフ。snapshot() で現在値を辞書として取得でき、
+    PrometheusExporter に渡せばテキスト形式で出力できる。
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        """
+        Args:
+            buckets: 処理時間ヒストグラムのバケット上限（秒、昇順）
+        """
+        self.buckets = tuple(sorted(buckets))
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1, **labels: Any) -> None:
+        """カウンタを加算
+
+        Args:
+            name: メトリクス名（例："seimei_cache_hits_total"）
+            value: 加算する値
+            **labels: ラベル（例：stage="parse"）
+        """
+        key = label_key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        """処理時間を記録
+
+        Args:
+            name: メトリクス名（例："seimei_assess_stage_seconds"）
+            seconds: 処理時間（秒）
+            **labels: ラベル（例：stage="frames"）
+        """
+        key = label_key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(self.buckets)
+            histogram.observe(seconds)
+
+    @contextmanager
+    def timer(self, name: str, **labels: Any) -> Iterator[None]:
+        """with 文で囲んだ処理の時間を記録する
+
+        使用例：
+            with registry.timer("batch_seconds", stage="load"):
+                ...
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def counter(self, name: str, **labels: Any) -> float:
+        """カウンタの現在値を取得（未記録なら0）"""
+        with self._lock:
+            return self._counters.get(name, {}).get(label_key(labels), 0)
+
+    def histogram(self, name: str, **labels: Any) -> Optional[Histogram]:
+        """処理時間ヒストグラムを取得（未記録ならNone）"""
+        with self._lock:
+            return self._histograms.get(name, {}).get(label_key(labels))
+
+    def reset(self) -> None:
+        """全ての集計を破棄"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def collect(self) -> Tuple[Dict[str, Dict[LabelKey, float]], Dict[str, Dict[LabelKey, Histogram]]]:
+        """出力用に (カウンタ, ヒストグラム) の複製を取得"""
+        with self._lock:
+            counters = {name: dict(series) for name, series in self._counters.items()}
+            histograms = {}
+            for name, series in self._histograms.items():
+                copied = {}
+                for key, source in series.items():
+                    histogram = Histogram(source.bounds)
+                    histogram.buckets = list(source.buckets)
+                    histogram.count = source.count
+                    histogram.total = source.total
+                    histogram.minimum = source.minimum
+                    histogram.maximum = source.maximum
+                    copied[key] = histogram
+                histograms[name] = copied
+        return counters, histograms
+
+    def snapshot(self) -> Dict:
+        """現在の集計を JSON 化できる辞書で取得
+
+        Returns:
+            {"カウンタ": {名前: [{"ラベル": {...}, "値": n}, ...]},
+             "処理時間": {名前: [{"ラベル": {...}, "件数": n, "合計秒": s, ...}, ...]}}
+        """
+        counters, histograms = self.collect()
+        return {
+            "カウンタ": {
+                name: [{"ラベル": dict(key), "値": value} for key, value in sorted(series.items())]
+                for name, series in sorted(counters.items())
+            },
+            "処理時間": {
+                name: [dict({"ラベル": dict(key)}, **histogram.to_dict())
+                       for key, histogram in sorted(series.items())]
+                for name, series in sorted(histograms.items())
+            },
+        }
+
+
+def _format_labels(key: LabelKey, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    """ラベルを Prometheus 形式（{name="value",...}）に整形"""
+    pairs = key + extra
+    if not pairs:
+        return ""
+    escaped = (
+        '{}="{}"'.format(name, value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for name, value in pairs
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    """数値を Prometheus 形式に整形"""
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class PrometheusExporter:
+    """MetricsRegistry の内容を Prometheus テキスト形式で出力する
+
+    カウンタは counter、処理時間は histogram（_bucket / _sum / _count）として出力する。
+    render() で文字列を取得、write() でファイルへ原子的に書き込み
+    （node_exporter の textfile collector 向け）、serve() で HTTP 公開できる。
+    """
+
+    def __init__(self, registry: MetricsRegistry, help_texts: Optional[Dict[str, str]] = None):
+        """
+        Args:
+            registry: 出力元の集計
+            help_texts: メトリクス名ごとの説明（Noneの場合は METRIC_HELP）
+        """
+        self.registry = registry
+        self.help_texts = METRIC_HELP if help_texts is None else help_texts
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    def render(self) -> str:
+        """現在の集計を Prometheus テキスト形式で取得"""
+        counters, histograms = self.registry.collect()
+        lines = []
+
+        for name in sorted(counters):
+            self._header(lines, name, "counter")
+            for key, value in sorted(counters[name].items()):
+                lines.append("{}{} {}".format(name, _format_labels(key), _format_value(value)))
+
+        for name in sorted(histograms):
+            self._header(lines, name, "histogram")
+            for key, histogram in sorted(histograms[name].items()):
+                bounds = histogram.bounds + (float("inf"),)
+                for bound, count in zip(bounds, histogram.cumulative()):
+                    labels = _format_labels(key, (("le", _format_value(bound)),))
+                    lines.append("{}_bucket{} {}".format(name, labels, count))
+                lines.append("{}_sum{} {}".format(name, _format_labels(key), repr(histogram.total)))
+                lines.append("{}_count{} {}".format(name, _format_labels(key), histogram.count))
+
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def _header(self, lines: List[str], name: str, kind: str) -> None:
+        """HELP 行と TYPE 行を追加"""
+        help_text = self.help_texts.get(name)
+        if help_text:
+            lines.append("# HELP {} {}".format(name, help_text.replace("\\", "\\\\").replace("\n", "\\n")))
+        lines.append("# TYPE {} {}".format(name, kind))
+
+    def write(self, path: str) -> None:
+        """テキスト形式をファイルへ書き込む（一時ファイル経由で置き換え）"""
+        path = Path(path)
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(self.render(), encoding="utf-8")
+        tmp_path.replace(path)
+
+    def serve(self, port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+        """/metrics で集計を公開する HTTP サーバーをデーモンスレッドで起動
+
+        Args:
+            port: 待ち受けポート（0の場合は空きポートを自動選択）
+            host: 待ち受けアドレス
+
+        Returns:
+            起動したサーバー（server_address で実際のポートを確認できる）
+        """
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                    self.send_error(404)
+                    return
+                body = exporter.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", PROMETHEUS_CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                # アクセスログは出力しない
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        thread = threading.Thread(target=server.serve_forever, name="metrics-exporter", daemon=True)
+        thread.start()
+        self._server = server
+        return server
+
+    def shutdown(self) -> None:
+        """serve() で起動したサーバーを停止"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+class LogSink:
+    """記録1件ごとに構造化ログ（JSON 1行）を出力するシンク
+
+    出力例：
+        {"metric": "seimei_assess_stage_seconds", "type": "timer", "value": 1.2e-05, "stage": "frames"}
+    """
+
+    def __init__(self, logger: Optional[logging.Logger] = None, level: int = logging.INFO):
+        """
+        Args:
+            logger: 出力先のロガー（Noneの場合は "fortune_metrics"）
+            level: 出力するログレベル
+        """
+        self.logger = logger if logger is not None else logging.getLogger("fortune_metrics")
+        self.level = level
+
+    def _emit(self, kind: str, name: str, value: float, labels: Dict[str, Any]) -> None:
+        """ログ1行を出力（ロガーが無効なレベルなら整形もしない）"""
+        if not self.logger.isEnabledFor(self.level):
+            return
+        record = {"metric": name, "type": kind, "value": value}
+        for label, label_value in labels.items():
+            record[label] = str(label_value)
+        self.logger.log(self.level, json.dumps(record, ensure_ascii=False))
+
+    def increment(self, name: str, value: float = 1, **labels: Any) -> None:
+        """カウンタの加算をログに出力"""
+        self._emit("counter", name, value, labels)
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        """処理時間をログに出力"""
+        self._emit("timer", name, seconds, labels)
+
+
+class FanoutSink:
+    """複数のシンクへ同じ記録を送る（例：集計しつつログにも出す）"""
+
+    def __init__(self, *sinks: Any):
+        self.sinks = tuple(sinks)
+
+    def increment(self, name: str, value: float = 1, **labels: Any) -> None:
+        for sink in self.sinks:
+            sink.increment(name, value, **labels)
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        for sink in self.sinks:
+            sink.observe(name, seconds, **labels)
+
+
+def _load_engines() -> Tuple[Any, Any]:
+    """同じディレクトリ配下の姓名判定・易占エンジンを読み込む"""
+    base_dir = Path(__file__).resolve().parent
+    for engine_dir in (base_dir / "Seimei", base_dir / "I-Ching"):
+        if str(engine_dir) not in sys.path:
+            sys.path.insert(0, str(engine_dir))
+    from fortune_teller_assessment import FortuneTellerAssessment
+    from iching_divination import IChingDivination
+    return FortuneTellerAssessment, IChingDivination
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """サンプルの判定・占断を計測して Prometheus 形式または JSON で表示"""
+    parser = argparse.ArgumentParser(description="占術エンジンの段階別処理時間と参照ミスを計測する")
+    parser.add_argument("--calls", type=int, default=1000, help="各エンジンの呼び出し回数（既定: 1000）")
+    parser.add_argument("--format", choices=("prometheus", "json"), default="prometheus", help="出力形式")
+    args = parser.parse_args(argv)
+
+    FortuneTellerAssessment, IChingDivination = _load_engines()
+    registry = MetricsRegistry()
+
+    assessment = FortuneTellerAssessment(metrics=registry)
+    for i in range(args.calls):
+        assessment.assess_record("大神", "加五郎", [3, 9], [5, 4, 1 + i % 30])
+
+    divination = IChingDivination(metrics=registry, quiet=True)
+    for i in range(args.calls):
+        divination.divine("計測{}".format(i), "計測用の状況整理", timestamp=1700000000.0 + i)
+    divination.divine_many(("計測{}".format(i), "計測用の状況整理", 1700000000.0 + i) for i in range(args.calls))
+
+    if args.format == "json":
+        print(json.dumps(registry.snapshot(), ensure_ascii=False, indent=2))
+    else:
+        sys.stdout.write(PrometheusExporter(registry).render())
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,550 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+占術エンジン常駐サービス（asyncio）
+
+姓名判定（FortuneTellerAssessment）と易占（IChingDivination）を読み込み済みの状態で
+常駐させ、ローカルのHTTP（TCPまたはUnixソケット）で判定・占断を受け付ける。
+呼び出しのたびにインタプリタの起動やJSONの読み込みを行わずに済む。
+
+- 1件の判定・占断はイベントループ内でそのまま処理する（数十μsのため）
+- 本文の大きいバッチはプロセスプール（エンジン読み込み済みのワーカー）に本文のまま送り、
+  JSONの解析・判定・応答の作成までワーカーで行う（イベントループを止めない）
+- 同時処理数の上限（超えた分は待たせ、待ち時間の上限を超えたら503）
+- ワーカーに送った処理の時間の上限（超えたら504）
+- HTTP/1.1のキープアライブとパイプライン（1接続で応答を待たずに送られた要求を順に処理）
+- /health で稼働状況、/metrics で Prometheus テキスト形式の計測値を返す
+
+エンドポイント（要求・応答の本文はJSON）：
+    GET  /health
+    GET  /metrics
+    POST /seimei/assess        {"surname", "given_name", "surname_strokes"?, "given_strokes"?}
+                               → assess() の結果
+    POST /seimei/assess_many   {"records": [上と同じ形, ...]}
+                               → {"results": [{"id"?, "result" または "error"}, ...]}
+    POST /iching/divine        {"question", "context", "timestamp"?, "derived"?}
+                               → divine() の結果
+    POST /iching/divine_many   {"items": [{"question", "context", "timestamp"?}, ...], "derived"?}
+                               → divine_many() の各列（卦番号・爻番号など）をリストにしたもの
+
+使用例：
+    python fortune_service.py --port 8080
+    curl -s localhost:8080/seimei/assess -d '{"surname": "大神", "given_name": "加五郎兵衛",
+        "surname_strokes": [3, 9], "given_strokes": [5, 4, 9, 7, 16]}'
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from http import HTTPStatus
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# 各エンジンのディレクトリをimport対象に追加（ワーカープロセスでも同じ）
+BASE_DIR = Path(__file__).resolve().parent
+for _engine_dir in (BASE_DIR / "Seimei", BASE_DIR / "I-Ching"):
+    if str(_engine_dir) not in sys.path:
+        sys.path.insert(0, str(_engine_dir))
+
+from fortune_metrics import PROMETHEUS_CONTENT_TYPE, MetricsRegistry, PrometheusExporter  # noqa: E402
+from fortune_teller_assessment import FortuneTellerAssessment  # noqa: E402
+from iching_divination import IChingDivination  # noqa: E402
+from seimei_batch import assess_line, default_workers, parse_name_input  # noqa: E402
+
+
+logger = logging.getLogger("fortune_service")
+
+JSON_CONTENT_TYPE = "application/json; charset=utf-8"
+
+
+@dataclass
+class ServiceConfig:
+    """サービスの設定"""
+    host: str = "127.0.0.1"
+    port: int = 8080
+    unix_path: Optional[str] = None     # 指定した場合はTCPではなくUnixソケットで待ち受ける
+    workers: int = 0                    # バッチ用ワーカープロセス数（0の場合はCPU数）
+    max_concurrency: int = 64           # 同時に処理するリクエスト数の上限
+    queue_timeout: float = 1.0          # 処理枠が空くのを待つ時間の上限（秒）
+    request_timeout: float = 30.0       # 1リクエストの処理時間の上限（秒）
+    idle_timeout: float = 60.0          # キープアライブ接続の無通信時間の上限（秒）
+    max_body_bytes: int = 16 * 1024 * 1024
+    max_header_count: int = 100         # 1リクエストのヘッダー数の上限
+    max_header_bytes: int = 32 * 1024   # リクエスト行とヘッダーの合計の大きさの上限
+    inline_batch_bytes: int = 16 * 1024  # 本文がこの大きさ以下のバッチはワーカーに送らずその場で処理する
+    json_dir: Optional[str] = None      # 姓名判定のJSONディレクトリ（省略時は同梱）
+    database_path: Optional[str] = None  # 大卦データベースのパス（省略時は同梱）
+
+
+@dataclass
+class HttpRequest:
+    """受信したHTTPリクエスト"""
+    method: str
+    path: str
+    version: str
+    headers: Dict[str, str]
+    body: bytes
+
+    @property
+    def keep_alive(self) -> bool:
+        """応答後も接続を維持するか（HTTP/1.1は既定で維持、HTTP/1.0は明示された場合のみ）"""
+        connection = self.headers.get("connection", "").lower()
+        if self.version == "HTTP/1.1":
+            return connection != "close"
+        return connection == "keep-alive"
+
+    def json(self) -> Dict[str, Any]:
+        """本文をJSONオブジェクトとして解析"""
+        return parse_json_object(self.body)
+
+
+class HttpError(Exception):
+    """HTTPのエラー応答にする例外（ワーカーから送り返せるよう引数をすべてargsに持つ）"""
+
+    def __init__(self, status: HTTPStatus, message: str):
+        super().__init__(status, message)
+        self.status = status
+        self.message = message
+
+
+def parse_json_object(body: bytes) -> Dict[str, Any]:
+    """要求本文をJSONオブジェクトとして解析
+
+    Raises:
+        HttpError: JSONとして解析できない、またはオブジェクトでない場合（400）
+    """
+    try:
+        payload = json.loads(body or b"{}")
+    except ValueError as e:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"JSONを解析できません: {e}")
+    if not isinstance(payload, dict):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "本文はJSONオブジェクトにしてください")
+    return payload
+
+
+async def read_request(reader: asyncio.StreamReader, max_body_bytes: int,
+                       max_header_count: int = 100, max_header_bytes: int = 32 * 1024) -> Optional[HttpRequest]:
+    """ストリームからHTTPリクエストを1件読む
+
+    Args:
+        reader: 読み込み元のストリーム
+        max_body_bytes: 本文の大きさの上限
+        max_header_count: ヘッダー数の上限
+        max_header_bytes: リクエスト行とヘッダーの合計の大きさの上限
+
+    Returns:
+        リクエスト（相手が接続を閉じた場合はNone）
+
+    Raises:
+        HttpError: 要求の形式が不正、またはヘッダーや本文が大きすぎる場合
+    """
+    line = await _read_header_line(reader)
+    if not line:
+        return None
+    try:
+        method, target, version = line.decode("latin-1").rstrip("\r\n").split(" ")
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "リクエスト行が不正です")
+
+    headers = {}
+    header_count = 0
+    header_bytes = len(line)
+    while True:
+        line = await _read_header_line(reader)
+        if line in (b"\r\n", b"\n", b""):
+            break
+        header_count += 1
+        header_bytes += len(line)
+        if header_count > max_header_count or header_bytes > max_header_bytes:
+            raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "ヘッダーが大きすぎます")
+        name, separator, value = line.decode("latin-1").partition(":")
+        if not separator or not name.strip():
+            raise HttpError(HTTPStatus.BAD_REQUEST, "ヘッダー行が不正です")
+        headers[name.strip().lower()] = value.strip()
+
+    if "transfer-encoding" in headers:
+        raise HttpError(HTTPStatus.NOT_IMPLEMENTED, "Transfer-Encodingには対応していません")
+    try:
+        length = int(headers.get("content-length") or 0)
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Content-Lengthが不正です")
+    if length < 0 or length > max_body_bytes:
+        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, "本文が大きすぎます")
+    body = await reader.readexactly(length) if length else b""
+
+    return HttpRequest(method.upper(), target.split("?", 1)[0], version, headers, body)
+
+
+async def _read_header_line(reader: asyncio.StreamReader) -> bytes:
+    """リクエスト行・ヘッダー行を1行読む
+
+    Raises:
+        HttpError: 1行がストリームの上限を超える場合（431）
+    """
+    try:
+        return await reader.readline()
+    except ValueError:
+        # 区切りが上限内に現れない行（LimitOverrunError は readline で ValueError になる）
+        raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "ヘッダー行が長すぎます")
+
+
+def encode_response(status: HTTPStatus, body: bytes, content_type: str, keep_alive: bool) -> bytes:
+    """HTTPレスポンスをバイト列にする"""
+    head = (
+        f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+        f"Content-Type: {content_type}\r\n"
+        f"Content-Length: {len(body)}\r\n"
+        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        "\r\n"
+    )
+    return head.encode("latin-1") + body
+
+
+def encode_json(payload: Any) -> bytes:
+    """応答本文のJSONを作成"""
+    return json.dumps(payload, ensure_ascii=False).encode("utf-8")
+
+
+# ===== ワーカープロセス =====
+
+_worker_assessment: Optional[FortuneTellerAssessment] = None
+_worker_divination: Optional[IChingDivination] = None
+
+
+def _init_worker(json_dir: Optional[str], database_path: Optional[str]) -> None:
+    """ワーカープロセスの初期化（両エンジンを1つずつ読み込んでおく）"""
+    global _worker_assessment, _worker_divination
+    _worker_assessment = FortuneTellerAssessment(json_dir)
+    _worker_divination = IChingDivination(database_path, quiet=True)
+
+
+def _worker_ready() -> int:
+    """ワーカーの起動確認（初期化済みのプロセスIDを返す）"""
+    return os.getpid()
+
+
+def assess_many_body(body: bytes, assessment: Optional[FortuneTellerAssessment] = None) -> bytes:
+    """/seimei/assess_many の要求本文から応答本文を作成（各件は一括判定ランナーの出力と同じ形）
+
+    Raises:
+        HttpError: 要求の形式が不正な場合（400）
+    """
+    assessment = assessment or _worker_assessment or FortuneTellerAssessment()
+    records = parse_json_object(body).get("records")
+    if not isinstance(records, list):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "records はリストにしてください")
+    return encode_json({"results": [assess_line(assessment, record) for record in records]})
+
+
+def divine_many_body(body: bytes, divination: Optional[IChingDivination] = None) -> bytes:
+    """/iching/divine_many の要求本文から応答本文を作成（divine_many の各列をリストにしたもの）
+
+    Raises:
+        HttpError: 要求の形式が不正な場合（400）
+    """
+    divination = divination or _worker_divination or IChingDivination(quiet=True)
+    payload = parse_json_object(body)
+    raw_items = payload.get("items")
+    if not isinstance(raw_items, list):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "items はリストにしてください")
+    try:
+        items = [(str(item["question"]), str(item["context"]), item.get("timestamp")) for item in raw_items]
+        columns = divination.divine_many(items, bool(payload.get("derived", False)))
+    except (KeyError, TypeError, AttributeError, ValueError, OverflowError) as e:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"items の形式が不正です: {type(e).__name__}: {e}")
+    return encode_json({name: column.tolist() for name, column in columns.items()})
+
+
+# ===== サービス本体 =====
+
+Handler = Callable[[HttpRequest], Awaitable[Tuple[HTTPStatus, bytes, str]]]
+
+
+class FortuneService:
+    """エンジンを常駐させてHTTPで判定・占断を受け付けるサービス"""
+
+    def __init__(self, config: ServiceConfig):
+        """エンジンを読み込んで初期化（待ち受けは start() で開始）
+
+        Args:
+            config: サービスの設定
+        """
+        self.config = config
+        self.metrics = MetricsRegistry()
+        self.exporter = PrometheusExporter(self.metrics)
+
+        # 常駐エンジン（計測はサービスの集計に記録）
+        self.assessment = FortuneTellerAssessment(config.json_dir, metrics=self.metrics)
+        self.divination = IChingDivination(config.database_path, quiet=True, metrics=self.metrics)
+
+        self.workers = config.workers or default_workers()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._inflight = 0
+        self._started_at = time.time()
+
+        self.routes: Dict[Tuple[str, str], Handler] = {
+            ("GET", "/health"): self.handle_health,
+            ("GET", "/metrics"): self.handle_metrics,
+            ("POST", "/seimei/assess"): self.handle_assess,
+            ("POST", "/seimei/assess_many"): self.handle_assess_many,
+            ("POST", "/iching/divine"): self.handle_divine,
+            ("POST", "/iching/divine_many"): self.handle_divine_many,
+        }
+        self._paths = frozenset(path for _, path in self.routes)
+
+    # ----- 起動・停止 -----
+
+    async def start(self) -> None:
+        """待ち受けを開始（ワーカープールも起動してエンジンを読み込ませる）"""
+        self._slots = asyncio.Semaphore(self.config.max_concurrency)
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.config.json_dir, self.config.database_path),
+        )
+        # ワーカーを先に起動してエンジンを読み込ませておく（最初のバッチを待たせない）
+        await asyncio.gather(*(self.run_in_pool(_worker_ready) for _ in range(self.workers)))
+
+        if self.config.unix_path:
+            self._server = await asyncio.start_unix_server(self.handle_connection, path=self.config.unix_path)
+        else:
+            self._server = await asyncio.start_server(self.handle_connection, self.config.host, self.config.port)
+        logger.info("待ち受け開始: %s（ワーカー %d）", self.address, self.workers)
+
+    @property
+    def address(self) -> str:
+        """待ち受けアドレス（表示用）"""
+        if self.config.unix_path:
+            return f"unix:{self.config.unix_path}"
+        if self._server is not None and self._server.sockets:
+            host, port = self._server.sockets[0].getsockname()[:2]
+            return f"http://{host}:{port}"
+        return f"http://{self.config.host}:{self.config.port}"
+
+    async def serve_forever(self) -> None:
+        """停止されるまで待ち受ける"""
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """待ち受けとワーカープールを停止"""
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+
+    # ----- 接続処理 -----
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """1接続を処理（キープアライブ中は次の要求を読み、届いた順に応答する）"""
+        # 無通信の上限はタイマーで接続を閉じて実現する（要求ごとにタスクを作らないため）
+        loop = asyncio.get_running_loop()
+        idle_timer = None
+        try:
+            while True:
+                idle_timer = loop.call_later(self.config.idle_timeout, writer.transport.abort)
+                try:
+                    request = await read_request(reader, self.config.max_body_bytes,
+                                                 self.config.max_header_count, self.config.max_header_bytes)
+                except HttpError as e:
+                    writer.write(encode_response(e.status, encode_json({"error": e.message}),
+                                                 JSON_CONTENT_TYPE, False))
+                    await writer.drain()
+                    return
+                finally:
+                    idle_timer.cancel()
+                if request is None:
+                    return
+
+                status, body, content_type = await self.dispatch(request)
+                keep_alive = request.keep_alive
+                writer.write(encode_response(status, body, content_type, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    return
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, request: HttpRequest) -> Tuple[HTTPStatus, bytes, str]:
+        """要求を処理して (状態, 本文, Content-Type) を返す（同時処理数と処理時間の上限を適用）"""
+        started = time.perf_counter()
+        handler = self.routes.get((request.method, request.path))
+        # 計測のラベルは登録済みの経路に限る（任意のパスで系列が無制限に増えないよう、未登録は "other"）
+        route = request.path if request.path in self._paths else "other"
+        try:
+            if handler is None:
+                if route != "other":
+                    raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, f"{request.method} には対応していません")
+                raise HttpError(HTTPStatus.NOT_FOUND, f"{request.path} は存在しません")
+
+            # 処理枠の確保（空きがあればそのまま、なければ待ち時間の上限を超えたら過負荷として断る）
+            if self._slots.locked():
+                try:
+                    await asyncio.wait_for(self._slots.acquire(), self.config.queue_timeout)
+                except asyncio.TimeoutError:
+                    self.metrics.increment("service_rejected_total", path=route)
+                    raise HttpError(HTTPStatus.SERVICE_UNAVAILABLE, "混雑しています。時間をおいて再度お試しください")
+            else:
+                await self._slots.acquire()
+
+            self._inflight += 1
+            try:
+                result = await handler(request)
+            finally:
+                self._inflight -= 1
+                self._slots.release()
+        except HttpError as e:
+            result = (e.status, encode_json({"error": e.message}), JSON_CONTENT_TYPE)
+        except Exception as e:
+            logger.exception("%s %s の処理中にエラーが発生しました", request.method, request.path)
+            result = (HTTPStatus.INTERNAL_SERVER_ERROR, encode_json({"error": f"{type(e).__name__}: {e}"}),
+                      JSON_CONTENT_TYPE)
+
+        status = result[0]
+        self.metrics.increment("service_requests_total", path=route, status=status.value)
+        self.metrics.observe("service_request_seconds", time.perf_counter() - started, path=route)
+        return result
+
+    async def run_in_pool(self, function: Callable, *args: Any) -> Any:
+        """CPU負荷の高い処理をワーカープールで実行（処理時間の上限を超えたら504）
+
+        イベントループ内で処理する1件の判定・占断は数十μsで終わり中断もできないため、
+        処理時間の上限はワーカーに送る処理にだけ適用する。
+        """
+        future = asyncio.get_running_loop().run_in_executor(self._pool, function, *args)
+        try:
+            return await asyncio.wait_for(future, self.config.request_timeout)
+        except asyncio.TimeoutError:
+            raise HttpError(HTTPStatus.GATEWAY_TIMEOUT, "処理時間の上限を超えました")
+
+    # ----- エンドポイント -----
+
+    async def handle_health(self, request: HttpRequest) -> Tuple[HTTPStatus, bytes, str]:
+        """稼働状況"""
+        payload = {
+            "status": "ok",
+            "uptime_seconds": round(time.time() - self._started_at, 3),
+            "inflight": self._inflight,
+            "max_concurrency": self.config.max_concurrency,
+            "workers": self.workers,
+            "seimei_cache": asdict(self.assessment.cache_info()),
+        }
+        return HTTPStatus.OK, encode_json(payload), JSON_CONTENT_TYPE
+
+    async def handle_metrics(self, request: HttpRequest) -> Tuple[HTTPStatus, bytes, str]:
+        """Prometheus テキスト形式の計測値"""
+        return HTTPStatus.OK, self.exporter.render().encode("utf-8"), PROMETHEUS_CONTENT_TYPE
+
+    async def handle_assess(self, request: HttpRequest) -> Tuple[HTTPStatus, bytes, str]:
+        """姓名判定1件"""
+        payload = request.json()
+        try:
+            result = self.assessment.assess(*parse_name_input(payload))
+        except KeyError as e:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"項目がありません: {e}")
+        except (ValueError, TypeError, AttributeError, IndexError) as e:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"{type(e).__name__}: {e}")
+        return HTTPStatus.OK, encode_json(result), JSON_CONTENT_TYPE
+
+    async def handle_assess_many(self, request: HttpRequest) -> Tuple[HTTPStatus, bytes, str]:
+        """姓名判定のバッチ（本文が大きければワーカープールで処理）"""
+        if len(request.body) <= self.config.inline_batch_bytes:
+            body = assess_many_body(request.body, self.assessment)
+        else:
+            body = await self.run_in_pool(assess_many_body, request.body)
+        return HTTPStatus.OK, body, JSON_CONTENT_TYPE
+
+    async def handle_divine(self, request: HttpRequest) -> Tuple[HTTPStatus, bytes, str]:
+        """易占1件"""
+        payload = request.json()
+        try:
+            result = self.divination.divine(
+                payload["question"],
+                payload["context"],
+                payload.get("timestamp"),
+                derived=bool(payload.get("derived", False))
+            )
+        except KeyError as e:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"項目がありません: {e}")
+        except (ValueError, TypeError, OverflowError) as e:
+            raise HttpError(HTTPStatus.BAD_REQUEST, f"{type(e).__name__}: {e}")
+        return HTTPStatus.OK, encode_json(result), JSON_CONTENT_TYPE
+
+    async def handle_divine_many(self, request: HttpRequest) -> Tuple[HTTPStatus, bytes, str]:
+        """易占のバッチ（本文が大きければワーカープールで処理）"""
+        if len(request.body) <= self.config.inline_batch_bytes:
+            body = divine_many_body(request.body, self.divination)
+        else:
+            body = await self.run_in_pool(divine_many_body, request.body)
+        return HTTPStatus.OK, body, JSON_CONTENT_TYPE
+
+
+async def serve(config: ServiceConfig) -> None:
+    """サービスを起動し、SIGINT / SIGTERM で停止するまで待ち受ける"""
+    service = FortuneService(config)
+    await service.start()
+
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(signal_number, stopped.set)
+        except (NotImplementedError, RuntimeError):
+            pass  # シグナルハンドラを登録できない環境（Windowsなど）
+
+    try:
+        await stopped.wait()
+    finally:
+        logger.info("停止します")
+        await service.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """コマンドラインから起動"""
+    defaults = ServiceConfig()
+    parser = argparse.ArgumentParser(description="占術エンジン常駐サービス（姓名判定・易占のHTTP API）")
+    parser.add_argument("--host", default=defaults.host, help=f"待ち受けアドレス（既定: {defaults.host}）")
+    parser.add_argument("--port", type=int, default=defaults.port, help=f"待ち受けポート（既定: {defaults.port}）")
+    parser.add_argument("--unix", dest="unix_path", help="TCPの代わりに待ち受けるUnixソケットのパス")
+    parser.add_argument("--workers", type=int, default=defaults.workers, help="バッチ用ワーカー数（既定: CPU数）")
+    parser.add_argument("--max-concurrency", type=int, default=defaults.max_concurrency,
+                        help=f"同時処理数の上限（既定: {defaults.max_concurrency}）")
+    parser.add_argument("--queue-timeout", type=float, default=defaults.queue_timeout,
+                        help=f"処理枠を待つ時間の上限・秒（既定: {defaults.queue_timeout}）")
+    parser.add_argument("--timeout", dest="request_timeout", type=float, default=defaults.request_timeout,
+                        help=f"1リクエストの処理時間の上限・秒（既定: {defaults.request_timeout}）")
+    parser.add_argument("--idle-timeout", type=float, default=defaults.idle_timeout,
+                        help=f"無通信の接続を閉じるまでの時間・秒（既定: {defaults.idle_timeout}）")
+    parser.add_argument("--inline-batch-bytes", type=int, default=defaults.inline_batch_bytes,
+                        help=f"ワーカーに送らずに処理するバッチの本文の大きさ（既定: {defaults.inline_batch_bytes}）")
+    parser.add_argument("--json-dir", help="姓名判定のJSONデータのディレクトリ")
+    parser.add_argument("--database", dest="database_path", help="大卦データベースのパス")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(name)s %(levelname)s %(message)s")
+    config = ServiceConfig(**vars(args))
+    try:
+        asyncio.run(serve(config))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
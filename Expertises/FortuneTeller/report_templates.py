@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+鑑定書・占断書テンプレートの描画
+
+DivineTemplate.md（divine() の結果）と AssessmentTemplate.md（assess() の結果）を
+1回だけ解析して描画関数（Pythonの関数）にコンパイルし、結果の辞書を差し込んだ
+Markdownを書き出し先へ順に書き込む。数千件の一括出力でも、1件分の文字列を
+組み立ててから書き出すことはしない。
+
+テンプレートの記法（いずれも既存のテンプレートの書き方のまま）：
+    `result['得卦']['名前']`           バッククォートで囲んだ result の式 → 値
+    {result['七格']['天格']['数']}     波括弧で囲んだ result を含む式 → 値
+    ```python ... ```                  result を参照するPythonコード → print() の出力を ``` で囲んで出力
+    ## 見出し（`result['変卦']` がある場合）
+                                       式の値がある時だけ、次の同じ階層以上の見出しまでを出力
+    <!-- ... -->                       出力しない（テンプレートの使い方の説明）
+    > [!NOTE] ...                      「最終出力には含めない」と書かれた注意書きは出力しない
+
+テンプレートの式とコードはそのままPythonとして実行するため、信頼できるテンプレートだけを使うこと。
+
+使用例：
+    template = get_template("divine")
+    with open("占断書.md", "w", encoding="utf-8") as f:
+        template.render(divination.divine(占的, 状況整理, derived=True), f)
+
+    python report_templates.py assessment results.jsonl --output-dir 鑑定書/
+"""
+
+import argparse
+import ast
+import io
+import json
+import re
+import sys
+import textwrap
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, TextIO, Tuple, Union
+
+
+BASE_DIR = Path(__file__).resolve().parent
+TEMPLATE_PATHS = {
+    "divine": BASE_DIR / "I-Ching" / "DivineTemplate.md",
+    "assessment": BASE_DIR / "Seimei" / "AssessmentTemplate.md",
+}
+
+REPORT_SEPARATOR = "\n\n"  # render_many で報告の間に書く文字列
+EXCLUDED_NOTE_MARK = "最終出力には含めない"  # この文言を含む注意書き（> [!...]）は出力しない
+CODE_FENCE = "```"
+
+BACKTICK_PLACEHOLDER = re.compile(r"`(result\[[^`]*)`")
+CONDITIONAL_HEADING = re.compile(r"^(#+)\s.*?(（`(result\[[^`]*)`\s*がある場合）)")
+HEADING = re.compile(r"^(#+)\s")
+ALERT = re.compile(r"^>\s*\[!\w+\]")
+UNSAFE_NAME_CHARACTERS = re.compile(r"[\x00-\x1f/\\]")  # ファイル名の一部に使えない文字（区切り・制御文字）
+
+Writer = Union[TextIO, Callable[[str], Any]]
+
+
+def _text(value: Any) -> str:
+    """差し込む値を文字列にする（Noneは空文字列）"""
+    if value is None:
+        return ""
+    return value if type(value) is str else str(value)
+
+
+def _placeholder_label(expression: str) -> str:
+    """値が無い差し込みの代わりに書く目印（テンプレートの手書き欄と同じ [項目名] の形）"""
+    node = ast.parse(expression, mode="eval").body
+    if isinstance(node, ast.Subscript):
+        key = node.slice
+        if type(key).__name__ == "Index":  # Python 3.8以前は ast.Index で包まれている
+            key = key.value
+        key = getattr(key, "value", getattr(key, "s", None))
+        if isinstance(key, str):
+            return f"[{key}]"
+    return f"[{expression}]"
+
+
+def _present(getter: Callable[[], Any]) -> bool:
+    """条件付きの見出しの式に値があるか（キーが無い・None・空の場合は無し）"""
+    try:
+        value = getter()
+    except (KeyError, IndexError, TypeError):
+        return False
+    return value is not None and value != {} and value != []
+
+
+def _make_print(write: Callable[[str], Any]) -> Callable[..., None]:
+    """テンプレート内のコードの print() を書き出し先へ向ける"""
+    def print_(*values: Any, sep: str = " ", end: str = "\n") -> None:
+        write(sep.join(map(str, values)) + end)
+    return print_
+
+
+def _writer(out: Writer) -> Callable[[str], Any]:
+    """書き出し先（write() を持つオブジェクトまたは関数）から書き込み関数を取得"""
+    write = getattr(out, "write", None)
+    return write if write is not None else out
+
+
+def _find_brace_placeholder(line: str, start: int) -> Optional[Tuple[int, int]]:
+    """start 以降で result を含む {...} の範囲（対応する括弧まで）を探す
+
+    Returns:
+        (開き括弧の位置, 閉じ括弧の次の位置)。無ければNone
+    """
+    position = line.find("{", start)
+    while position >= 0:
+        depth = 0
+        for index in range(position, len(line)):
+            if line[index] == "{":
+                depth += 1
+            elif line[index] == "}":
+                depth -= 1
+                if depth == 0:
+                    if "result" in line[position + 1:index]:
+                        return position, index + 1
+                    break
+        position = line.find("{", position + 1)
+    return None
+
+
+class TemplateCompiler:
+    """テンプレートを描画関数のPythonソースに変換する
+
+    テンプレートの行を順に読み、連続する文字列は1回の write() にまとめ、
+    差し込みは write(_text(式))、コードはそのまま関数の本体に埋め込む。
+    生成したソースの各行がテンプレートの何行目に当たるかも記録する（エラー表示用）。
+    """
+
+    def __init__(self, name: str, strict: bool = False):
+        self.name = name
+        self.strict = strict
+        self.lines: List[str] = ["def render(result, write):"]
+        self.line_map: List[int] = [0]  # 生成したソースの行 → テンプレートの行番号
+        self.pending: List[str] = []  # まだ write() にしていない文字列
+        self.pending_line = 0
+        self.sections: List[int] = []  # 開いている条件付きの見出しの階層
+        self.uses_print = False
+
+    def _emit(self, code: str, line_number: int, depth: Optional[int] = None) -> None:
+        indent = "    " * (1 + (len(self.sections) if depth is None else depth))
+        self.lines.append(indent + code)
+        self.line_map.append(line_number)
+
+    def _check(self, expression: str, line_number: int) -> str:
+        try:
+            compile(expression, self.name, "eval")
+        except SyntaxError as e:
+            raise ValueError(f"{self.name}:{line_number}: 式を解釈できません: {expression} ({e.msg})") from None
+        return expression
+
+    def text(self, text: str, line_number: int) -> None:
+        if not self.pending:
+            self.pending_line = line_number
+        self.pending.append(text)
+
+    def flush(self) -> None:
+        if self.pending:
+            self._emit(f"write({''.join(self.pending)!r})", self.pending_line)
+            self.pending = []
+
+    def expression(self, expression: str, line_number: int) -> None:
+        self.flush()
+        self._check(expression, line_number)
+        if self.strict:
+            self._emit(f"write(_text({expression}))", line_number)
+            return
+        # 結果に無い項目は [項目名] のまま残す（手で埋める欄として扱う）
+        self._emit("try:", line_number)
+        self._emit(f"    _value = {expression}", line_number)
+        self._emit("except LookupError:", line_number)
+        self._emit(f"    _value = {_placeholder_label(expression)!r}", line_number)
+        self._emit("write(_text(_value))", line_number)
+
+    def code(self, source: str, line_number: int) -> None:
+        try:
+            compile(source, self.name, "exec")
+        except SyntaxError as e:
+            raise ValueError(f"{self.name}:{line_number + (e.lineno or 1)}: コードを解釈できません ({e.msg})") from None
+        self.uses_print = True
+        self.text(CODE_FENCE + "\n", line_number)
+        self.flush()
+        for offset, code_line in enumerate(source.splitlines(), start=1):
+            if code_line.strip():
+                self._emit(code_line, line_number + offset)
+        self.text(CODE_FENCE + "\n", line_number)
+
+    def open_section(self, level: int, expression: str, line_number: int) -> None:
+        self.close_sections(level)
+        self.flush()
+        self._emit(f"if _present(lambda: {self._check(expression, line_number)}):", line_number)
+        self.sections.append(level)
+
+    def close_sections(self, level: int) -> None:
+        while self.sections and self.sections[-1] >= level:
+            self.flush()
+            self._emit("pass", 0)
+            self.sections.pop()
+
+    def inline(self, line: str, line_number: int) -> None:
+        """1行分の文字列と差し込み（`result[...]` と {... result ...}）を処理"""
+        position = 0
+        while position < len(line):
+            backtick = BACKTICK_PLACEHOLDER.search(line, position)
+            brace = _find_brace_placeholder(line, position)
+            if backtick is None and brace is None:
+                break
+            if brace is None or (backtick is not None and backtick.start() < brace[0]):
+                self.text(line[position:backtick.start()], line_number)
+                self.expression(backtick.group(1), line_number)
+                position = backtick.end()
+            else:
+                self.text(line[position:brace[0]], line_number)
+                self.expression(line[brace[0] + 1:brace[1] - 1], line_number)
+                position = brace[1]
+        self.text(line[position:], line_number)
+
+    def source(self) -> str:
+        self.close_sections(0)
+        self.flush()
+        if self.uses_print:
+            self.lines.insert(1, "    print = _make_print(write)")
+            self.line_map.insert(1, 0)
+        if len(self.lines) == 1:
+            self._emit("pass", 0)
+        return "\n".join(self.lines) + "\n"
+
+
+def translate_template(source: str, name: str = "<template>", strict: bool = False) -> Tuple[str, List[int]]:
+    """テンプレートを描画関数のPythonソースに変換
+
+    Args:
+        source: テンプレートの内容
+        name: テンプレートの名前（エラー表示用）
+        strict: Trueの場合は結果に無い項目の差し込みをエラーにする（Falseの場合は [項目名] を書く）
+
+    Returns:
+        (描画関数 render(result, write) のソース, 生成したソースの行 → テンプレートの行番号)
+
+    Raises:
+        ValueError: 差し込みの式やコードを解釈できない場合
+    """
+    compiler = TemplateCompiler(name, strict)
+    lines = source.splitlines(keepends=True)
+    index = 0
+    dropped = False  # 直前に出力しない部分を除いた（続く空行と、重なった区切り線も除く）
+    previous = ""  # 直前に出力した空でない行
+
+    while index < len(lines):
+        line = lines[index]
+        line_number = index + 1
+        stripped = line.strip()
+
+        if dropped and (not stripped or (stripped == previous == "---")):
+            index += 1
+            continue
+        dropped = False
+
+        # テンプレートの使い方の説明（HTMLコメント）
+        if stripped.startswith("<!--"):
+            while "-->" not in lines[index]:
+                index += 1
+                if index >= len(lines):
+                    raise ValueError(f"{name}:{line_number}: コメントが閉じられていません")
+            index += 1
+            dropped = True
+            continue
+
+        # 作成者向けの注意書き
+        if ALERT.match(stripped):
+            end = index + 1
+            while end < len(lines) and lines[end].lstrip().startswith(">"):
+                end += 1
+            if any(EXCLUDED_NOTE_MARK in alert_line for alert_line in lines[index:end]):
+                index = end
+                dropped = True
+                continue
+
+        # result を参照するPythonコード
+        if stripped.startswith(CODE_FENCE + "python"):
+            end = index + 1
+            while end < len(lines) and lines[end].strip() != CODE_FENCE:
+                end += 1
+            block = "".join(lines[index + 1:end])
+            if "result" in block:
+                compiler.code(textwrap.dedent(block), line_number)
+                index = end + 1
+                continue
+
+        heading = HEADING.match(line)
+        if heading:
+            level = len(heading.group(1))
+            compiler.close_sections(level)
+            conditional = CONDITIONAL_HEADING.match(line)
+            if conditional:
+                compiler.open_section(level, conditional.group(3), line_number)
+                line = line.replace(conditional.group(2), "")
+
+        compiler.inline(line, line_number)
+        if stripped:
+            previous = stripped
+        index += 1
+
+    return compiler.source(), compiler.line_map
+
+
+class ReportTemplate:
+    """コンパイル済みのテンプレート"""
+
+    def __init__(self, source: str, name: str = "<template>", strict: bool = False):
+        """
+        Args:
+            source: テンプレートの内容
+            name: テンプレートの名前（エラー表示用）
+            strict: Trueの場合は結果に無い項目の差し込みをエラーにする（Falseの場合は [項目名] を書く）
+
+        Raises:
+            ValueError: 差し込みの式やコードを解釈できない場合
+        """
+        self.name = name
+        self.strict = strict
+        self.python_source, self._line_map = translate_template(source, name, strict)
+        self._filename = f"<report template {name}>"
+        namespace: Dict[str, Any] = {"_text": _text, "_present": _present, "_make_print": _make_print}
+        exec(compile(self.python_source, self._filename, "exec"), namespace)
+        self._render = namespace["render"]
+
+    def _template_line(self, error: BaseException) -> int:
+        """描画中の例外が起きたテンプレートの行番号"""
+        line_number = 0
+        traceback = error.__traceback__
+        while traceback is not None:
+            if traceback.tb_frame.f_code.co_filename == self._filename:
+                line_number = self._line_map[traceback.tb_lineno - 1]
+            traceback = traceback.tb_next
+        return line_number
+
+    def render(self, result: Dict[str, Any], out: Writer) -> None:
+        """結果を差し込んだ報告を書き出し先へ書き込む
+
+        Args:
+            result: divine() または assess() の結果
+            out: 書き出し先（write() を持つオブジェクト、または文字列を受け取る関数）
+
+        Raises:
+            ValueError: 結果に必要な項目が無い場合（テンプレートの行番号付き）
+        """
+        try:
+            self._render(result, _writer(out))
+        except (KeyError, IndexError, TypeError, AttributeError) as e:
+            raise ValueError(f"{self.name}:{self._template_line(e)}: 結果を差し込めません ({e!r})") from e
+
+    def render_to_string(self, result: Dict[str, Any]) -> str:
+        """結果を差し込んだ報告を文字列で取得
+
+        Args:
+            result: divine() または assess() の結果
+
+        Returns:
+            報告のMarkdown
+        """
+        buffer = io.StringIO()
+        self.render(result, buffer)
+        return buffer.getvalue()
+
+    def render_many(self, results: Iterable[Dict[str, Any]], out: Writer, separator: str = REPORT_SEPARATOR) -> int:
+        """複数の結果の報告を順に書き込む（結果は1件ずつ読み、溜めない）
+
+        Args:
+            results: divine() または assess() の結果の並び
+            out: 書き出し先
+            separator: 報告の間に書く文字列
+
+        Returns:
+            書き込んだ報告の件数
+        """
+        write = _writer(out)
+        count = 0
+        for result in results:
+            if count:
+                write(separator)
+            self.render(result, write)
+            count += 1
+        return count
+
+
+_template_cache: Dict[Tuple[str, bool], Tuple[Tuple[int, int], ReportTemplate]] = {}
+_template_lock = threading.Lock()
+
+
+def load_template(path: Union[str, Path], strict: bool = False) -> ReportTemplate:
+    """テンプレートファイルをコンパイルして取得（同じファイルは更新されるまで再利用）
+
+    Args:
+        path: テンプレートファイルのパス
+        strict: Trueの場合は結果に無い項目の差し込みをエラーにする
+
+    Returns:
+        コンパイル済みのテンプレート
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    stamp = (stat.st_size, stat.st_mtime_ns)
+    key = (str(path), strict)
+    with _template_lock:
+        cached = _template_cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        template = ReportTemplate(path.read_text(encoding="utf-8"), path.name, strict)
+        _template_cache[key] = (stamp, template)
+        return template
+
+
+def get_template(kind: str, strict: bool = False) -> ReportTemplate:
+    """標準のテンプレートを取得
+
+    Args:
+        kind: "divine"（DivineTemplate.md）または "assessment"（AssessmentTemplate.md）
+        strict: Trueの場合は結果に無い項目の差し込みをエラーにする
+
+    Returns:
+        コンパイル済みのテンプレート
+    """
+    if kind not in TEMPLATE_PATHS:
+        raise ValueError(f"テンプレートの種類が不正です: {kind}（{', '.join(TEMPLATE_PATHS)}）")
+    return load_template(TEMPLATE_PATHS[kind], strict)
+
+
+def iter_results(stream: TextIO) -> Iterable[Tuple[int, Optional[str], Optional[Dict[str, Any]]]]:
+    """JSONLの各行から結果を取り出す
+
+    seimei_batch の出力（{"index", "id", "result" または "error"}）と、
+    結果の辞書そのものの行のどちらも受け付ける。
+
+    Returns:
+        (行の通し番号, 識別子, 結果（判定できなかった行はNone）) の並び
+    """
+    for number, line in enumerate(stream):
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        if "result" in record or "error" in record:
+            yield record.get("index", number), record.get("id"), record.get("result")
+        else:
+            yield number, None, record
+
+
+def safe_file_name(value: Any) -> str:
+    """結果の識別子をファイル名の一部に使える文字列にする
+
+    区切り文字・制御文字を "_" に置き換え、"." と ".." は "_" の並びにする
+    （入力のJSONLの値で --output-dir の外に書き出さないため）。
+    """
+    name = UNSAFE_NAME_CHARACTERS.sub("_", str(value))
+    return name if name.strip(".") else "_" * max(len(name), 1)
+
+
+def report_path(directory: Path, name_format: str, index: int, identifier: Any) -> Path:
+    """--output-dir に書き出す報告のパス
+
+    Raises:
+        ValueError: ファイル名が --output-dir の外を指す場合
+    """
+    name = name_format.format(index=index, id=safe_file_name(identifier) if identifier is not None else index)
+    root = directory.resolve()
+    path = (root / name).resolve()
+    if root not in path.parents:
+        raise ValueError(f"ファイル名が出力先ディレクトリの外を指しています: {name}")
+    return path
+
+
+def main() -> int:
+    """JSONLの結果から報告を一括で書き出す"""
+    parser = argparse.ArgumentParser(description="鑑定書・占断書テンプレートの描画")
+    parser.add_argument("kind", choices=sorted(TEMPLATE_PATHS), help="テンプレートの種類")
+    parser.add_argument("input", nargs="?", default="-", help="結果のJSONL（省略時は標準入力）")
+    parser.add_argument("--template", help="テンプレートファイル（省略時は標準のテンプレート）")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("-o", "--output", help="すべての報告を書き出すファイル（省略時は標準出力）")
+    output.add_argument("--output-dir", help="報告を1件ずつ書き出すディレクトリ")
+    parser.add_argument("--name-format", default="{index:06d}.md",
+                        help="--output-dir のファイル名（{index} と {id} を使用可。{id} の区切り文字は _ に置き換える）")
+    parser.add_argument("--strict", action="store_true", help="結果に無い項目があればエラーにする")
+    parser.add_argument("--show-source", action="store_true", help="コンパイルした描画関数のソースを表示")
+    args = parser.parse_args()
+
+    template = load_template(args.template, args.strict) if args.template else get_template(args.kind, args.strict)
+    if args.show_source:
+        print(template.python_source)
+        return 0
+
+    stream = sys.stdin if args.input == "-" else open(args.input, encoding="utf-8")
+    skipped = 0
+    count = 0
+    try:
+        if args.output_dir:
+            directory = Path(args.output_dir)
+            directory.mkdir(parents=True, exist_ok=True)
+            for index, identifier, result in iter_results(stream):
+                if result is None:
+                    skipped += 1
+                    continue
+                with open(report_path(directory, args.name_format, index, identifier), "w", encoding="utf-8") as f:
+                    template.render(result, f)
+                count += 1
+        else:
+            def results() -> Iterable[Dict[str, Any]]:
+                nonlocal skipped
+                for _, _, result in iter_results(stream):
+                    if result is None:
+                        skipped += 1
+                    else:
+                        yield result
+
+            out = sys.stdout if args.output is None else open(args.output, "w", encoding="utf-8")
+            try:
+                count = template.render_many(results(), out)
+            finally:
+                if out is not sys.stdout:
+                    out.close()
+    except ValueError as e:
+        print(f"エラー: {e}", file=sys.stderr)
+        return 1
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+    print(f"{count}件の報告を書き出しました" + (f"（判定できなかった{skipped}件を除く）" if skipped else ""),
+          file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
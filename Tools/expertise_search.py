@@ -0,0 +1,639 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+専門知識の全文検索 - Expertise Search
+
+Expertises配下のテキスト・Markdown・JSON（大卦データベースの卦辞・爻辞、
+トラブル事例集、LegalCheckGuide、設計の勘所など）を段落単位の文書に分け、
+文字bigramの転置索引とBM25で検索する。
+
+索引はファイルごとに (サイズ, 更新時刻ns, SHA-256) を記録する。再構築時は
+サイズ・更新時刻が変わったファイルだけハッシュを計算し、内容が変わったファイル
+だけを読み直す。変わらないファイルの文書とpostingは前回の索引から引き継ぐ。
+
+索引ファイル（ヘッダ + zlib圧縮したmarshal本体。ヘッダはリトルエンディアン）：
+    ヘッダ : マジック(4) / 版数(u16) / 予約(2) / ファイル数(u32) / 文書数(u32) / 語数(u32) /
+             処理系タグ(16) / 本体のSHA-256(32)
+    本体   : ファイル表、文書の見出し・長さ・所属ファイル、語の一覧（改行区切り）、
+             語ごとのposting（文書番号 u32・出現回数 u16 の配列）、本文（NUL区切り）
+
+使用例：
+    python Tools/expertise_search.py search 報酬不払い
+    python Tools/expertise_search.py search 地盤 --path GeneralConstructor -n 5
+    python Tools/expertise_search.py build --full
+"""
+
+import argparse
+import hashlib
+import heapq
+import json
+import marshal
+import os
+import re
+import struct
+import sys
+import time
+import unicodedata
+import zlib
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import asdict, dataclass
+from math import log
+from operator import itemgetter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+REPOSITORY_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_ROOTS = (REPOSITORY_ROOT / "Expertises",)
+DEFAULT_INDEX_PATH = Path(__file__).resolve().parent / "expertise_search.index"
+INDEXED_SUFFIXES = (".txt", ".md", ".json")
+
+INDEX_MAGIC = b"EXSI"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<4sHxxIII16s32s")
+
+# 1文書（段落）の最大文字数（これを超える段落は行単位で分ける）
+MAX_PASSAGE_CHARS = 400
+
+# BM25のパラメータ
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 出現回数の上限（u16に収める）
+MAX_TERM_FREQUENCY = 0xFFFF
+
+# 検索結果に表示する本文の文字数
+SNIPPET_CHARS = 120
+
+# 語の区切り（文字・数字の連続を取り出し、記号・空白・改行で区切る）
+WORD_RUN = re.compile(r"[^\W_]+")
+
+# 見出し行（Markdownの # と ■）
+HEADING_LINE = re.compile(r"^\s*(?:#{1,6}\s+|■\s*)(.+)$")
+
+
+def _interpreter_tag() -> bytes:
+    """marshal形式の互換性を判定する処理系タグ（例：b"cpython-311"）"""
+    return sys.implementation.cache_tag.encode("ascii")[:16].ljust(16, b"\0")
+
+
+def tokenize(text: str) -> List[str]:
+    """文字bigramに分割
+
+    NFKC正規化・小文字化したうえで文字・数字の連続ごとに2文字ずつずらして切り出す。
+    1文字だけの連続はその1文字を語とする。
+
+    Args:
+        text: 対象の文字列
+
+    Returns:
+        語（bigram）の並び
+    """
+    tokens = []
+    for run in WORD_RUN.findall(unicodedata.normalize("NFKC", text).casefold()):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+@dataclass
+class Passage:
+    """索引の1文書（段落・JSONの1要素）"""
+    label: str  # 例：'12行目 事例1：報酬不払いトラブル'、'hexagrams[0].爻[1]'
+    text: str
+
+
+def split_text_passages(text: str) -> List[Passage]:
+    """テキスト・Markdownを段落単位の文書に分ける
+
+    空行と見出し行（# と ■）で区切り、MAX_PASSAGE_CHARS を超える段落は行単位で分ける。
+    見出しは次の見出しまでの文書の見出しとし、見出し行自体も次の文書の先頭に含める。
+
+    Args:
+        text: ファイルの内容
+
+    Returns:
+        文書の並び（見出しは「開始行 + 直前の見出し」）
+    """
+    passages = []
+    heading = ""
+    lines: List[str] = []
+    start = 0
+    size = 0
+
+    def flush() -> None:
+        nonlocal lines, size
+        body = "\n".join(lines).strip()
+        if body:
+            passages.append(Passage(f"{start}行目 {heading}".rstrip(), body))
+        lines = []
+        size = 0
+
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            flush()
+            continue
+        match = HEADING_LINE.match(line)
+        if match:
+            flush()
+            heading = match.group(1).strip()
+
+        # 長すぎる行は区切って別の文書にする
+        for offset in range(0, len(line), MAX_PASSAGE_CHARS):
+            piece = line[offset:offset + MAX_PASSAGE_CHARS]
+            if size + len(piece) > MAX_PASSAGE_CHARS:
+                flush()
+            if not lines:
+                start = number
+            lines.append(piece)
+            size += len(piece) + 1
+    flush()
+    return passages
+
+
+def split_json_passages(data) -> List[Passage]:
+    """JSONを要素単位の文書に分ける
+
+    オブジェクトごとに、値が文字列・数値の項目を「キー: 値」の行にまとめて1文書とし、
+    入れ子のオブジェクト・配列は再帰的に別の文書にする（大卦データベースなら卦ごと・爻ごと）。
+
+    Args:
+        data: json.load の結果
+
+    Returns:
+        文書の並び（見出しはJSON内のパス）
+    """
+    passages = []
+
+    def add(path: str, text: str) -> None:
+        for offset in range(0, len(text), MAX_PASSAGE_CHARS):
+            passages.append(Passage(path or "$", text[offset:offset + MAX_PASSAGE_CHARS]))
+
+    def walk(value, path: str) -> None:
+        if isinstance(value, dict):
+            fields = [f"{key}: {item}" for key, item in value.items() if not isinstance(item, (dict, list))]
+            if fields:
+                add(path, "\n".join(fields))
+            for key, item in value.items():
+                if isinstance(item, (dict, list)):
+                    walk(item, f"{path}.{key}" if path else key)
+        elif isinstance(value, list):
+            scalars = [str(item) for item in value if not isinstance(item, (dict, list))]
+            if scalars:
+                add(path, "、".join(scalars))
+            for number, item in enumerate(value):
+                if isinstance(item, (dict, list)):
+                    walk(item, f"{path}[{number}]")
+        else:
+            add(path, str(value))
+
+    walk(data, "")
+    return passages
+
+
+def split_passages(path: Path, text: str) -> List[Passage]:
+    """拡張子に応じて文書に分ける（JSONとして読めないJSONはテキストとして扱う）"""
+    if path.suffix == ".json":
+        try:
+            return split_json_passages(json.loads(text))
+        except ValueError:
+            pass
+    return split_text_passages(text)
+
+
+def discover_files(roots: Iterable[Path]) -> List[Path]:
+    """索引対象のファイル（INDEXED_SUFFIXES の拡張子）を列挙
+
+    Args:
+        roots: 探索するディレクトリまたはファイル
+
+    Returns:
+        重複を除いてパス順に並べたファイルの一覧
+    """
+    found = set()
+    for root in roots:
+        root = Path(root)
+        if root.is_file():
+            found.add(root.resolve())
+            continue
+        for path in root.rglob("*"):
+            if path.suffix in INDEXED_SUFFIXES and path.is_file():
+                found.add(path.resolve())
+    return sorted(found)
+
+
+def display_path(path: Path) -> str:
+    """リポジトリからの相対パス（リポジトリ外は絶対パス）"""
+    try:
+        return path.relative_to(REPOSITORY_ROOT).as_posix()
+    except ValueError:
+        return path.as_posix()
+
+
+@dataclass
+class SourceFile:
+    """索引に収録したファイル"""
+    path: str  # リポジトリからの相対パス
+    size: int
+    mtime_ns: int
+    digest: bytes  # 内容のSHA-256
+    first_passage: int  # 最初の文書番号
+    passage_count: int
+
+
+@dataclass
+class SearchHit:
+    """検索結果の1件"""
+    score: float
+    path: str
+    label: str
+    text: str
+
+
+@dataclass
+class BuildStats:
+    """索引の更新内容"""
+    files: int = 0
+    reused: int = 0  # 前回の索引から引き継いだファイル数
+    parsed: int = 0  # 読み直したファイル数
+    removed: int = 0  # 索引から除いたファイル数
+    restamped: int = 0  # 内容は同じで更新時刻だけ変わったファイル数
+    seconds: float = 0.0
+
+    @property
+    def changed(self) -> bool:
+        """索引ファイルを書き直す必要があるかどうか"""
+        return bool(self.parsed or self.removed or self.restamped)
+
+
+class ExpertiseIndex:
+    """文字bigramの転置索引（BM25で検索）
+
+    語は昇順に並べ、語ごとのpostingを1本の配列に連結して term_offsets で区切る。
+    語の検索は二分探索、スコアは出現する文書だけに加算するため、検索時間は
+    検索語のposting長にしか依存しない。本文は最初に検索結果を作るときに分割する。
+    """
+
+    def __init__(self, files: List[SourceFile], labels: List[str], lengths: array, passage_files: array,
+                 terms: List[str], term_offsets: array, postings_docs: array, postings_tfs: array,
+                 texts_blob: str):
+        """
+        Args:
+            files: 収録ファイル
+            labels: 文書番号 → 見出し
+            lengths: 文書番号 → 語数（array('I')）
+            passage_files: 文書番号 → ファイル番号（array('I')）
+            terms: 昇順の語の一覧
+            term_offsets: 語番号 → postingの開始位置（末尾に終端を加えた array('I')）
+            postings_docs: postingの文書番号（array('I')）
+            postings_tfs: postingの出現回数（array('H')）
+            texts_blob: 本文をNUL区切りで連結したもの
+        """
+        self.files = files
+        self.labels = labels
+        self.lengths = lengths
+        self.passage_files = passage_files
+        self.terms = terms
+        self.term_offsets = term_offsets
+        self.postings_docs = postings_docs
+        self.postings_tfs = postings_tfs
+        self._texts_blob = texts_blob
+        self._texts: Optional[List[str]] = None
+
+        # 文書長による正規化項 k1 * (1 - b + b * 文書長 / 平均文書長) を先に求めておく
+        average = sum(lengths) / len(lengths) if len(lengths) else 1.0
+        self._norms = array('d', (BM25_K1 * (1 - BM25_B + BM25_B * length / average) for length in lengths))
+
+    @property
+    def texts(self) -> List[str]:
+        """文書番号 → 本文（初回参照時に分割）"""
+        if self._texts is None:
+            self._texts = self._texts_blob.split("\0") if self.labels else []
+        return self._texts
+
+    def term_number(self, term: str) -> int:
+        """語番号（未登録なら-1）"""
+        number = bisect_left(self.terms, term)
+        if number < len(self.terms) and self.terms[number] == term:
+            return number
+        return -1
+
+    def query_terms(self, query: str) -> List[int]:
+        """検索語を語番号の一覧にする（1文字の語はその文字を含むbigramすべてに展開）"""
+        numbers = set()
+        for token in set(tokenize(query)):
+            if len(token) == 1:
+                numbers.update(number for number, term in enumerate(self.terms) if token in term)
+            else:
+                number = self.term_number(token)
+                if number >= 0:
+                    numbers.add(number)
+        return sorted(numbers)
+
+    def search(self, query: str, limit: int = 10, path_filter: Optional[str] = None) -> List[SearchHit]:
+        """BM25で検索
+
+        Args:
+            query: 検索語（空白区切りで複数可。語順・区切りによらず含まれるbigramで採点する）
+            limit: 返す件数
+            path_filter: 指定した場合はパスにこの文字列を含むファイルの文書だけを返す
+
+        Returns:
+            スコアの高い順の検索結果
+        """
+        document_count = len(self.lengths)
+        offsets = self.term_offsets
+        docs = self.postings_docs
+        tfs = self.postings_tfs
+        norms = self._norms
+        k1_plus_1 = BM25_K1 + 1
+
+        scores: Dict[int, float] = {}
+        get = scores.get
+        for number in self.query_terms(query):
+            start, end = offsets[number], offsets[number + 1]
+            frequency = end - start
+            idf = log(1 + (document_count - frequency + 0.5) / (frequency + 0.5))
+            for doc, tf in zip(docs[start:end], tfs[start:end]):
+                scores[doc] = get(doc, 0.0) + idf * tf * k1_plus_1 / (tf + norms[doc])
+
+        candidates = scores.items()
+        if path_filter:
+            allowed = {number for number, source in enumerate(self.files) if path_filter in source.path}
+            passage_files = self.passage_files
+            candidates = [(doc, score) for doc, score in candidates if passage_files[doc] in allowed]
+
+        texts = self.texts
+        return [SearchHit(score, self.files[self.passage_files[doc]].path, self.labels[doc], texts[doc])
+                for doc, score in heapq.nlargest(limit, candidates, key=itemgetter(1))]
+
+    def save(self, path: Path) -> None:
+        """索引ファイルに書き出す（書き込み途中のファイルを読まれないよう一時ファイルから置き換える）"""
+        path = Path(path)
+        body = zlib.compress(marshal.dumps((
+            [(source.path, source.size, source.mtime_ns, source.digest, source.first_passage, source.passage_count)
+             for source in self.files],
+            self.labels,
+            self.lengths.tobytes(),
+            self.passage_files.tobytes(),
+            "\n".join(self.terms),
+            self.term_offsets.tobytes(),
+            self.postings_docs.tobytes(),
+            self.postings_tfs.tobytes(),
+            self._texts_blob,
+        )))
+        header = INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, len(self.files), len(self.lengths), len(self.terms),
+                                   _interpreter_tag(), hashlib.sha256(body).digest())
+        temp_path = path.with_name(path.name + f".{os.getpid()}.tmp")
+        with open(temp_path, 'wb') as f:
+            f.write(header)
+            f.write(body)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["ExpertiseIndex"]:
+        """索引ファイルを検証して読み込む
+
+        ファイルが無い・版数や処理系が異なる・チェックサム不一致の場合はNoneを返す。
+
+        Args:
+            path: 索引ファイルのパス
+
+        Returns:
+            索引、または None
+        """
+        try:
+            with open(path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        if len(data) < INDEX_HEADER.size:
+            return None
+
+        magic, version, _, _, _, tag, checksum = INDEX_HEADER.unpack_from(data, 0)
+        body = memoryview(data)[INDEX_HEADER.size:]
+        if magic != INDEX_MAGIC or version != INDEX_VERSION or tag != _interpreter_tag():
+            return None
+        if hashlib.sha256(body).digest() != checksum:
+            return None
+        try:
+            (files, labels, lengths, passage_files, terms, term_offsets, postings_docs, postings_tfs,
+             texts_blob) = marshal.loads(zlib.decompress(body))
+        except (EOFError, ValueError, TypeError, zlib.error):
+            return None
+
+        def unpack(typecode: str, blob: bytes) -> array:
+            values = array(typecode)
+            values.frombytes(blob)
+            return values
+
+        return cls([SourceFile(*entry) for entry in files], labels, unpack('I', lengths),
+                   unpack('I', passage_files), terms.split("\n") if terms else [], unpack('I', term_offsets),
+                   unpack('I', postings_docs), unpack('H', postings_tfs), texts_blob)
+
+
+def build_index(roots: Sequence[Path] = DEFAULT_ROOTS,
+                previous: Optional[ExpertiseIndex] = None) -> Tuple[ExpertiseIndex, BuildStats]:
+    """索引を構築（前回の索引があれば変わったファイルだけ読み直す）
+
+    ファイルのサイズ・更新時刻が前回と同じなら内容も同じとみなし、違えばSHA-256を
+    比べて内容の変化を判定する。何も変わっていなければ前回の索引をそのまま返す。
+
+    Args:
+        roots: 索引対象のディレクトリまたはファイル
+        previous: 前回の索引（Noneの場合はすべて読み直す）
+
+    Returns:
+        (索引, 更新内容)
+    """
+    started = time.perf_counter()
+    stats = BuildStats()
+    previous_files = {source.path: (number, source) for number, source in enumerate(previous.files)} if previous else {}
+
+    # 各ファイルを「引き継ぐ」か「読み直す」かに振り分ける
+    plan = []  # (表示パス, stat, 前回のファイル番号または-1, 読み込んだ内容またはNone, SHA-256)
+    for path in discover_files(roots):
+        key = display_path(path)
+        stat = path.stat()
+        number, source = previous_files.get(key, (-1, None))
+        if source is not None and (source.size, source.mtime_ns) == (stat.st_size, stat.st_mtime_ns):
+            plan.append((key, stat, number, None, source.digest))
+            continue
+        data = path.read_bytes()
+        digest = hashlib.sha256(data).digest()
+        if source is not None and source.digest == digest:
+            stats.restamped += 1
+            plan.append((key, stat, number, None, digest))
+        else:
+            plan.append((key, stat, -1, (path, data), digest))
+
+    stats.files = len(plan)
+    stats.reused = sum(1 for entry in plan if entry[3] is None)
+    stats.parsed = stats.files - stats.reused
+    stats.removed = len(set(previous_files) - {entry[0] for entry in plan})
+    if previous is not None and not (stats.parsed or stats.removed):
+        # 更新時刻だけ変わったファイルは記録を書き換えるだけで済む
+        for key, stat, number, _, _ in plan:
+            source = previous.files[number]
+            source.size, source.mtime_ns = stat.st_size, stat.st_mtime_ns
+        stats.seconds = time.perf_counter() - started
+        return previous, stats
+
+    files: List[SourceFile] = []
+    labels: List[str] = []
+    texts: List[str] = []
+    lengths = array('I')
+    passage_files = array('I')
+    postings: Dict[str, Tuple[array, array]] = {}
+    remap = array('i', [-1]) * (len(previous.lengths) if previous else 0)  # 前回の文書番号 → 今回の文書番号
+
+    for key, stat, number, parsed, digest in plan:
+        first = len(labels)
+        if parsed is None:
+            # 前回の文書を引き継ぐ（postingは後でまとめて付け替える）
+            source = previous.files[number]
+            old_first = source.first_passage
+            for offset in range(source.passage_count):
+                remap[old_first + offset] = first + offset
+            labels.extend(previous.labels[old_first:old_first + source.passage_count])
+            texts.extend(previous.texts[old_first:old_first + source.passage_count])
+            lengths.extend(previous.lengths[old_first:old_first + source.passage_count])
+        else:
+            path, data = parsed
+            for passage in split_passages(path, data.decode("utf-8", errors="replace")):
+                doc = len(labels)
+                tokens = tokenize(passage.text)
+                labels.append(passage.label)
+                texts.append(passage.text.replace("\0", ""))
+                lengths.append(len(tokens))
+                for term, frequency in Counter(tokens).items():
+                    entry = postings.get(term)
+                    if entry is None:
+                        entry = postings[term] = (array('I'), array('H'))
+                    entry[0].append(doc)
+                    entry[1].append(min(frequency, MAX_TERM_FREQUENCY))
+        count = len(labels) - first
+        passage_files.extend([len(files)] * count)
+        files.append(SourceFile(key, stat.st_size, stat.st_mtime_ns, digest, first, count))
+
+    # 引き継いだ文書のpostingを今回の文書番号に付け替えて合流させる
+    if stats.reused:
+        offsets = previous.term_offsets
+        for number, term in enumerate(previous.terms):
+            start, end = offsets[number], offsets[number + 1]
+            kept = [(remap[doc], tf) for doc, tf in zip(previous.postings_docs[start:end],
+                                                         previous.postings_tfs[start:end]) if remap[doc] >= 0]
+            if not kept:
+                continue
+            entry = postings.get(term)
+            if entry is None:
+                entry = postings[term] = (array('I'), array('H'))
+            entry[0].extend(doc for doc, _ in kept)
+            entry[1].extend(tf for _, tf in kept)
+
+    # 語を昇順に並べてpostingを1本の配列に連結する
+    terms = sorted(postings)
+    term_offsets = array('I', [0])
+    postings_docs = array('I')
+    postings_tfs = array('H')
+    for term in terms:
+        docs, tfs = postings[term]
+        postings_docs.extend(docs)
+        postings_tfs.extend(tfs)
+        term_offsets.append(len(postings_docs))
+
+    index = ExpertiseIndex(files, labels, lengths, passage_files, terms, term_offsets, postings_docs, postings_tfs,
+                           "\0".join(texts))
+    stats.seconds = time.perf_counter() - started
+    return index, stats
+
+
+def open_index(roots: Sequence[Path] = DEFAULT_ROOTS, index_path: Path = DEFAULT_INDEX_PATH,
+               update: bool = True, full: bool = False) -> Tuple[ExpertiseIndex, BuildStats]:
+    """索引ファイルを読み込み、必要なら差分を反映して書き戻す
+
+    Args:
+        roots: 索引対象のディレクトリまたはファイル
+        index_path: 索引ファイルのパス
+        update: Falseの場合は索引ファイルがあればファイルの変化を確認せずそのまま使う
+        full: Trueの場合は前回の索引を使わずすべて読み直す
+
+    Returns:
+        (索引, 更新内容)
+    """
+    previous = None if full else ExpertiseIndex.load(index_path)
+    if previous is not None and not update:
+        return previous, BuildStats(files=len(previous.files), reused=len(previous.files))
+    index, stats = build_index(roots, previous)
+    if previous is None or stats.changed:
+        index.save(index_path)
+    return index, stats
+
+
+def make_snippet(text: str, query: str, width: int = SNIPPET_CHARS) -> str:
+    """検索語が最初に現れる位置の周辺を1行で切り出す"""
+    flat = " ".join(text.split())
+    lowered = unicodedata.normalize("NFKC", flat).casefold()
+    if len(lowered) != len(flat):
+        flat = lowered
+    positions = [lowered.find(term) for term in tokenize(query)]
+    found = [position for position in positions if position >= 0]
+    begin = max(0, min(found) - width // 4) if found else 0
+    snippet = flat[begin:begin + width]
+    return ("…" if begin else "") + snippet + ("…" if begin + width < len(flat) else "")
+
+
+def main() -> int:
+    """コマンドライン（build / search）"""
+    parser = argparse.ArgumentParser(description="Expertises配下の全文検索（文字bigram索引・BM25）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    def add_common(subparser: argparse.ArgumentParser) -> None:
+        subparser.add_argument("--root", action="append", type=Path,
+                               help="索引対象のディレクトリ（複数指定可。省略時は Expertises）")
+        subparser.add_argument("--index", type=Path, default=DEFAULT_INDEX_PATH, help="索引ファイルのパス")
+
+    build_parser = subparsers.add_parser("build", help="索引を構築・更新")
+    add_common(build_parser)
+    build_parser.add_argument("--full", action="store_true", help="前回の索引を使わずすべて読み直す")
+
+    search_parser = subparsers.add_parser("search", help="検索")
+    add_common(search_parser)
+    search_parser.add_argument("query", help="検索語")
+    search_parser.add_argument("-n", "--limit", type=int, default=10, help="表示件数")
+    search_parser.add_argument("--path", help="パスにこの文字列を含むファイルに絞り込む")
+    search_parser.add_argument("--no-update", action="store_true", help="ファイルの変化を確認せず索引をそのまま使う")
+    search_parser.add_argument("--json", action="store_true", help="JSONで出力")
+
+    args = parser.parse_args()
+    roots = args.root or DEFAULT_ROOTS
+
+    if args.command == "build":
+        index, stats = open_index(roots, args.index, full=args.full)
+        print(f"索引：{args.index}")
+        print(f"ファイル {stats.files}件（読み直し {stats.parsed} / 引き継ぎ {stats.reused} / 削除 {stats.removed}）"
+              f"・文書 {len(index.lengths)}件・語 {len(index.terms)}件（{stats.seconds * 1000:.1f}ms）")
+        return 0
+
+    index, _ = open_index(roots, args.index, update=not args.no_update)
+    started = time.perf_counter()
+    hits = index.search(args.query, args.limit, args.path)
+    elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps([dict(asdict(hit), snippet=make_snippet(hit.text, args.query)) for hit in hits],
+                         ensure_ascii=False, indent=2))
+        return 0
+    print(f"「{args.query}」{len(hits)}件（{elapsed * 1000:.1f}ms）")
+    for rank, hit in enumerate(hits, 1):
+        print(f"{rank:2d}. [{hit.score:.2f}] {hit.path}  {hit.label}")
+        print(f"    {make_snippet(hit.text, args.query)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())